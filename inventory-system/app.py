@@ -7,7 +7,8 @@ from stacks import (
     DatabaseStack,
     LambdaLayersStack,
     CRUDStack,
-    ApiStack
+    ApiStack,
+    CatalogStack
 )
 
 
@@ -49,6 +50,7 @@ database_stack = DatabaseStack(
     config=config,
     vpc=network_stack.vpc,
     rds_sg=network_stack.rds_sg,
+    rds_proxy_sg=network_stack.rds_proxy_sg,
     env=aws_env,
     description=f"Database infrastructure for inventory system - {env_name}"
 )
@@ -62,7 +64,8 @@ crud_stack = CRUDStack(
     lambda_sg=network_stack.lambda_sg,
     psycopg2_layer=layers_stack.psycopg2_layer,
     db_secret=database_stack.db_secret,
-    db_endpoint=database_stack.db_instance.db_instance_endpoint_address,
+    db_endpoint=database_stack.db_endpoint,
+    db_read_endpoints=database_stack.db_read_endpoints,
     env=aws_env,
     description=f"Lambda functions for CRUD operations - {env_name}"
 )
@@ -76,11 +79,34 @@ api_stack = ApiStack(
     config=config,
     create_product_function=crud_stack.create_product_function,
     get_product_function=crud_stack.get_product_function,
+    list_products_function=crud_stack.list_products_function,
+    search_products_function=crud_stack.search_products_function,
+    batch_get_products_function=crud_stack.batch_get_products_function,
+    batch_update_products_function=crud_stack.batch_update_products_function,
     update_product_function=crud_stack.update_product_function,
     delete_product_function=crud_stack.delete_product_function,
+    create_import_function=crud_stack.create_import_function,
+    get_import_function=crud_stack.get_import_function,
+    adjust_stock_function=crud_stack.adjust_stock_function,
+    create_reservation_function=crud_stack.create_reservation_function,
+    release_reservation_function=crud_stack.release_reservation_function,
+    list_product_movements_function=crud_stack.list_product_movements_function,
+    list_movements_function=crud_stack.list_movements_function,
     env=aws_env,
     description=f"API Gateway for inventory system - {env_name}"
 )
 api_stack.add_dependency(crud_stack)
 
+catalog_stack = CatalogStack(
+    app,
+    f"{env_name}-CatalogStack",
+    config=config,
+    data_bucket=crud_stack.lake_bucket,
+    data_prefix=crud_stack.lake_prefix,
+    tables=crud_stack.lake_tables,
+    env=aws_env,
+    description=f"Data lake catalog for inventory system - {env_name}"
+)
+catalog_stack.add_dependency(crud_stack)
+
 app.synth()
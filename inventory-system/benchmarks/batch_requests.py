@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Latency of reading and updating N products with single requests against one batch request.
+
+Seeds --products rows in a local PostgreSQL (schema applied with
+lambda_src/crud/migrate.py) and runs the handlers in-process through the
+router, without the product cache, as in prod without the shared tier. For
+each batch size it times, --rounds times over random products:
+
+- N GET /products/{product_id} one after another, against one GET /products/batch;
+- N PUT /products/{product_id}, each its own transaction and commit, against
+  one PATCH /products/batch.
+
+Each single request would also pay its own API Gateway and Lambda overhead and
+count against the API throttle, which in-process calls leave out, so the gap
+measured here is the smallest it can be.
+
+Usage:
+    DB_PASSWORD=postgres python benchmarks/batch_requests.py [--sizes 10,50,100] [--rounds 200]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda_src" / "crud"))
+os.environ["PRODUCT_CACHE_TTL_SECONDS"] = "0"
+
+import db  # noqa: E402
+import router  # noqa: E402
+
+SKU_PREFIX = "BATCH-"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def request(method, resource, body=None, params=None, **path):
+    result = router.lambda_handler({
+        "httpMethod": method,
+        "resource": resource,
+        "headers": {},
+        "queryStringParameters": params,
+        "pathParameters": {name: str(value) for name, value in path.items()},
+        "body": json.dumps(body) if body is not None else None
+    }, None)
+    if result["statusCode"] != 200:
+        raise RuntimeError(f"{method} {resource} returned {result['statusCode']}: {result['body']}")
+    return json.loads(result["body"])
+
+
+def singles_get(product_ids):
+    for product_id in product_ids:
+        request("GET", "/products/{product_id}", product_id=product_id)
+
+
+def batch_get(product_ids):
+    request("GET", "/products/batch", params={"ids": ",".join(map(str, product_ids))})
+
+
+def singles_update(product_ids):
+    for product_id in product_ids:
+        request("PUT", "/products/{product_id}", {"quantity": random.randint(0, 1000)}, product_id=product_id)
+
+
+def batch_update(product_ids):
+    body = request("PATCH", "/products/batch", {
+        "items": [{"id": product_id, "quantity": random.randint(0, 1000)} for product_id in product_ids]
+    })
+    failed = [item for item in body["items"] if item["status"] != 200]
+    if failed:
+        raise RuntimeError(f"Batch items failed: {failed[:3]}")
+
+
+def seed(count):
+    with db.transaction() as cursor:
+        cursor.execute(
+            "INSERT INTO products (sku, name, category, price, quantity) "
+            "SELECT %s || n || '-' || %s, 'Batch product ' || n, 'batch', 9.99, 100 "
+            "FROM generate_series(1, %s) AS n RETURNING id",
+            (SKU_PREFIX, time.time_ns(), count)
+        )
+        return [row["id"] for row in cursor.fetchall()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--sizes", default="10,50,100", help="comma-separated batch sizes, at most 100")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    product_ids = seed(args.products)
+    try:
+        print(f"{args.rounds} rounds per size, ms to read or update N products")
+        for size in (int(value) for value in args.sizes.split(",")):
+            for label, singles, batch in (
+                ("get", singles_get, batch_get),
+                ("update", singles_update, batch_update)
+            ):
+                timings = {singles: [], batch: []}
+                for _ in range(args.rounds):
+                    sample = random.sample(product_ids, size)
+                    # In random order, so neither always runs on the colder buffers
+                    for function in random.sample([singles, batch], 2):
+                        started_at = time.perf_counter()
+                        function(sample)
+                        timings[function].append((time.perf_counter() - started_at) * 1000)
+                for name, function in (("single", singles), ("batch", batch)):
+                    print(
+                        f"  N={size:<4} {label:<7} {name:<7} "
+                        f"p50 {percentile(timings[function], 50):8.2f}  "
+                        f"p95 {percentile(timings[function], 95):8.2f}  "
+                        f"p99 {percentile(timings[function], 99):8.2f}  "
+                        f"max {max(timings[function]):8.2f}"
+                    )
+    finally:
+        with db.transaction() as cursor:
+            cursor.execute("DELETE FROM products WHERE sku LIKE %s RETURNING id", (f"{SKU_PREFIX}%",))
+            cursor.execute("DELETE FROM stock_movements WHERE product_id = ANY(%s)",
+                           ([row["id"] for row in cursor.fetchall()],))
+
+
+if __name__ == "__main__":
+    main()
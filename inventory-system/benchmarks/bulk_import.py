@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Throughput of the bulk product import versus single-row creates.
+
+Writes a --rows file in --format to a temporary directory and imports it
+with product_imports.run_import into a local PostgreSQL (schema applied with
+lambda_src/crud/migrate.py), as the import Lambda would from S3. --updates of
+the rows use SKUs that already exist, half of them with new values, and
+--invalid of them carry a bad price. For comparison, --baseline-rows products
+are created one at a time through the create_product handler.
+
+With --merge-cost, the merge step of the same file is also timed without the
+search indexes, without the ledger and outbox triggers, and without both. Each
+variant drops or disables them in a transaction that is rolled back, so it
+locks products while it runs.
+
+Usage:
+    DB_PASSWORD=postgres python benchmarks/bulk_import.py [--rows 500000] [--format csv] [--chunk-rows 50000]
+"""
+import argparse
+import codecs
+import csv
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda_src" / "crud"))
+
+import db  # noqa: E402
+import create_product  # noqa: E402
+import product_imports  # noqa: E402
+from movements import record_reason  # noqa: E402
+
+WITHOUT_SEARCH = [
+    "DROP INDEX products_name_trgm_idx",
+    "DROP INDEX products_sku_trgm_idx",
+    "DROP INDEX products_search_vector_idx",
+    "ALTER TABLE products DROP COLUMN search_vector"
+]
+WITHOUT_TRIGGERS = [
+    f"ALTER TABLE products DISABLE TRIGGER {trigger}"
+    for trigger in ("products_record_created_stock", "products_record_updated_stock",
+                    "products_outbox_insert", "products_outbox_update")
+]
+MERGE_VARIANTS = [
+    ("full schema", []),
+    ("no search indexes", WITHOUT_SEARCH),
+    ("no ledger or outbox", WITHOUT_TRIGGERS),
+    ("neither", WITHOUT_SEARCH + WITHOUT_TRIGGERS)
+]
+
+
+def write_file(path, file_format, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if file_format == "csv":
+            writer = csv.DictWriter(f, fieldnames=product_imports.IMPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+
+
+def generate_rows(args, prefix, existing):
+    rng = random.Random(args.seed)
+    updated = {n: i for i, n in enumerate(sorted(rng.sample(range(args.rows), len(existing))))}
+    invalid = set(rng.sample(range(args.rows), int(args.rows * args.invalid)))
+    for n in range(args.rows):
+        row = {
+            "sku": f"{prefix}-{n}",
+            "name": f"Imported product {n}",
+            "description": "Bulk import benchmark",
+            "category": f"category-{n % 50}",
+            "price": f"{n % 1000}.99",
+            "quantity": n % 500
+        }
+        if n in updated:
+            sku, unchanged = existing[updated[n]]
+            row["sku"] = sku
+            if unchanged:
+                row.update(name="Existing product", description=None, category=None, price="10.00", quantity=100)
+        if n in invalid:
+            row["price"] = "free"
+        yield row
+
+
+def seed_existing(prefix, count):
+    """SKUs of count existing products, half of which the file leaves unchanged"""
+    with db.transaction() as cursor:
+        cursor.execute(
+            "INSERT INTO products (sku, name, description, category, price, quantity) "
+            "SELECT %s || '-existing-' || n, 'Existing product', 'Bulk import benchmark', "
+            "'category-' || n %% 50, 10, 100 FROM generate_series(1, %s) AS n",
+            (prefix, count)
+        )
+    return [(f"{prefix}-existing-{n}", n % 2 == 0) for n in range(1, count + 1)]
+
+
+def time_merge(import_id, path, file_format, chunk_rows, statements):
+    """Seconds the merge step of the file takes after statements, in a transaction that is rolled back"""
+    connection = db.get_connection()
+    try:
+        with connection.cursor() as cursor, open(path, "rb") as stream:
+            for statement in statements:
+                cursor.execute(statement)
+            lines = codecs.getreader("utf-8-sig")(stream)
+            rows = product_imports.csv_rows(lines) if file_format == "csv" else product_imports.ndjson_rows(lines)
+            product_imports.stage_rows(cursor, rows, chunk_rows)
+            cursor.execute(product_imports.REJECT_ROWS_SQL, {"import_id": import_id})
+            record_reason(cursor, "import")
+            started_at = time.perf_counter()
+            cursor.execute(product_imports.MERGE_ROWS_SQL, {"import_id": import_id})
+            cursor.fetchall()
+            return time.perf_counter() - started_at
+    finally:
+        connection.rollback()
+
+
+def run_merge_cost(import_id, path, args):
+    print("  merge step alone, median of 3 rolled-back runs")
+    timings = {label: [] for label, _ in MERGE_VARIANTS}
+    # Alternating, so no variant always runs on the colder or the more bloated table
+    for _ in range(3):
+        for label, statements in MERGE_VARIANTS:
+            timings[label].append(time_merge(import_id, path, args.format, args.chunk_rows, statements))
+            # A rolled-back merge leaves dead rows and index entries that the next one would wade through
+            vacuum_tables()
+    for label, _ in MERGE_VARIANTS:
+        print(f"    {label:<20} {args.rows / statistics.median(timings[label]):9.0f} rows/s")
+
+
+def vacuum_tables():
+    connection = db.get_connection()
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM ANALYZE products, outbox, stock_movements")
+    finally:
+        connection.autocommit = False
+
+
+def run_baseline(prefix, count):
+    started_at = time.perf_counter()
+    for n in range(count):
+        body = {"sku": f"{prefix}-single-{n}", "name": f"Single product {n}", "price": 9.99, "quantity": n}
+        result = create_product.lambda_handler({"body": json.dumps(body)}, None)
+        assert result["statusCode"] == 201, result
+    return count / (time.perf_counter() - started_at)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--format", choices=product_imports.FORMATS, default="csv")
+    parser.add_argument("--chunk-rows", type=int, default=product_imports.CHUNK_ROWS)
+    parser.add_argument("--updates", type=float, default=0.1, help="share of rows with an existing SKU")
+    parser.add_argument("--invalid", type=float, default=0.01, help="share of rows with an invalid price")
+    parser.add_argument("--baseline-rows", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--merge-cost", action="store_true", help="also time the merge step without the search indexes and triggers"
+    )
+    args = parser.parse_args()
+
+    prefix = f"IMPORT-{time.time_ns()}"
+    existing = seed_existing(prefix, int(args.rows * args.updates))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / f"products.{args.format}"
+        write_file(path, args.format, generate_rows(args, prefix, existing))
+        size_mb = path.stat().st_size / 1e6
+
+        print(f"{args.rows} rows ({size_mb:.1f} MB {args.format}), COPY chunks of {args.chunk_rows}")
+
+        product_import = product_imports.create_import(args.format)
+        product_imports.claim_import(product_import["id"])
+        if args.merge_cost:
+            # Before the import, so every variant merges into the same products
+            run_merge_cost(product_import["id"], path, args)
+        started_at = time.perf_counter()
+        with open(path, "rb") as stream:
+            result, _ = product_imports.run_import(
+                product_import["id"], args.format, stream, args.chunk_rows
+            )
+        elapsed = time.perf_counter() - started_at
+        print(
+            f"  bulk import    {elapsed:7.2f} s  {args.rows / elapsed:9.0f} rows/s  "
+            f"inserted {result['rows_inserted']}, updated {result['rows_updated']}, "
+            f"unchanged {result['rows_unchanged']}, failed {result['rows_failed']}"
+        )
+    if args.baseline_rows:
+        rate = run_baseline(prefix, args.baseline_rows)
+        print(f"  single creates {args.rows / rate:7.2f} s  {rate:9.0f} rows/s  (extrapolated from {args.baseline_rows})")
+
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM products WHERE sku LIKE %s", (f"{prefix}-%",))
+        cursor.execute("DELETE FROM product_imports WHERE id = %s", (product_import["id"],))
+
+
+if __name__ == "__main__":
+    main()
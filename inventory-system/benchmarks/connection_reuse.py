@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Latency of get_product with a warm connection versus a new connection per invocation.
+
+Runs the get_product handler in-process against a local PostgreSQL with the
+schema applied (lambda_src/crud/migrate.py). The cold mode discards the
+connection before every call, as a new execution environment would.
+
+Usage:
+    DB_PASSWORD=postgres python benchmarks/connection_reuse.py [--invocations 500]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda_src" / "crud"))
+
+import db  # noqa: E402
+import create_product  # noqa: E402
+import get_product  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(event, invocations, reuse):
+    latencies = []
+    for _ in range(invocations):
+        if not reuse:
+            db.discard_connection()
+        started_at = time.perf_counter()
+        result = get_product.lambda_handler(event, None)
+        latencies.append(time.perf_counter() - started_at)
+        assert result["statusCode"] == 200, result
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invocations", type=int, default=500)
+    args = parser.parse_args()
+
+    created = create_product.lambda_handler(
+        {"body": json.dumps({"sku": f"BENCH-{time.time_ns()}", "name": "Benchmark product", "price": 1})}, None
+    )
+    product_id = json.loads(created["body"])["id"]
+    event = {"pathParameters": {"product_id": str(product_id)}}
+
+    for label, reuse in (("new connection", False), ("warm connection", True)):
+        latencies = run(event, args.invocations, reuse)
+        print(
+            f"{label:<16} p50 {percentile(latencies, 50) * 1000:6.2f} ms  "
+            f"p95 {percentile(latencies, 95) * 1000:6.2f} ms  p99 {percentile(latencies, 99) * 1000:6.2f} ms"
+        )
+
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM products WHERE id = %s", (product_id,))
+
+
+if __name__ == "__main__":
+    main()
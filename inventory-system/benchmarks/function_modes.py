@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Cold starts and open database connections for the "split" and "router" function modes.
+
+Simulates Lambda execution environments under mixed product traffic with
+Poisson arrivals. An invocation reuses an idle environment of its function
+if there is one and cold-starts a new environment otherwise. An environment
+is reclaimed after --idle-timeout seconds without work. Each environment
+holds one database connection, as db.py keeps it warm. The router mode
+sends every route to one function; the split mode has one function per route.
+Counts start after --warmup seconds, past the initial burst of cold starts.
+
+Service times are sampled from the real handlers against a local PostgreSQL
+when --measure is given (schema applied with lambda_src/crud/migrate.py), and
+from --service-ms otherwise.
+
+Usage:
+    python benchmarks/function_modes.py [--rate 50] [--duration 3600]
+        [--mix get=0.8,update=0.1,create=0.07,delete=0.03] [--measure]
+"""
+import argparse
+import heapq
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+CRUD_DIR = Path(__file__).resolve().parent.parent / "lambda_src" / "crud"
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        route, _, weight = part.partition("=")
+        mix[route] = float(weight)
+    return mix
+
+
+def measure_service_times(samples):
+    """Handler durations per route, from in-process calls against the local database"""
+    sys.path.insert(0, str(CRUD_DIR))
+    import create_product
+    import delete_product
+    import get_product
+    import update_product
+
+    durations = {route: [] for route in ("get", "update", "create", "delete")}
+    for index in range(samples):
+        started_at = time.perf_counter()
+        created = create_product.lambda_handler(
+            {"body": json.dumps({"sku": f"MODE-{time.time_ns()}-{index}", "name": "Mode benchmark", "price": 1})},
+            None
+        )
+        durations["create"].append(time.perf_counter() - started_at)
+        event = {"pathParameters": {"product_id": str(json.loads(created["body"])["id"])}}
+
+        for route, handler, body in (
+            ("get", get_product.lambda_handler, None),
+            ("update", update_product.lambda_handler, json.dumps({"quantity": index})),
+            ("delete", delete_product.lambda_handler, None)
+        ):
+            started_at = time.perf_counter()
+            handler({**event, "body": body}, None)
+            durations[route].append(time.perf_counter() - started_at)
+    return durations
+
+
+def simulate(args, mix, functions, service_time):
+    """Cold starts and connection counts when routes map to functions as given"""
+    rng = random.Random(args.seed)
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    # Per function: heap of (busy_until, environment id) for its environments
+    idle = {function: [] for function in set(functions.values())}
+    environments = 0
+    open_environments = set()
+    cold_starts = 0
+    invocations = 0
+    peak_open = 0
+    open_total = 0
+
+    now = 0.0
+    while now < args.warmup + args.duration:
+        now += rng.expovariate(args.rate)
+        route = rng.choices(routes, weights)[0]
+        function = functions[route]
+        counted = now >= args.warmup
+
+        # Reclaim environments that sat idle past the timeout, for every function
+        for pool in idle.values():
+            kept = []
+            for busy_until, environment in pool:
+                if busy_until <= now - args.idle_timeout:
+                    open_environments.discard(environment)
+                else:
+                    kept.append((busy_until, environment))
+            if len(kept) != len(pool):
+                heapq.heapify(kept)
+                pool[:] = kept
+
+        duration = service_time(route, rng)
+        pool = idle[function]
+        free = [entry for entry in pool if entry[0] <= now]
+        if free:
+            # Lambda prefers the most recently used warm environment
+            entry = max(free)
+            pool.remove(entry)
+            heapq.heapify(pool)
+            environment = entry[1]
+        else:
+            cold_starts += counted
+            environments += 1
+            environment = environments
+            open_environments.add(environment)
+            duration += args.cold_start_ms / 1000
+        heapq.heappush(pool, (now + duration, environment))
+
+        if counted:
+            # Poisson arrivals see time averages, so this averages the open connections
+            invocations += 1
+            open_total += len(open_environments)
+            peak_open = max(peak_open, len(open_environments))
+
+    return {
+        "invocations": invocations,
+        "cold_starts": cold_starts,
+        "peak_connections": peak_open,
+        "avg_connections": open_total / invocations if invocations else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=50, help="requests per second")
+    parser.add_argument("--duration", type=float, default=3600, help="simulated seconds after the warmup")
+    parser.add_argument("--warmup", type=float, default=900, help="simulated seconds before counting")
+    parser.add_argument("--mix", default="get=0.8,update=0.1,create=0.07,delete=0.03")
+    parser.add_argument("--service-ms", type=float, default=15, help="mean handler time without --measure")
+    parser.add_argument("--cold-start-ms", type=float, default=600, help="init plus first connection")
+    parser.add_argument("--idle-timeout", type=float, default=420, help="seconds before an idle environment is reclaimed")
+    parser.add_argument("--measure", action="store_true", help="sample service times from the local database")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    if args.measure:
+        measured = measure_service_times(200)
+
+        def service_time(route, rng):
+            return rng.choice(measured[route])
+    else:
+        def service_time(route, rng):
+            return rng.expovariate(1000 / args.service_ms)
+
+    modes = {
+        "split": {route: route for route in mix},
+        "router": {route: "router" for route in mix}
+    }
+    print(f"{args.rate:g} req/s for {args.duration:g}s, mix {mix}, idle timeout {args.idle_timeout:g}s")
+    for mode, functions in modes.items():
+        result = simulate(args, mix, functions, service_time)
+        print(
+            f"  {mode:<7} cold starts {result['cold_starts']:5d} "
+            f"({result['cold_starts'] / result['invocations']:.3%})  "
+            f"connections peak {result['peak_connections']:3d}  avg {result['avg_connections']:6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Latency of GET /products by page number, keyset cursors versus OFFSET.
+
+Seeds --products rows in a local PostgreSQL (schema applied with
+lambda_src/crud/migrate.py), vacuums them so the listing indexes allow
+index-only scans, then walks every scenario page by page through the
+list_products handler up to --max-page, saving the cursors of the pages in
+--pages. Each of those pages is then queried --repeat times with its cursor
+and again with LIMIT/OFFSET. Both are timed at the query, without the
+handler's JSON encoding, and medians are reported.
+
+The seeded rows are deleted afterwards unless --keep is given; a kept seed
+is reused by the next run.
+
+Usage:
+    DB_PASSWORD=postgres python benchmarks/listing.py [--products 1000000] [--max-page 10000]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda_src" / "crud"))
+
+import db  # noqa: E402
+import list_products  # noqa: E402
+import products  # noqa: E402
+from api import decode_cursor  # noqa: E402
+
+SKU_PREFIX = "LISTING-"
+SCENARIOS = [
+    ("sort=id", {}),
+    ("category, sort=-price", {"category": "category-7", "sort": "-price"}),
+    ("price range, in stock, sort=name", {"min_price": "100", "max_price": "500", "stock": "in_stock", "sort": "name"})
+]
+
+
+def seed(count):
+    with db.transaction() as cursor:
+        cursor.execute("SELECT count(*) AS seeded FROM products WHERE sku LIKE %s", (f"{SKU_PREFIX}%",))
+        if cursor.fetchone()["seeded"] == count:
+            return
+        cursor.execute("DELETE FROM products WHERE sku LIKE %s", (f"{SKU_PREFIX}%",))
+        cursor.execute("SELECT setseed(0.7)")
+        cursor.execute(
+            "INSERT INTO products (sku, name, category, price, quantity) "
+            "SELECT %s || n, 'Product ' || md5(n::text), 'category-' || (random() * 49)::int, "
+            "round((random() * 1000)::numeric, 2), CASE WHEN random() < 0.1 THEN 0 ELSE (random() * 500)::int END "
+            "FROM generate_series(1, %s) AS n",
+            (SKU_PREFIX, count)
+        )
+    # Index-only scans skip the heap only for pages marked all-visible by VACUUM
+    connection = db.get_connection()
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM ANALYZE products")
+    finally:
+        connection.autocommit = False
+
+
+def request(params):
+    result = list_products.lambda_handler({"queryStringParameters": params}, None)
+    assert result["statusCode"] == 200, result
+    return json.loads(result["body"])
+
+
+def offset_query(params, limit, page):
+    """The OFFSET equivalent of a page, for comparison"""
+    sort = params.get("sort", "id")
+    direction = "DESC" if sort.startswith("-") else "ASC"
+    key = sort.removeprefix("-")
+    conditions = ["TRUE"]
+    values = []
+    if "category" in params:
+        conditions.append("category = %s")
+        values.append(params["category"])
+    if "min_price" in params:
+        conditions.append("price >= %s")
+        values.append(params["min_price"])
+    if "max_price" in params:
+        conditions.append("price <= %s")
+        values.append(params["max_price"])
+    if "stock" in params:
+        conditions.append(products.STOCK_CONDITIONS[params["stock"]])
+    order = f"{key} {direction}, id {direction}" if key != "id" else f"id {direction}"
+    sql = (
+        f"SELECT {products.COLUMNS} FROM products WHERE {' AND '.join(conditions)} "
+        f"ORDER BY {order} LIMIT %s OFFSET %s"
+    )
+    return sql, (*values, limit, (page - 1) * limit)
+
+
+def time_keyset(params, limit, cursor, repeat):
+    sort = params.get("sort", "id")
+    filters = {name: params.get(name) for name in list_products.FILTERS}
+    after = decode_cursor(cursor)["after"] if cursor else None
+    latencies = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        products.list_products(filters, sort.removeprefix("-"), sort.startswith("-"), limit, after)
+        latencies.append(time.perf_counter() - started_at)
+    return statistics.median(latencies)
+
+
+def time_offset(params, limit, page, repeat):
+    sql, values = offset_query(params, limit, page)
+    latencies = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        with db.transaction() as cursor:
+            cursor.execute(sql, values)
+            cursor.fetchall()
+        latencies.append(time.perf_counter() - started_at)
+    return statistics.median(latencies)
+
+
+def run(label, filters, args):
+    params = {**filters, "limit": str(args.limit)}
+    cursors = {1: None}
+    page = 1
+    cursor = None
+    walk_started_at = time.perf_counter()
+    while page < args.max_page:
+        body = request({**params, "cursor": cursor} if cursor else params)
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+        page += 1
+        if page in args.pages:
+            cursors[page] = cursor
+    walked = time.perf_counter() - walk_started_at
+
+    print(f"  {label} ({page} pages walked in {walked:.1f} s)")
+    for number in sorted(cursors):
+        keyset = time_keyset(filters, args.limit, cursors[number], args.repeat)
+        offset = time_offset(filters, args.limit, number, args.repeat)
+        print(f"    page {number:>6}  keyset {keyset * 1000:7.2f} ms  offset {offset * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1000000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--max-page", type=int, default=10000)
+    parser.add_argument("--pages", type=lambda value: {int(page) for page in value.split(",")},
+                        default={1, 10, 100, 1000, 10000})
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows for the next run")
+    args = parser.parse_args()
+
+    seed(args.products)
+    print(f"{args.products} products, {args.limit} per page, median of {args.repeat}")
+    for label, filters in SCENARIOS:
+        run(label, filters, args)
+
+    if not args.keep:
+        with db.transaction() as cursor:
+            cursor.execute("DELETE FROM products WHERE sku LIKE %s", (f"{SKU_PREFIX}%",))
+
+
+if __name__ == "__main__":
+    main()
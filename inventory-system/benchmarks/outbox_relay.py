@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""Write cost of the transactional outbox, exactly-once delivery to the lake, and relay throughput.
+
+Runs against a local PostgreSQL (schema applied with lambda_src/crud/migrate.py)
+and a local S3: --s3-endpoint (e.g. MinIO), or moto's server when omitted.
+Needs pandas and pyarrow, which the relay function gets from its layer.
+
+- Times --updates single product updates with the outbox triggers enabled and
+  disabled, and a --batch-rows INSERT ... SELECT into products.
+- Seeds --products products, then runs --writers processes that update random
+  products for --seconds. Commits land out of id order, and some transactions
+  roll back or deadlock. Meanwhile --relays processes relay small batches at
+  once, and fail at random (--failure-rate) while writing files or before
+  moving the offset. After a final clean relay, the lake files are read back.
+  The check is that every committed change appears exactly once: one products
+  event per updated row, one stock_movements event per movement row, and each
+  product's last event matching its row.
+- Relays the outbox rows of a --bulk-rows import with the default batch size.
+
+The seeded products are deleted afterwards, and their events relayed to the
+stand-in bucket.
+
+Usage:
+    DB_PASSWORD=postgres python benchmarks/outbox_relay.py [--writers 8] [--relays 2] [--seconds 20]
+"""
+import argparse
+import io
+import logging
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda_src" / "crud"))
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("LAKE_BUCKET", "benchmark-inventory-lake")
+
+import boto3  # noqa: E402
+from botocore.exceptions import ClientError  # noqa: E402
+import pandas as pd  # noqa: E402
+import psycopg2  # noqa: E402
+
+import db  # noqa: E402
+import outbox  # noqa: E402
+
+SKU_PREFIX = "OUTBOX-"
+TRIGGERS = (
+    ("products", "products_outbox_insert"),
+    ("products", "products_outbox_update"),
+    ("products", "products_outbox_delete"),
+    ("stock_movements", "stock_movements_outbox_insert")
+)
+
+
+class InjectedFailure(Exception):
+    pass
+
+
+class FlakyS3:
+    """S3 client whose put_object fails at random, so a batch can stop after some of its files"""
+
+    def __init__(self, client, rng, rate):
+        self.client = client
+        self.rng = rng
+        self.rate = rate
+
+    def put_object(self, **kwargs):
+        if self.rng.random() < self.rate:
+            raise InjectedFailure("put_object")
+        return self.client.put_object(**kwargs)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def start_s3(endpoint_url):
+    server = None
+    if endpoint_url is None:
+        from moto.server import ThreadedMotoServer
+
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        server = ThreadedMotoServer(port=0)
+        server.start()
+        host, port = server.get_host_and_port()
+        endpoint_url = f"http://{host}:{port}"
+    return server, endpoint_url
+
+
+def use_s3(endpoint_url):
+    outbox._s3_client = boto3.client("s3", endpoint_url=endpoint_url)
+    return outbox._s3_client
+
+
+def empty_bucket(client):
+    for page in client.get_paginator("list_objects_v2").paginate(Bucket=outbox.LAKE_BUCKET):
+        for item in page.get("Contents", []):
+            client.delete_object(Bucket=outbox.LAKE_BUCKET, Key=item["Key"])
+
+
+def read_lake(client, topic):
+    frames = []
+    for page in client.get_paginator("list_objects_v2").paginate(
+        Bucket=outbox.LAKE_BUCKET, Prefix=f"{outbox.LAKE_PREFIX}/{topic}/"
+    ):
+        for item in page.get("Contents", []):
+            body = client.get_object(Bucket=outbox.LAKE_BUCKET, Key=item["Key"])["Body"].read()
+            frames.append(pd.read_parquet(io.BytesIO(body)))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["event_id"])
+
+
+def set_triggers(enabled):
+    with db.transaction() as cursor:
+        for table, trigger in TRIGGERS:
+            cursor.execute(f"ALTER TABLE {table} {'ENABLE' if enabled else 'DISABLE'} TRIGGER {trigger}")
+
+
+def seed(count, quantity=100):
+    with db.transaction() as cursor:
+        cursor.execute(
+            "INSERT INTO products (sku, name, price, quantity) "
+            "SELECT %s || n || '-' || %s, 'Outbox product ' || n, 9.99, %s "
+            "FROM generate_series(1, %s) AS n RETURNING id",
+            (SKU_PREFIX, time.time_ns(), quantity, count)
+        )
+        return [row["id"] for row in cursor.fetchall()]
+
+
+def drain():
+    started_at = time.perf_counter()
+    result = outbox.relay()
+    return result, time.perf_counter() - started_at
+
+
+def run_write_cost(args):
+    product_ids = seed(100)
+    print(f"write cost: {args.updates} single updates, median of 3 INSERT ... SELECT of {args.batch_rows} products")
+    latencies = {False: [], True: []}
+    batch_rates = {False: [], True: []}
+    # Alternating, so neither setting always runs on the colder or the more bloated table
+    for _ in range(3):
+        for enabled in (False, True):
+            set_triggers(enabled)
+            try:
+                for n in range(args.updates // 3):
+                    started_at = time.perf_counter()
+                    with db.transaction() as cursor:
+                        cursor.execute(
+                            "UPDATE products SET quantity = quantity + 1 WHERE id = %s",
+                            (product_ids[n % len(product_ids)],)
+                        )
+                    latencies[enabled].append(time.perf_counter() - started_at)
+                started_at = time.perf_counter()
+                seed(args.batch_rows, quantity=10)
+                batch_rates[enabled].append(args.batch_rows / (time.perf_counter() - started_at))
+            finally:
+                set_triggers(True)
+    for label, enabled in (("outbox off", False), ("outbox on", True)):
+        print(
+            f"  {label:<11} update p50 {percentile(latencies[enabled], 50) * 1000:6.2f} ms  "
+            f"p95 {percentile(latencies[enabled], 95) * 1000:6.2f} ms  "
+            f"bulk insert {statistics.median(batch_rates[enabled]):8.0f} rows/s"
+        )
+
+
+def write_changes(task):
+    """Random committed, rolled-back and deadlocked updates; returns the products rows committed"""
+    product_ids, seconds, seed_value = task
+    rng = random.Random(seed_value)
+    committed = rolled_back = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sample = rng.sample(product_ids, rng.randint(1, 10))
+        change = "quantity = quantity + 1" if rng.random() < 0.7 else "name = name || '.'"
+        try:
+            with db.transaction() as cursor:
+                cursor.execute(f"UPDATE products SET {change} WHERE id = ANY(%s)", (sample,))
+                changed = cursor.rowcount
+                # Held open, so later ids commit first
+                time.sleep(rng.random() * 0.03)
+                if rng.random() < 0.1:
+                    raise InjectedFailure("rollback")
+            committed += changed
+        except (InjectedFailure, psycopg2.errors.DeadlockDetected):
+            rolled_back += 1
+    return committed, rolled_back
+
+
+def relay_changes(endpoint_url, batch_rows, failure_rate, seed_value, stop, results):
+    rng = random.Random(seed_value)
+    outbox._s3_client = FlakyS3(boto3.client("s3", endpoint_url=endpoint_url), rng, failure_rate)
+    complete_batch = outbox.complete_batch
+
+    def flaky_complete_batch(rows):
+        if rng.random() < failure_rate:
+            raise InjectedFailure("complete_batch")
+        return complete_batch(rows)
+
+    outbox.complete_batch = flaky_complete_batch
+    failures = 0
+    while not stop.is_set():
+        try:
+            outbox.relay(batch_rows=batch_rows)
+        # moto's server can also fail two relays writing the same key at once; real S3 keeps the last
+        except (InjectedFailure, ClientError):
+            failures += 1
+        time.sleep(0.01)
+    results.put(failures)
+
+
+def run_exactly_once(args, client):
+    # Start from an empty outbox and bucket, so the lake holds exactly the changes below
+    drain()
+    empty_bucket(client)
+    with db.transaction() as cursor:
+        cursor.execute("SELECT coalesce(max(id), 0) AS id FROM stock_movements")
+        movements_before = cursor.fetchone()["id"]
+    product_ids = seed(args.products)
+
+    context = multiprocessing.get_context("spawn")
+    stop, results = context.Event(), context.Queue()
+    relays = [
+        context.Process(
+            target=relay_changes,
+            args=(client.meta.endpoint_url, args.relay_batch_rows, args.failure_rate, n, stop, results)
+        )
+        for n in range(args.relays)
+    ]
+    for process in relays:
+        process.start()
+    with context.Pool(args.writers) as pool:
+        written = pool.map(
+            write_changes, [(product_ids, args.seconds, n) for n in range(args.writers)]
+        )
+    stop.set()
+    failures = sum(results.get() for _ in relays)
+    for process in relays:
+        process.join()
+    with db.transaction() as cursor:
+        cursor.execute("SELECT count(*) AS rows FROM outbox")
+        backlog = cursor.fetchone()["rows"]
+    final, _ = drain()
+
+    committed = len(product_ids) + sum(count for count, _ in written)
+    products = read_lake(client, "products")
+    movements = read_lake(client, "stock_movements")
+    with db.transaction() as cursor:
+        cursor.execute(
+            "SELECT id FROM stock_movements WHERE id > %s AND product_id = ANY(%s)",
+            (movements_before, product_ids)
+        )
+        movement_ids = {row["id"] for row in cursor.fetchall()}
+        cursor.execute("SELECT id, version, quantity FROM products WHERE id = ANY(%s)", (product_ids,))
+        current = {row["id"]: (row["version"], row["quantity"]) for row in cursor.fetchall()}
+        cursor.execute("SELECT count(*) AS rows FROM outbox")
+        left = cursor.fetchone()["rows"]
+
+    latest = products.sort_values("version").groupby("product_id").last()
+    mismatched = sum(
+        1 for product_id, (version, quantity) in current.items()
+        if product_id not in latest.index
+        or (latest.at[product_id, "version"], latest.at[product_id, "quantity"]) != (version, quantity)
+    )
+    print(
+        f"exactly once: {args.writers} writers for {args.seconds} s, {args.relays} relays with "
+        f"batches of {args.relay_batch_rows} failing at rate {args.failure_rate}"
+    )
+    print(
+        f"  committed {committed} product changes and {len(movement_ids)} movements, "
+        f"rolled back or deadlocked {sum(count for _, count in written)} transactions"
+    )
+    print(
+        f"  relays failed {failures} times; {backlog} rows were left when the writers stopped, "
+        f"{final['rows']} relayed by the final relay"
+    )
+    checks = [
+        ("products events", len(products), committed),
+        ("duplicate products events", int(products["event_id"].duplicated().sum()), 0),
+        ("stock_movements events", len(movements), len(movement_ids)),
+        ("movements missing from the lake", len(movement_ids - set(movements["movement_id"])), 0),
+        ("duplicate stock_movements events", int(movements["event_id"].duplicated().sum()), 0),
+        ("products whose last event differs from the row", mismatched, 0),
+        ("rows left in the outbox", left, 0)
+    ]
+    for label, actual, expected in checks:
+        print(f"  {'ok    ' if actual == expected else 'FAILED'} {label}: {actual}, expected {expected}")
+    return all(actual == expected for _, actual, expected in checks)
+
+
+def run_throughput(args, client):
+    drain()
+    empty_bucket(client)
+    seed(args.bulk_rows, quantity=10)
+    with db.transaction() as cursor:
+        cursor.execute("SELECT count(*) AS rows, sum(pg_column_size(payload)) AS bytes FROM outbox")
+        backlog = cursor.fetchone()
+    result, elapsed = drain()
+    size = sum(
+        item["Size"]
+        for page in client.get_paginator("list_objects_v2").paginate(Bucket=outbox.LAKE_BUCKET)
+        for item in page.get("Contents", [])
+    )
+    print(
+        f"throughput: {result['rows']} rows of a {args.bulk_rows} product import relayed in {elapsed:.1f} s "
+        f"({result['rows'] / elapsed:.0f} rows/s) as {result['files']} files, "
+        f"{size / 1e6:.1f} MB of Parquet for {backlog['bytes'] / 1e6:.1f} MB of JSON payload"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--s3-endpoint")
+    parser.add_argument("--updates", type=int, default=3000)
+    parser.add_argument("--batch-rows", type=int, default=50000)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--relays", type=int, default=2)
+    parser.add_argument("--seconds", type=int, default=20)
+    parser.add_argument("--relay-batch-rows", type=int, default=200)
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    parser.add_argument("--bulk-rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    server, endpoint_url = start_s3(args.s3_endpoint)
+    client = use_s3(endpoint_url)
+    if server is not None or outbox.LAKE_BUCKET not in {bucket["Name"] for bucket in client.list_buckets()["Buckets"]}:
+        client.create_bucket(Bucket=outbox.LAKE_BUCKET)
+
+    passed = False
+    try:
+        run_write_cost(args)
+        passed = run_exactly_once(args, client)
+        run_throughput(args, client)
+    finally:
+        with db.transaction() as cursor:
+            cursor.execute("DELETE FROM products WHERE sku LIKE %s RETURNING id", (f"{SKU_PREFIX}%",))
+            cursor.execute("DELETE FROM stock_movements WHERE product_id = ANY(%s)",
+                           ([row["id"] for row in cursor.fetchall()],))
+        drain()
+        if server is not None:
+            server.stop()
+    if not passed:
+        sys.exit("Exactly-once checks failed")
+
+
+if __name__ == "__main__":
+    main()
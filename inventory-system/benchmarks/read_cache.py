@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Hit ratio, database offload and staleness of the product read cache.
+
+Seeds --products rows in a local PostgreSQL (schema applied with
+lambda_src/crud/migrate.py), then sends Zipf-distributed reads mixed with
+--write-ratio updates through ProductCache, spread over --environments
+simulated execution environments. Local TTLs run on a simulated clock that
+advances as if requests arrived at --rate per second. Each environment has its own local tier,
+and all of them share one DynamoDB tier. The DynamoDB tier is local too:
+--dynamodb-endpoint (e.g. DynamoDB Local), or moto's server when omitted. A
+read is stale when it returns an older version than the last committed
+write to that product.
+
+Usage:
+    DB_PASSWORD=postgres python benchmarks/read_cache.py [--requests 20000] [--environments 4]
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda_src" / "crud"))
+
+import boto3  # noqa: E402
+
+import db  # noqa: E402
+import products  # noqa: E402
+from product_cache import LocalCache, ProductCache, SharedCache  # noqa: E402
+
+TABLE_NAME = "benchmark-product-cache"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def start_dynamodb(endpoint_url):
+    server = None
+    if endpoint_url is None:
+        from moto.server import ThreadedMotoServer
+
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        server = ThreadedMotoServer(port=0)
+        server.start()
+        host, port = server.get_host_and_port()
+        endpoint_url = f"http://{host}:{port}"
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    return server, endpoint_url
+
+
+def create_table(endpoint_url):
+    client = boto3.client("dynamodb", endpoint_url=endpoint_url)
+    if TABLE_NAME in client.list_tables()["TableNames"]:
+        client.delete_table(TableName=TABLE_NAME)
+    client.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{"AttributeName": "product_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "product_id", "AttributeType": "N"}],
+        BillingMode="PAY_PER_REQUEST"
+    )
+    return SharedCache(TABLE_NAME, ttl_seconds=120, endpoint_url=endpoint_url)
+
+
+def seed(count):
+    with db.transaction() as cursor:
+        cursor.execute(
+            "INSERT INTO products (sku, name, price, quantity) "
+            "SELECT 'CACHE-' || %s || '-' || n, 'Cache benchmark ' || n, 10, 100 FROM generate_series(1, %s) AS n "
+            "RETURNING id, version",
+            (time.time_ns(), count)
+        )
+        return {row["id"]: row["version"] for row in cursor.fetchall()}
+
+
+def run(args, label, versions, local_ttl, endpoint_url=None):
+    clock = SimulatedClock()
+    shared = create_table(endpoint_url) if endpoint_url else None
+    environments = [
+        ProductCache(LocalCache(local_ttl, args.local_max_entries, clock), shared) for _ in range(args.environments)
+    ]
+    rng = random.Random(args.seed)
+    ids = sorted(versions)
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(len(ids))]
+    latencies = []
+    stale = 0
+    sources = Counter()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(args.requests):
+            clock.now += rng.expovariate(args.rate)
+            cache = rng.choice(environments)
+            product_id = rng.choices(ids, weights)[0]
+            if rng.random() < args.write_ratio:
+                product = products.update_product(product_id, {"quantity": rng.randrange(1000)})
+                versions[product_id] = product["version"]
+                cache.store(product)
+                continue
+
+            before = Counter(cache.stats)
+            started_at = time.perf_counter()
+            product = cache.get(product_id, products.get_product)
+            latencies.append(time.perf_counter() - started_at)
+            sources.update(Counter(cache.stats) - before)
+            if product["version"] < versions[product_id]:
+                stale += 1
+
+    reads = len(latencies)
+    print(
+        f"  {label:<24} hit {1 - sources['database'] / reads:6.1%} "
+        f"(local {sources['local'] / reads:6.1%}, shared {sources['shared'] / reads:6.1%})  "
+        f"db reads {sources['database']:6d}  stale {stale:4d}  "
+        f"p50 {percentile(latencies, 50) * 1000:5.2f} ms  p95 {percentile(latencies, 95) * 1000:5.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rate", type=float, default=200, help="requests per second on the simulated clock")
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    parser.add_argument("--environments", type=int, default=4)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--local-ttl", type=float, default=2)
+    parser.add_argument("--local-max-entries", type=int, default=1000)
+    parser.add_argument("--dynamodb-endpoint")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    server, endpoint_url = start_dynamodb(args.dynamodb_endpoint)
+    versions = seed(args.products)
+    print(
+        f"{args.requests} requests at {args.rate:g}/s over {args.products} products, "
+        f"{args.write_ratio:.0%} writes, {args.environments} environments"
+    )
+
+    run(args, "database only", versions, 0)
+    run(args, f"local ({args.local_ttl:g}s)", versions, args.local_ttl)
+    run(args, "shared", versions, 0, endpoint_url)
+    run(args, f"local ({args.local_ttl:g}s) + shared", versions, args.local_ttl, endpoint_url)
+
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM products WHERE id = ANY(%s)", (list(versions),))
+    if server is not None:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
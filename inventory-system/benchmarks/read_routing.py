@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Checks read/write splitting against a local primary and streaming replica.
+
+Needs a second PostgreSQL instance replicating from the local one. With the
+server binaries on PATH and the primary on port 5432:
+
+    pg_basebackup -h localhost -U postgres -D /tmp/inventory-replica -R -X stream
+    echo "port = 5433" >> /tmp/inventory-replica/postgresql.auto.conf
+    echo "recovery_min_apply_delay = '1s'" >> /tmp/inventory-replica/postgresql.auto.conf
+    pg_ctl -D /tmp/inventory-replica -l /tmp/inventory-replica/log start
+
+The apply delay makes the replica lag visible. The script runs the handlers
+in-process and checks that:
+
+- read-only transactions run on the replica and the others on the primary;
+- a read right after a write misses it on the replica, and sees it when the
+  request carries the X-Inventory-Last-Write header or cookie of the write;
+- reads fall back to the primary when the replica refuses connections, and
+  after the replica drops an open connection, and go back to the replica
+  once DB_REPLICA_RETRY_AFTER_SECONDS has passed.
+
+Usage:
+    DB_PASSWORD=postgres DB_READ_HOSTS=localhost:5433 python benchmarks/read_routing.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda_src" / "crud"))
+# Without the local cache, as in prod; it would otherwise serve this process its own writes
+os.environ["PRODUCT_CACHE_TTL_SECONDS"] = "0"
+
+import api  # noqa: E402
+import db  # noqa: E402
+import router  # noqa: E402
+
+SKU_PREFIX = "ROUTING-"
+failures = []
+
+
+def check(description, passed, detail=""):
+    print(f"  {'ok    ' if passed else 'FAILED'} {description}{f' ({detail})' if detail else ''}")
+    if not passed:
+        failures.append(description)
+
+
+def request(method, resource, body=None, headers=None, **path):
+    result = router.lambda_handler({
+        "httpMethod": method,
+        "resource": resource,
+        "headers": headers or {},
+        "pathParameters": {name: str(value) for name, value in path.items()},
+        "body": json.dumps(body) if body is not None else None
+    }, None)
+    return result, json.loads(result["body"]) if result["body"] else None
+
+
+def served_by_replica(read_only):
+    with db.transaction(read_only) as cursor:
+        cursor.execute("SELECT pg_is_in_recovery() AS replica")
+        return cursor.fetchone()["replica"]
+
+
+def check_routing():
+    print("routing")
+    check("read-only transaction runs on the replica", served_by_replica(True))
+    check("other transactions run on the primary", not served_by_replica(False))
+
+
+def check_read_your_writes():
+    print("read-your-writes")
+    created, product = request(
+        "POST", "/products", {"sku": f"{SKU_PREFIX}{time.time_ns()}", "name": "Routing check", "price": 1}
+    )
+    header = created["headers"][api.LAST_WRITE_HEADER]
+    check("write response carries the write time", header.isdigit(), f"{api.LAST_WRITE_HEADER}: {header}")
+    cookie = created["headers"]["Set-Cookie"].split(";")[0]
+
+    stale, _ = request("GET", "/products/{product_id}", product_id=product["id"])
+    check("read without the header misses the write on the lagging replica", stale["statusCode"] == 404)
+    fresh, _ = request(
+        "GET", "/products/{product_id}", headers={api.LAST_WRITE_HEADER: header}, product_id=product["id"]
+    )
+    check("read with the header sees the write", fresh["statusCode"] == 200)
+    fresh, _ = request("GET", "/products/{product_id}", headers={"Cookie": cookie}, product_id=product["id"])
+    check("read with the cookie sees the write", fresh["statusCode"] == 200)
+
+    started_at = time.perf_counter()
+    while request("GET", "/products/{product_id}", product_id=product["id"])[0]["statusCode"] != 200:
+        time.sleep(0.05)
+    check("replica catches up", True, f"after {time.perf_counter() - started_at:.2f} s")
+
+    old = str(int(header) - (api.READ_YOUR_WRITES_SECONDS + 1) * 1000)
+    request("PUT", "/products/{product_id}", {"name": "Routing check, renamed"}, product_id=product["id"])
+    _, body = request("GET", "/products/{product_id}", headers={api.LAST_WRITE_HEADER: old}, product_id=product["id"])
+    check("a write time past the window reads from the replica again", body["name"] == "Routing check")
+    return product["id"]
+
+
+def check_fallback(replica_hosts):
+    print("fallback")
+    db._read_connection.close()
+    db._read_connection = None
+    db.DB_READ_HOSTS = ["localhost:1"]
+    started_at = time.perf_counter()
+    replica = served_by_replica(True)
+    elapsed = time.perf_counter() - started_at
+    check("replica refusing connections: read runs on the primary", not replica, f"first read {elapsed * 1000:.1f} ms")
+    started_at = time.perf_counter()
+    served_by_replica(True)
+    check(
+        "the replica is skipped by later reads",
+        time.perf_counter() - started_at < 0.05,
+        f"next read {(time.perf_counter() - started_at) * 1000:.1f} ms"
+    )
+
+    db.DB_READ_HOSTS = replica_hosts
+    db._replica_down_until.clear()
+    check("a reachable replica is used again after the retry period", served_by_replica(True))
+
+    # The replica drops the connection, as on a restart or failover
+    name, _, port = db._read_host.partition(":")
+    admin = db.open_connection(name, int(port or db.DB_PORT))
+    with admin.cursor() as cursor:
+        cursor.execute("SELECT pg_terminate_backend(%s)", (db._read_connection.get_backend_pid(),))
+    admin.close()
+    try:
+        served_by_replica(True)
+        failed = False
+    except db.psycopg2.OperationalError:
+        failed = True
+    check("a read on a dropped replica connection fails once", failed)
+    check("the next read runs on the primary", not served_by_replica(True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+    if not db.DB_READ_HOSTS:
+        sys.exit("Set DB_READ_HOSTS to the replica, e.g. localhost:5433")
+    replica_hosts = db.DB_READ_HOSTS
+
+    product_id = None
+    try:
+        check_routing()
+        product_id = check_read_your_writes()
+        check_fallback(replica_hosts)
+    finally:
+        if product_id is not None:
+            request("DELETE", "/products/{product_id}", product_id=product_id)
+    if failures:
+        sys.exit(f"{len(failures)} checks failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Search latency by mode, and the write cost of the search indexes.
+
+Seeds --products rows with generated catalogue names in a local PostgreSQL
+(schema applied with lambda_src/crud/migrate.py). Then:
+
+- Times products.search_products for a set of terms per mode, --repeat times
+  each, and reports p50/p95 with the number of matching rows. The same
+  substring terms are also run as a plain ILIKE on a copy of the table without
+  trigram indexes, which is what a search costs without them.
+- Copies the table layout into scratch tables without search indexes, with
+  only the tsvector column, with only the trigram indexes, and with both.
+  Each copy takes a --batch-rows INSERT ... SELECT and --updates single-row
+  name updates, and the insert rate and update latency are compared.
+
+Like the schema (migrations/0005), the substring and fuzzy modes need
+pg_trgm, so the server needs the contrib modules, e.g. the postgres:16 image.
+
+Usage:
+    DB_PASSWORD=postgres python benchmarks/search.py [--products 1000000] [--repeat 20]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda_src" / "crud"))
+
+import db  # noqa: E402
+import products  # noqa: E402
+
+SKU_PREFIX = "SEARCH-"
+SEED_SQL = """
+INSERT INTO products (sku, name, description, category, price, quantity)
+SELECT
+    %(prefix)s || lpad(n::text, 7, '0'),
+    brands[1 + floor(random() * 10)::int] || ' ' || adjective || ' ' || material || ' ' || noun
+        || ' ' || upper(substr(md5(n::text), 1, 6)),
+    'A ' || lower(adjective) || ' ' || lower(noun) || ' made of ' || lower(material) || ' for everyday use.',
+    categories[1 + floor(random() * 8)::int],
+    round((random() * 500)::numeric, 2),
+    (random() * 200)::int
+FROM generate_series(1, %(count)s) AS n,
+    LATERAL (SELECT
+        (ARRAY['Stainless', 'Insulated', 'Compact', 'Portable', 'Wireless', 'Ergonomic', 'Heavy-Duty',
+               'Lightweight', 'Waterproof', 'Adjustable', 'Foldable', 'Rechargeable'])[1 + floor(random() * 12)::int] AS adjective,
+        (ARRAY['Steel', 'Bamboo', 'Aluminium', 'Leather', 'Cotton', 'Ceramic', 'Glass', 'Silicone', 'Oak',
+               'Carbon'])[1 + floor(random() * 10)::int] AS material,
+        (ARRAY['Water Bottle', 'Backpack', 'Desk Lamp', 'Keyboard', 'Headphones', 'Frying Pan', 'Office Chair',
+               'Notebook', 'Umbrella', 'Thermos', 'Cutting Board', 'Phone Case', 'Yoga Mat', 'Coffee Grinder',
+               'Toolbox', 'Blender', 'Tent', 'Sunglasses', 'Wall Clock', 'Speaker'])[1 + floor(random() * 20)::int] AS noun
+        -- Referencing n makes the words random per row rather than once per query
+        WHERE n > 0
+    ) AS words,
+    (SELECT
+        ARRAY['Acme', 'Northwind', 'Contoso', 'Globex', 'Initech', 'Umbrella', 'Stark', 'Wayne', 'Hooli', 'Vandelay'] AS brands,
+        ARRAY['kitchen', 'outdoor', 'office', 'electronics', 'travel', 'fitness', 'home', 'tools'] AS categories
+    ) AS lists
+"""
+TERMS = {
+    "text": ["thermos", "insulated steel thermos", "heavy-duty toolbox", "headphone -wireless", "{model}", "{sku}"],
+    "substring": ["ottl", "ackpac", "{model}", "{sku_part}"],
+    "fuzzy": ["thermso", "bakpack", "hedphones", "{model_typo}"]
+}
+SCRATCH_VARIANTS = [
+    ("no search indexes", False, False),
+    ("tsvector", True, False),
+    ("trigram", False, True),
+    ("tsvector + trigram", True, True)
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def execute_autocommit(sql):
+    connection = db.get_connection()
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+    finally:
+        connection.autocommit = False
+
+
+def seed(count):
+    with db.transaction() as cursor:
+        cursor.execute("SELECT count(*) AS seeded FROM products WHERE sku LIKE %s", (f"{SKU_PREFIX}%",))
+        if cursor.fetchone()["seeded"] != count:
+            cursor.execute("DELETE FROM products WHERE sku LIKE %s", (f"{SKU_PREFIX}%",))
+            cursor.execute("SELECT setseed(0.3)")
+            cursor.execute(SEED_SQL, {"prefix": SKU_PREFIX, "count": count})
+        cursor.execute(
+            "SELECT sku, split_part(name, ' ', -1) AS model FROM products WHERE sku LIKE %s ORDER BY sku LIMIT 1 OFFSET %s",
+            (f"{SKU_PREFIX}%", count // 2)
+        )
+        sample = cursor.fetchone()
+    execute_autocommit("VACUUM ANALYZE products")
+    model = sample["model"]
+    return {
+        "sku": sample["sku"],
+        "sku_part": sample["sku"][-5:],
+        "model": model,
+        "model_typo": model[:2] + model[3] + model[2] + model[4:]
+    }
+
+
+def time_search(term, mode, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        rows = products.search_products(term, mode)
+        latencies.append(time.perf_counter() - started_at)
+    return latencies, len(rows)
+
+
+def count_matches(term, mode):
+    condition, _ = products.SEARCH_MODES[mode]
+    pattern = "%" + term + "%"
+    with db.transaction() as cursor:
+        cursor.execute(f"SELECT count(*) AS matches FROM products WHERE {condition}", {"query": term, "pattern": pattern})
+        return cursor.fetchone()["matches"]
+
+
+def run_searches(samples, repeat):
+    print(f"search latency, {repeat} runs per term")
+    for mode, terms in TERMS.items():
+        for term in terms:
+            term = term.format(**samples)
+            latencies, returned = time_search(term, mode, repeat)
+            print(
+                f"  {mode:<9} {term!r:<28} matches {count_matches(term, mode):7d}  "
+                f"p50 {percentile(latencies, 50) * 1000:7.2f} ms  p95 {percentile(latencies, 95) * 1000:7.2f} ms"
+            )
+
+
+def run_ilike_baseline(samples, repeat):
+    """Substring terms as ILIKE on a copy of products without any trigram index"""
+    with db.transaction() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS search_bench_plain")
+        cursor.execute("CREATE TABLE search_bench_plain AS SELECT id, sku, name FROM products")
+    execute_autocommit("VACUUM ANALYZE search_bench_plain")
+    print("ILIKE without trigram indexes (sequential scan)")
+    for term in TERMS["substring"]:
+        term = term.format(**samples)
+        latencies = []
+        for _ in range(max(3, repeat // 4)):
+            started_at = time.perf_counter()
+            with db.transaction() as cursor:
+                cursor.execute(
+                    "SELECT id FROM search_bench_plain WHERE name ILIKE %(pattern)s OR sku ILIKE %(pattern)s "
+                    "ORDER BY name LIMIT 20",
+                    {"pattern": f"%{term}%"}
+                )
+                cursor.fetchall()
+            latencies.append(time.perf_counter() - started_at)
+        print(f"  substring {term!r:<28} p50 {statistics.median(latencies) * 1000:7.2f} ms")
+    with db.transaction() as cursor:
+        cursor.execute("DROP TABLE search_bench_plain")
+
+
+def scratch_table(name, tsvector, trigram):
+    """Empty copy of products with all of its indexes, minus the search ones not wanted"""
+    with db.transaction() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {name}")
+        cursor.execute(f"CREATE TABLE {name} (LIKE products INCLUDING ALL)")
+        if not tsvector:
+            cursor.execute(f"ALTER TABLE {name} DROP COLUMN search_vector")
+        if not trigram:
+            cursor.execute(
+                "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexdef LIKE '%%gin_trgm_ops%%'", (name,)
+            )
+            for row in cursor.fetchall():
+                cursor.execute(f"DROP INDEX {row['indexname']}")
+
+
+def run_write_cost(batch_rows, updates):
+    print(f"write cost: INSERT ... SELECT of {batch_rows} rows, then {updates} single-row name updates")
+    for label, with_tsvector, with_trigram in SCRATCH_VARIANTS:
+        scratch_table("search_bench_writes", with_tsvector, with_trigram)
+        started_at = time.perf_counter()
+        with db.transaction() as cursor:
+            cursor.execute(
+                "INSERT INTO search_bench_writes (sku, name, description, category, price, quantity) "
+                "SELECT sku, name, description, category, price, quantity FROM products "
+                "WHERE sku LIKE %s ORDER BY sku LIMIT %s",
+                (f"{SKU_PREFIX}%", batch_rows)
+            )
+            cursor.execute("SELECT min(id) AS first_id, max(id) AS last_id FROM search_bench_writes")
+            ids = cursor.fetchone()
+        insert_rate = batch_rows / (time.perf_counter() - started_at)
+
+        latencies = []
+        step = max(1, (ids["last_id"] - ids["first_id"]) // updates)
+        for n in range(updates):
+            started_at = time.perf_counter()
+            with db.transaction() as cursor:
+                cursor.execute(
+                    "UPDATE search_bench_writes SET name = name || ' v2' WHERE id = %s", (ids["first_id"] + n * step,)
+                )
+            latencies.append(time.perf_counter() - started_at)
+        print(
+            f"  {label:<20} insert {insert_rate:9.0f} rows/s  "
+            f"update p50 {percentile(latencies, 50) * 1000:6.2f} ms  p95 {percentile(latencies, 95) * 1000:6.2f} ms"
+        )
+    with db.transaction() as cursor:
+        cursor.execute("DROP TABLE search_bench_writes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--batch-rows", type=int, default=100000)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows for the next run")
+    args = parser.parse_args()
+
+    samples = seed(args.products)
+    print(f"{args.products} products")
+    run_searches(samples, args.repeat)
+    run_ilike_baseline(samples, args.repeat)
+    run_write_cost(min(args.batch_rows, args.products), args.updates)
+
+    if not args.keep:
+        with db.transaction() as cursor:
+            cursor.execute("DELETE FROM products WHERE sku LIKE %s", (f"{SKU_PREFIX}%",))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Selling hot products from many workers at once, by concurrency strategy.
+
+Seeds --hot products with --stock units each in a local PostgreSQL (schema
+applied with lambda_src/crud/migrate.py). Every scenario restocks them and
+starts --workers processes, each with its own connection, that sell one unit
+of a random hot product at a time until everything is sold out:
+
+- read-modify-write: get_product, then update_product with quantity - 1.
+  This is what a client of PUT /products/{id} does, and it loses updates.
+- optimistic: the same, with expected_version, retried on a version conflict.
+- conditional: stock.adjust_stock(-1), the POST /products/{id}/stock path.
+
+A worker stops after --misses sold-out answers in a row, or after --seconds.
+Units sold minus the units the stock actually went down by are the oversells.
+
+The last two scenarios take --items hot products per order in random order:
+stock.reserve_stock, which locks them in id order, against the same updates
+made row by row in the order given, which deadlocks. Each deadlock costs the
+server's deadlock_timeout (1 s by default) before one of the orders fails.
+
+Usage:
+    DB_PASSWORD=postgres python benchmarks/stock_contention.py [--workers 16] [--hot 5] [--stock 2000]
+"""
+import argparse
+import multiprocessing
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda_src" / "crud"))
+
+import db  # noqa: E402
+import products  # noqa: E402
+import stock  # noqa: E402
+from api import Conflict  # noqa: E402
+from psycopg2.errors import DeadlockDetected  # noqa: E402
+
+SKU_PREFIX = "CONTENTION-"
+
+
+def read_modify_write(product_id):
+    product = products.get_product(product_id)
+    if product["quantity"] < 1:
+        return "sold out"
+    products.update_product(product_id, {"quantity": product["quantity"] - 1})
+    return "sold"
+
+
+def optimistic(product_id):
+    while True:
+        product = products.get_product(product_id)
+        if product["quantity"] < 1:
+            return "sold out"
+        try:
+            products.update_product(product_id, {"quantity": product["quantity"] - 1}, product["version"])
+            return "sold"
+        except Conflict:
+            counts["retries"] += 1
+
+
+def conditional(product_id):
+    try:
+        stock.adjust_stock(product_id, -1)
+        return "sold"
+    except Conflict:
+        return "sold out"
+
+
+def sorted_reservation(product_ids):
+    try:
+        stock.reserve_stock({product_id: 1 for product_id in product_ids})
+        return "sold"
+    except Conflict:
+        return "sold out"
+
+
+def unordered_reservation(product_ids):
+    """Each product updated in the order given, as a naive multi-item order would"""
+    try:
+        with db.transaction() as cursor:
+            for product_id in product_ids:
+                cursor.execute(
+                    "UPDATE products SET quantity = quantity - 1 WHERE id = %s AND quantity >= 1 RETURNING id",
+                    (product_id,)
+                )
+                if cursor.fetchone() is None:
+                    raise Conflict("Insufficient stock")
+        return "sold"
+    except Conflict:
+        return "sold out"
+    except DeadlockDetected:
+        counts["deadlocks"] += 1
+        return "retry"
+
+
+SCENARIOS = {
+    "read-modify-write": (read_modify_write, False),
+    "optimistic": (optimistic, False),
+    "conditional": (conditional, False),
+    "reservation, sorted": (sorted_reservation, True),
+    "reservation, unordered": (unordered_reservation, True)
+}
+counts = {}
+
+
+def worker(scenario, product_ids, args, seed):
+    operation, multi_item = SCENARIOS[scenario]
+    rng = random.Random(seed)
+    counts.update(sold=0, retries=0, deadlocks=0)
+    misses = 0
+    deadline = time.perf_counter() + args.seconds
+    while misses < args.misses and time.perf_counter() < deadline:
+        target = rng.sample(product_ids, args.items) if multi_item else rng.choice(product_ids)
+        outcome = operation(target)
+        if outcome == "sold":
+            counts["sold"] += args.items if multi_item else 1
+            misses = 0
+        elif outcome == "sold out":
+            misses += 1
+    return counts
+
+
+def restock(product_ids, quantity):
+    with db.transaction() as cursor:
+        cursor.execute("UPDATE products SET quantity = %s WHERE id = ANY(%s)", (quantity, product_ids))
+        cursor.execute("SELECT sum(quantity) AS total FROM products WHERE id = ANY(%s)", (product_ids,))
+        return cursor.fetchone()["total"]
+
+
+def remaining(product_ids):
+    with db.transaction() as cursor:
+        cursor.execute("SELECT sum(quantity) AS total FROM products WHERE id = ANY(%s)", (product_ids,))
+        return cursor.fetchone()["total"]
+
+
+def run(scenario, product_ids, args, pool):
+    total = restock(product_ids, args.stock)
+    started_at = time.perf_counter()
+    results = pool.starmap(worker, [(scenario, product_ids, args, n) for n in range(args.workers)])
+    elapsed = time.perf_counter() - started_at
+    sold = sum(result["sold"] for result in results)
+    removed = total - remaining(product_ids)
+    print(
+        f"  {scenario:<23} {sold / elapsed:8.0f} units/s  sold {sold:6d}  stock down by {removed:6d}  "
+        f"oversold {sold - removed:6d}  retries {sum(result['retries'] for result in results):6d}  "
+        f"deadlocks {sum(result['deadlocks'] for result in results):4d}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--hot", type=int, default=5, help="number of hot products")
+    parser.add_argument("--stock", type=int, default=2000, help="units of each hot product")
+    parser.add_argument("--items", type=int, default=3, help="hot products per multi-item order")
+    parser.add_argument("--misses", type=int, default=20, help="sold-out answers in a row before a worker stops")
+    parser.add_argument("--seconds", type=float, default=30, help="time limit per scenario")
+    args = parser.parse_args()
+
+    with db.transaction() as cursor:
+        cursor.execute(
+            "INSERT INTO products (sku, name, price, quantity) "
+            "SELECT %s || n || '-' || %s, 'Hot product ' || n, 9.99, 0 FROM generate_series(1, %s) AS n RETURNING id",
+            (SKU_PREFIX, time.time_ns(), args.hot)
+        )
+        product_ids = [row["id"] for row in cursor.fetchall()]
+
+    print(f"{args.workers} workers, {args.hot} hot products with {args.stock} units each")
+    try:
+        # Spawned workers open their own connections instead of sharing the parent's
+        with multiprocessing.get_context("spawn").Pool(args.workers) as pool:
+            for scenario in SCENARIOS:
+                run(scenario, product_ids, args, pool)
+    finally:
+        with db.transaction() as cursor:
+            cursor.execute(
+                "DELETE FROM stock_reservations WHERE id IN "
+                "(SELECT reservation_id FROM stock_reservation_items WHERE product_id = ANY(%s))",
+                (product_ids,)
+            )
+            cursor.execute("DELETE FROM products WHERE id = ANY(%s)", (product_ids,))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""Write cost of the stock movement ledger and history latency over years of movements.
+
+Seeds --movements synthetic movements spread evenly over the last --years in a
+local PostgreSQL (schema applied with lambda_src/crud/migrate.py), creating the
+monthly partitions they need. The seeded movements belong to negative product
+ids, so they never mix with real ones. Then:
+
+- Times --adjustments stock.adjust_stock calls with the ledger triggers on
+  products enabled and disabled, and a --batch-rows INSERT ... SELECT into
+  products, which is what a bulk import adds.
+- Times movements.list_movements for one product and for all products over
+  several windows, --repeat times each, with the number of partitions the
+  plan reads. One product over all time is what a query without a window costs.
+- Reports the size of the BRIN and per-product indexes, against a btree on
+  created_at built on one partition.
+- Times detaching the oldest partition and exporting it as the archive would.
+
+The seeded partitions and movements are dropped afterwards.
+
+Usage:
+    DB_PASSWORD=postgres python benchmarks/stock_ledger.py [--movements 10000000] [--years 3]
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "lambda_src" / "crud"))
+
+import db  # noqa: E402
+import movements  # noqa: E402
+import stock  # noqa: E402
+
+SKU_PREFIX = "LEDGER-"
+TRIGGERS = ("products_record_created_stock", "products_record_updated_stock")
+SEED_SQL = """
+INSERT INTO stock_movements (product_id, delta, quantity, reason, created_at)
+SELECT
+    -1 - (random() * (%(products)s - 1))::int,
+    delta,
+    (random() * 500)::int,
+    CASE WHEN delta > 0 THEN 'adjustment' ELSE 'reservation' END,
+    %(since)s + (%(until)s - %(since)s) * (n::float8 / %(count)s)
+FROM generate_series(0, %(count)s - 1) AS n,
+    -- Referencing n makes the delta random per row rather than once per query
+    LATERAL (SELECT CASE WHEN random() < 0.3 THEN 1 + (random() * 50)::int ELSE -1 - (random() * 3)::int END
+             AS delta WHERE n >= 0) AS change
+"""
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def execute_autocommit(sql):
+    connection = db.get_connection()
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+    finally:
+        connection.autocommit = False
+
+
+def seed(count, years, products):
+    until = datetime.now(timezone.utc)
+    since = until - timedelta(days=365 * years)
+    created = []
+    with db.transaction() as cursor:
+        month = since
+        while month < until + timedelta(days=31):
+            cursor.execute("SELECT create_stock_movement_partition(%s) AS created", (month,))
+            created.append(cursor.fetchone()["created"])
+            month += timedelta(days=28)
+    started_at = time.perf_counter()
+    with db.transaction() as cursor:
+        cursor.execute(SEED_SQL, {"products": products, "since": since, "until": until, "count": count})
+    elapsed = time.perf_counter() - started_at
+    execute_autocommit("VACUUM ANALYZE stock_movements")
+    return [name for name in created if name is not None], elapsed
+
+
+def set_triggers(enabled):
+    with db.transaction() as cursor:
+        for trigger in TRIGGERS:
+            cursor.execute(f"ALTER TABLE products {'ENABLE' if enabled else 'DISABLE'} TRIGGER {trigger}")
+
+
+def run_write_cost(args):
+    with db.transaction() as cursor:
+        cursor.execute(
+            "INSERT INTO products (sku, name, price, quantity) "
+            "SELECT %s || n || '-' || %s, 'Ledger product ' || n, 9.99, 1000000 "
+            "FROM generate_series(1, 100) AS n RETURNING id",
+            (SKU_PREFIX, time.time_ns())
+        )
+        product_ids = [row["id"] for row in cursor.fetchall()]
+
+    print(
+        f"write cost: {args.adjustments} single adjustments, "
+        f"median of 3 INSERT ... SELECT of {args.batch_rows} products"
+    )
+    latencies = {False: [], True: []}
+    batch_rates = {False: [], True: []}
+    # Alternating, so neither setting always runs on the colder or the more bloated table
+    for round_number in range(3):
+        for enabled in (False, True):
+            set_triggers(enabled)
+            try:
+                for n in range(args.adjustments // 3):
+                    started_at = time.perf_counter()
+                    stock.adjust_stock(product_ids[n % len(product_ids)], -1 if n % 2 else 1)
+                    latencies[enabled].append(time.perf_counter() - started_at)
+                started_at = time.perf_counter()
+                with db.transaction() as cursor:
+                    cursor.execute(
+                        "INSERT INTO products (sku, name, price, quantity) "
+                        "SELECT %s || 'batch-' || n || '-' || %s, 'Ledger batch product', 9.99, 10 "
+                        "FROM generate_series(1, %s) AS n",
+                        (SKU_PREFIX, time.time_ns(), args.batch_rows)
+                    )
+                batch_rates[enabled].append(args.batch_rows / (time.perf_counter() - started_at))
+            finally:
+                set_triggers(True)
+    for label, enabled in (("ledger off", False), ("ledger on", True)):
+        print(
+            f"  {label:<10} adjustment p50 {percentile(latencies[enabled], 50) * 1000:6.2f} ms  "
+            f"p95 {percentile(latencies[enabled], 95) * 1000:6.2f} ms  "
+            f"bulk insert {statistics.median(batch_rates[enabled]):8.0f} rows/s"
+        )
+
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM stock_movements WHERE product_id IN (SELECT id FROM products WHERE sku LIKE %s)",
+                       (f"{SKU_PREFIX}%",))
+        cursor.execute("DELETE FROM products WHERE sku LIKE %s", (f"{SKU_PREFIX}%",))
+    # The deleted movements are in this month's partition, which the history windows read
+    execute_autocommit("VACUUM ANALYZE stock_movements")
+
+
+def partitions_read(since, until, product_id):
+    """Number of partitions in the plan of a history query, after pruning"""
+    condition = "product_id = %(product_id)s AND " if product_id is not None else ""
+    with db.transaction() as cursor:
+        cursor.execute(
+            f"EXPLAIN (FORMAT JSON) SELECT * FROM stock_movements "
+            f"WHERE {condition}created_at >= %(since)s AND created_at < %(until)s "
+            f"ORDER BY created_at DESC, id DESC LIMIT 51",
+            {"since": since, "until": until, "product_id": product_id}
+        )
+        plan = json.dumps(cursor.fetchone()["QUERY PLAN"])
+    return len({piece.split('"')[0] for piece in plan.split('"Relation Name": "')[1:]})
+
+
+def run_history(args):
+    now = datetime.now(timezone.utc)
+    windows = [
+        ("one product, 30 days", -1, timedelta(days=30)),
+        ("one product, 1 year", -1, timedelta(days=365)),
+        ("one product, all time", -1, timedelta(days=365 * (args.years + 1))),
+        ("all products, 1 hour", None, timedelta(hours=1)),
+        ("all products, 1 day", None, timedelta(days=1)),
+        ("all products, 31 days", None, timedelta(days=31))
+    ]
+    print(f"history, first page of 50 and the page after it, {args.repeat} runs each")
+    for label, product_id, window in windows:
+        since, until = now - window, now
+        first, second = [], []
+        for _ in range(args.repeat):
+            started_at = time.perf_counter()
+            rows, after = movements.list_movements(since, until, product_id, limit=50)
+            first.append(time.perf_counter() - started_at)
+            if after is not None:
+                started_at = time.perf_counter()
+                movements.list_movements(since, until, product_id, limit=50, after=after)
+                second.append(time.perf_counter() - started_at)
+        print(
+            f"  {label:<23} partitions {partitions_read(since, until, product_id):3d}  rows {len(rows):3d}  "
+            f"p50 {percentile(first, 50) * 1000:7.2f} ms  p95 {percentile(first, 95) * 1000:7.2f} ms  "
+            f"next page p50 {percentile(second, 50) * 1000 if second else 0:7.2f} ms"
+        )
+
+
+def run_index_sizes(created):
+    with db.transaction() as cursor:
+        cursor.execute(
+            "SELECT (sum(pg_relation_size(indexrelid)) FILTER (WHERE pg_am.amname = 'brin'))::bigint AS brin, "
+            "(sum(pg_relation_size(indexrelid)) FILTER (WHERE pg_am.amname = 'btree'))::bigint AS btree "
+            "FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid JOIN pg_am ON pg_am.oid = pg_class.relam "
+            "WHERE indrelid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = 'stock_movements'::regclass)"
+        )
+        sizes = cursor.fetchone()
+        sample = created[len(created) // 2]
+        cursor.execute(
+            "SELECT pg_relation_size(indexrelid) AS size FROM pg_index "
+            "JOIN pg_class ON pg_class.oid = pg_index.indexrelid JOIN pg_am ON pg_am.oid = pg_class.relam "
+            "WHERE indrelid = %s::regclass AND pg_am.amname = 'brin'",
+            (sample,)
+        )
+        sample_brin = cursor.fetchone()["size"]
+        cursor.execute(f"CREATE INDEX ledger_bench_created_at_btree ON {sample} (created_at)")
+        cursor.execute("SELECT pg_relation_size('ledger_bench_created_at_btree') AS size")
+        sample_btree = cursor.fetchone()["size"]
+        cursor.execute("DROP INDEX ledger_bench_created_at_btree")
+    print("index sizes")
+    print(
+        f"  all partitions: BRIN on created_at {sizes['brin'] / 1e6:8.2f} MB, "
+        f"(product_id, created_at) {sizes['btree'] / 1e6:8.1f} MB"
+    )
+    print(f"  {sample}: BRIN {sample_brin / 1e3:6.0f} kB, a btree on created_at would be {sample_btree / 1e6:6.1f} MB")
+
+
+def run_archive(created):
+    oldest = sorted(created)[0]
+    with db.transaction() as cursor:
+        started_at = time.perf_counter()
+        cursor.execute(f"ALTER TABLE stock_movements DETACH PARTITION {oldest}")
+        detach = time.perf_counter() - started_at
+    started_at = time.perf_counter()
+    with tempfile.TemporaryFile() as spool:
+        rows = movements.export_partition(oldest, spool)
+        size = spool.tell()
+    export = time.perf_counter() - started_at
+    print(
+        f"retention: detach {oldest} {detach * 1000:.1f} ms, "
+        f"export {rows} rows to {size / 1e6:.1f} MB of gzipped CSV in {export:.1f} s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--movements", type=int, default=10000000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--products", type=int, default=10000, help="products the seeded movements belong to")
+    parser.add_argument("--adjustments", type=int, default=5000)
+    parser.add_argument("--batch-rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    created, elapsed = seed(args.movements, args.years, args.products)
+    print(
+        f"{args.movements} movements over {args.years} years in {len(created)} new monthly partitions, "
+        f"seeded at {args.movements / elapsed:.0f} rows/s"
+    )
+    try:
+        run_write_cost(args)
+        run_history(args)
+        run_index_sizes(created)
+        run_archive(created)
+    finally:
+        with db.transaction() as cursor:
+            for name in created:
+                cursor.execute(f"DROP TABLE {name}")
+            cursor.execute("DELETE FROM stock_movements WHERE product_id < 0")
+
+
+if __name__ == "__main__":
+    main()
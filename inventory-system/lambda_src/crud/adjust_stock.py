@@ -0,0 +1,16 @@
+from api import BadRequest, api_handler, int_field, parse_body, path_id, response
+from product_cache import get_product_cache
+from stock import adjust_stock
+
+
+@api_handler
+def lambda_handler(event, context):
+    body = parse_body(event)
+    delta = int_field(body, "delta")
+    if not delta:
+        raise BadRequest("delta must be a non-zero integer")
+    product = adjust_stock(path_id(event), delta, int_field(body, "expected_version"))
+    if product is None:
+        return response(404, {"error": "Product not found"})
+    get_product_cache().store(product)
+    return response(200, product)
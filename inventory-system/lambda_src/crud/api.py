@@ -0,0 +1,166 @@
+"""API Gateway proxy request and response helpers for the CRUD Lambdas"""
+import base64
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from decimal import Decimal
+from functools import wraps
+from http.cookies import CookieError, SimpleCookie
+
+import psycopg2
+import psycopg2.errors
+
+from db import set_primary_reads
+
+# After a write, the client's reads go to the primary for this long, so it sees its
+# own write even on a lagging replica. The write time comes back in a header and a
+# cookie; browsers return the cookie, other clients send the header.
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+LAST_WRITE_HEADER = "X-Inventory-Last-Write"
+LAST_WRITE_COOKIE = "inventory_last_write"
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+logger = logging.getLogger()
+
+
+class BadRequest(Exception):
+    pass
+
+
+class Conflict(Exception):
+    """The request is valid but the current state of the data rejects it; details go into the 409 body"""
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details or {}
+
+
+def to_json(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def response(status_code, body):
+    return {
+        "statusCode": status_code,
+        "headers": {"Content-Type": "application/json"},
+        "body": json.dumps(body, default=to_json) if body is not None else ""
+    }
+
+
+def parse_body(event):
+    try:
+        body = json.loads(event.get("body") or "{}")
+    except json.JSONDecodeError:
+        raise BadRequest("Request body is not valid JSON")
+    if not isinstance(body, dict):
+        raise BadRequest("Request body must be a JSON object")
+    return body
+
+
+def path_id(event, name="product_id"):
+    value = (event.get("pathParameters") or {}).get(name)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f"Invalid {name}: {value}")
+
+
+def int_field(body, name, default=None):
+    value = body.get(name, default)
+    # bool is an int subclass, but true is not a quantity
+    if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+        raise BadRequest(f"{name} must be an integer")
+    return value
+
+
+def query_int(event, name, default=None):
+    value = (event.get("queryStringParameters") or {}).get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest(f"Invalid {name}: {value}")
+
+
+def encode_cursor(value):
+    """Opaque, URL-safe page cursor for a JSON-serializable value"""
+    return base64.urlsafe_b64encode(json.dumps(value, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise BadRequest("Invalid cursor")
+
+
+def last_write_at(event):
+    """Time in ms of the client's last write, from the header or the cookie, or None"""
+    headers = {name.lower(): value for name, value in (event.get("headers") or {}).items()}
+    value = headers.get(LAST_WRITE_HEADER.lower())
+    if value is None and headers.get("cookie"):
+        cookie = SimpleCookie()
+        try:
+            cookie.load(headers["cookie"])
+        except CookieError:
+            return None
+        value = cookie[LAST_WRITE_COOKIE].value if LAST_WRITE_COOKIE in cookie else None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def wrote_recently(event):
+    written_at = last_write_at(event)
+    # Both ways, as the write time comes from another execution environment's clock
+    return written_at is not None and abs(time.time() * 1000 - written_at) < READ_YOUR_WRITES_SECONDS * 1000
+
+
+def mark_write(result):
+    """Add the write time to a successful write's response"""
+    written_at = int(time.time() * 1000)
+    result["headers"][LAST_WRITE_HEADER] = str(written_at)
+    result["headers"]["Set-Cookie"] = (
+        f"{LAST_WRITE_COOKIE}={written_at}; Max-Age={READ_YOUR_WRITES_SECONDS}; Path=/; Secure; HttpOnly; SameSite=Lax"
+    )
+    return result
+
+
+def api_handler(function):
+    """Turn a handler's known errors into 4xx responses and anything else into a 500.
+
+    Reads of a client that wrote in the last READ_YOUR_WRITES_SECONDS go to
+    the primary, and successful writes tell the client when they happened.
+    """
+    @wraps(function)
+    def wrapper(event, context):
+        set_primary_reads(wrote_recently(event))
+        result = handle_errors(function, event, context)
+        if event.get("httpMethod") not in READ_METHODS and result["statusCode"] < 400:
+            mark_write(result)
+        return result
+    return wrapper
+
+
+def handle_errors(function, event, context):
+    try:
+        return function(event, context)
+    except BadRequest as e:
+        return response(400, {"error": str(e)})
+    except Conflict as e:
+        return response(409, {"error": str(e), **e.details})
+    except psycopg2.errors.UniqueViolation:
+        return response(409, {"error": "A product with this SKU already exists"})
+    except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+        return response(400, {"error": "Invalid product data", "details": e.diag.message_primary or str(e)})
+    except Exception as e:
+        logger.exception(f"Request failed: {e}")
+        return response(500, {"error": "Internal server error"})
@@ -0,0 +1,25 @@
+from api import BadRequest, api_handler, response
+from product_cache import get_product_cache
+from products import get_products
+
+# Also the most ids one shared cache read takes
+MAX_IDS = 100
+
+
+@api_handler
+def lambda_handler(event, context):
+    value = (event.get("queryStringParameters") or {}).get("ids") or ""
+    try:
+        product_ids = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise BadRequest(f"Invalid ids: {value}, expected comma-separated product ids")
+    # Repeated ids are looked up once
+    product_ids = list(dict.fromkeys(product_ids))
+    if not 1 <= len(product_ids) <= MAX_IDS:
+        raise BadRequest(f"ids must list 1 to {MAX_IDS} product ids")
+
+    products = get_product_cache().get_many(product_ids, get_products)
+    return response(200, {
+        "items": [products[product_id] for product_id in product_ids if product_id in products],
+        "missing": [product_id for product_id in product_ids if product_id not in products]
+    })
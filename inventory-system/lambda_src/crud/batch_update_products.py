@@ -0,0 +1,33 @@
+from api import BadRequest, api_handler, int_field, parse_body, response
+from product_cache import get_product_cache
+from products import update_products
+
+MAX_ITEMS = 100
+
+
+@api_handler
+def lambda_handler(event, context):
+    items = parse_body(event).get("items")
+    if not isinstance(items, list) or not 1 <= len(items) <= MAX_ITEMS:
+        raise BadRequest(f"items must be a list of 1 to {MAX_ITEMS} items")
+
+    updates = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise BadRequest("Each item must be an object with an id and the fields to update")
+        fields = dict(item)
+        product_id = int_field(fields, "id")
+        expected_version = int_field(fields, "expected_version")
+        if product_id is None:
+            raise BadRequest("Each item needs an id")
+        fields.pop("id")
+        fields.pop("expected_version", None)
+        updates.append((product_id, fields, expected_version))
+    product_ids = [product_id for product_id, _, _ in updates]
+    if len(set(product_ids)) < len(product_ids):
+        raise BadRequest("Each product can only be updated once per batch")
+
+    results = update_products(updates)
+    get_product_cache().store_many([result["product"] for result in results if result["status"] == 200])
+    # 200 even when some items failed; each item carries its own status
+    return response(200, {"items": results})
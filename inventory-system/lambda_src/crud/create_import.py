@@ -0,0 +1,15 @@
+from api import BadRequest, api_handler, parse_body, response
+from product_imports import FORMATS, UPLOAD_URL_EXPIRY_SECONDS, create_import, upload_url
+
+
+@api_handler
+def lambda_handler(event, context):
+    file_format = parse_body(event).get("format", "csv")
+    if file_format not in FORMATS:
+        raise BadRequest(f"Invalid format: {file_format}, expected one of {', '.join(FORMATS)}")
+    product_import = create_import(file_format)
+    return response(201, {
+        "import": product_import,
+        "upload_url": upload_url(product_import),
+        "upload_url_expires_in": UPLOAD_URL_EXPIRY_SECONDS
+    })
@@ -0,0 +1,10 @@
+from api import api_handler, parse_body, response
+from product_cache import get_product_cache
+from products import create_product
+
+
+@api_handler
+def lambda_handler(event, context):
+    product = create_product(parse_body(event))
+    get_product_cache().store(product)
+    return response(201, product)
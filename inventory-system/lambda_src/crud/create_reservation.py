@@ -0,0 +1,30 @@
+from collections import Counter
+
+from api import BadRequest, api_handler, int_field, parse_body, response
+from product_cache import get_product_cache
+from stock import reserve_stock
+
+MAX_ITEMS = 100
+
+
+@api_handler
+def lambda_handler(event, context):
+    items = parse_body(event).get("items")
+    if not isinstance(items, list) or not 1 <= len(items) <= MAX_ITEMS:
+        raise BadRequest(f"items must be a list of 1 to {MAX_ITEMS} items")
+
+    quantities = Counter()
+    for item in items:
+        if not isinstance(item, dict):
+            raise BadRequest("Each item must be an object with product_id and quantity")
+        product_id = int_field(item, "product_id")
+        quantity = int_field(item, "quantity")
+        if product_id is None or quantity is None or quantity <= 0:
+            raise BadRequest("Each item needs a product_id and a positive quantity")
+        quantities[product_id] += quantity
+
+    reservation, products = reserve_stock(quantities)
+    cache = get_product_cache()
+    for product in products:
+        cache.store(product)
+    return response(201, reservation)
@@ -0,0 +1,254 @@
+"""PostgreSQL access shared by the inventory CRUD Lambdas.
+
+The database secret and the connection are kept at module level, so warm
+invocations of the same execution environment reuse them instead of calling
+Secrets Manager and opening a new connection every time.
+
+Read-only transactions go to a read replica when DB_READ_HOSTS lists any.
+Each execution environment keeps one replica connection next to the primary
+one. A replica that cannot be reached is skipped for
+DB_REPLICA_RETRY_AFTER_SECONDS, and reads use the primary meanwhile. Reads
+also use the primary while primary_reads is set, which api_handler does for a
+client that wrote within its read-your-writes window.
+
+Settings come from the environment:
+- DB_HOST, DB_PORT, DB_NAME: instance or RDS Proxy endpoint
+- DB_READ_HOSTS: comma-separated read replica endpoints, as host or host:port (DB_PORT by default)
+- DB_SECRET_ARN: Secrets Manager secret with username and password
+- DB_USER, DB_PASSWORD: used instead of the secret when DB_PASSWORD is set (local PostgreSQL)
+- DB_SSLMODE: libpq sslmode, "require" in AWS (RDS Proxy only accepts TLS)
+"""
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+
+import boto3
+import psycopg2
+import psycopg2.extras
+
+from metrics import put_metrics
+
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = int(os.getenv("DB_PORT", "5432"))
+DB_NAME = os.getenv("DB_NAME", "inventory")
+DB_SECRET_ARN = os.getenv("DB_SECRET_ARN")
+DB_USER = os.getenv("DB_USER", "postgres")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_SSLMODE = os.getenv("DB_SSLMODE", "prefer")
+CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+SECRET_TTL_SECONDS = int(os.getenv("DB_SECRET_TTL_SECONDS", "300"))
+HEALTH_CHECK_AFTER_SECONDS = int(os.getenv("DB_HEALTH_CHECK_AFTER_SECONDS", "30"))
+DB_READ_HOSTS = [host for host in os.getenv("DB_READ_HOSTS", "").split(",") if host]
+# Short, so a replica that is down delays the first read of an environment by little
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("DB_REPLICA_CONNECT_TIMEOUT", "2"))
+REPLICA_RETRY_AFTER_SECONDS = int(os.getenv("DB_REPLICA_RETRY_AFTER_SECONDS", "30"))
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+_secrets_client = None
+_secret = None
+_secret_expires_at = 0.0
+_connection = None
+_last_used_at = 0.0
+_read_connection = None
+_read_host = None
+_read_last_used_at = 0.0
+_replica_down_until = {}
+_primary_reads = False
+
+
+def get_secrets_client():
+    global _secrets_client
+    if _secrets_client is None:
+        _secrets_client = boto3.client("secretsmanager")
+    return _secrets_client
+
+
+def get_credentials(force_refresh=False):
+    """Database username and password, from the cached secret or the local settings"""
+    global _secret, _secret_expires_at
+
+    if DB_PASSWORD is not None:
+        return {"username": DB_USER, "password": DB_PASSWORD}
+
+    now = time.monotonic()
+    if force_refresh or _secret is None or now >= _secret_expires_at:
+        response = get_secrets_client().get_secret_value(SecretId=DB_SECRET_ARN)
+        _secret = json.loads(response["SecretString"])
+        _secret_expires_at = now + SECRET_TTL_SECONDS
+
+    return _secret
+
+
+def connect(credentials, host=DB_HOST, port=DB_PORT, connect_timeout=CONNECT_TIMEOUT):
+    return psycopg2.connect(
+        host=host,
+        port=port,
+        dbname=DB_NAME,
+        user=credentials["username"],
+        password=credentials["password"],
+        sslmode=DB_SSLMODE,
+        connect_timeout=connect_timeout,
+        application_name=os.getenv("AWS_LAMBDA_FUNCTION_NAME", "inventory-local"),
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3
+    )
+
+
+def open_connection(host=DB_HOST, port=DB_PORT, connect_timeout=CONNECT_TIMEOUT):
+    try:
+        return connect(get_credentials(), host, port, connect_timeout)
+    except psycopg2.OperationalError as e:
+        if DB_PASSWORD is not None or "authentication failed" not in str(e):
+            raise
+        # The secret may have been rotated since it was cached
+        logger.info("Authentication failed, refreshing database secret")
+        return connect(get_credentials(force_refresh=True), host, port, connect_timeout)
+
+
+def is_healthy(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        connection.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def discard_connection():
+    global _connection
+    if _connection is not None:
+        try:
+            _connection.close()
+        except psycopg2.Error:
+            pass
+    _connection = None
+
+
+def get_connection():
+    """Warm connection of this execution environment, reopened when closed or unhealthy.
+
+    The health check only runs after the connection sat idle for
+    HEALTH_CHECK_AFTER_SECONDS, which is when a frozen environment may have
+    lost it, so busy environments skip the extra round trip.
+    """
+    global _connection, _last_used_at
+
+    now = time.monotonic()
+    if _connection is not None and (
+        _connection.closed
+        or (now - _last_used_at > HEALTH_CHECK_AFTER_SECONDS and not is_healthy(_connection))
+    ):
+        logger.info("Database connection lost, reconnecting")
+        discard_connection()
+
+    if _connection is None:
+        _connection = open_connection()
+
+    _last_used_at = now
+    return _connection
+
+
+def set_primary_reads(enabled):
+    """Send read-only transactions to the primary too, until called again with False"""
+    global _primary_reads
+    _primary_reads = enabled
+
+
+@contextmanager
+def primary_reads():
+    """Send read-only transactions to the primary inside the block, then restore the routing"""
+    global _primary_reads
+    enabled, _primary_reads = _primary_reads, True
+    try:
+        yield
+    finally:
+        _primary_reads = enabled
+
+
+def mark_replica_down(host):
+    global _read_connection, _read_host
+    logger.warning(f"Read replica {host} is unavailable, reading from the primary for {REPLICA_RETRY_AFTER_SECONDS} s")
+    _replica_down_until[host] = time.monotonic() + REPLICA_RETRY_AFTER_SECONDS
+    put_metrics({"DatabaseReplicaUnavailable": 1})
+    if _read_connection is not None:
+        try:
+            _read_connection.close()
+        except psycopg2.Error:
+            pass
+    _read_connection = None
+    _read_host = None
+
+
+def get_read_connection():
+    """Warm replica connection of this execution environment, or None to read from the primary.
+
+    None when no replica is configured, when primary reads are on, or when
+    every replica failed within the last REPLICA_RETRY_AFTER_SECONDS. Each
+    environment picks a replica at random, which spreads the load across them.
+    """
+    global _read_connection, _read_host, _read_last_used_at
+
+    if not DB_READ_HOSTS or _primary_reads:
+        return None
+    now = time.monotonic()
+    if _read_connection is not None and (
+        _read_connection.closed
+        or (now - _read_last_used_at > HEALTH_CHECK_AFTER_SECONDS and not is_healthy(_read_connection))
+    ):
+        mark_replica_down(_read_host)
+
+    if _read_connection is None:
+        available = [host for host in DB_READ_HOSTS if _replica_down_until.get(host, 0.0) <= now]
+        random.shuffle(available)
+        for host in available:
+            name, _, port = host.partition(":")
+            try:
+                _read_connection = open_connection(name, int(port or DB_PORT), REPLICA_CONNECT_TIMEOUT)
+                _read_host = host
+                break
+            except psycopg2.OperationalError as e:
+                logger.warning(f"Could not connect to read replica {host}: {e}")
+                mark_replica_down(host)
+        else:
+            return None
+
+    _read_last_used_at = now
+    return _read_connection
+
+
+@contextmanager
+def transaction(read_only=False):
+    """Cursor returning dict rows, committed on success and rolled back on error.
+
+    A read_only transaction runs on a read replica when one is available, so
+    it may not see writes made in the last moments (the replica lag).
+    """
+    connection = get_read_connection() if read_only else None
+    on_replica = connection is not None
+    if not on_replica:
+        connection = get_connection()
+    try:
+        with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            yield cursor
+        connection.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        # The connection itself failed; the next invocation opens a new one
+        if not on_replica:
+            discard_connection()
+        elif connection.closed:
+            mark_replica_down(_read_host)
+        else:
+            # e.g. a query cancelled by a conflict with replay; the replica itself is fine
+            connection.rollback()
+        raise
+    except Exception:
+        connection.rollback()
+        raise
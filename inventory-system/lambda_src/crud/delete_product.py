@@ -0,0 +1,13 @@
+from api import api_handler, path_id, response
+from product_cache import get_product_cache
+from products import delete_product
+
+
+@api_handler
+def lambda_handler(event, context):
+    product_id = path_id(event)
+    deleted = delete_product(product_id)
+    if deleted is None:
+        return response(404, {"error": "Product not found"})
+    get_product_cache().evict(product_id, deleted["version"])
+    return response(204, None)
@@ -0,0 +1,10 @@
+from api import api_handler, path_id, query_int, response
+from product_imports import get_import
+
+
+@api_handler
+def lambda_handler(event, context):
+    product_import = get_import(path_id(event, "import_id"), query_int(event, "errors_after_line", 0))
+    if product_import is None:
+        return response(404, {"error": "Import not found"})
+    return response(200, product_import)
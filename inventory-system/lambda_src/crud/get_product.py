@@ -0,0 +1,11 @@
+from api import api_handler, path_id, response
+from product_cache import get_product_cache
+from products import get_product
+
+
+@api_handler
+def lambda_handler(event, context):
+    product = get_product_cache().get(path_id(event), get_product)
+    if product is None:
+        return response(404, {"error": "Product not found"})
+    return response(200, product)
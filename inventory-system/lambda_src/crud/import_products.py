@@ -0,0 +1,23 @@
+"""Runs a product import when its file is uploaded; triggered by S3 object-created events"""
+import logging
+from urllib.parse import unquote_plus
+
+from product_cache import get_product_cache
+from product_imports import import_object
+
+logger = logging.getLogger()
+
+
+def lambda_handler(event, context):
+    for record in event["Records"]:
+        result = import_object(record["s3"]["bucket"]["name"], unquote_plus(record["s3"]["object"]["key"]))
+        if result is None:
+            continue
+        product_import, updated_versions = result
+        logger.info(
+            f"Import {product_import['id']}: {product_import['rows_total']} rows, "
+            f"{product_import['rows_inserted']} inserted, {product_import['rows_updated']} updated, "
+            f"{product_import['rows_failed']} failed"
+        )
+        # Only once the import committed; a tombstone written earlier could be passed by a read of the old row
+        get_product_cache().invalidate(updated_versions)
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+
+from api import BadRequest, api_handler, decode_cursor, encode_cursor, query_int, response
+from movements import REASONS, list_movements
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+# Across all products a window is read in full to sort it, so it stays short
+DEFAULT_WINDOW = timedelta(days=1)
+MAX_WINDOW = timedelta(days=31)
+
+
+def time_param(params, name):
+    value = params.get(name)
+    if value is None:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f"Invalid {name}: {value}, expected an ISO 8601 time")
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+
+def movements_page(event, product_id=None, default_window=DEFAULT_WINDOW, max_window=MAX_WINDOW):
+    """One page of movements in the window given by the from and to parameters, newest first.
+
+    to defaults to now and from to default_window before it. The cursor
+    carries the window, so later pages keep it even when the parameters are
+    left out, and it carries the reason filter, which must not change.
+    """
+    params = event.get("queryStringParameters") or {}
+    limit = query_int(event, "limit", DEFAULT_LIMIT)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise BadRequest(f"Invalid limit: {limit}, expected 1 to {MAX_LIMIT}")
+    reason = params.get("reason")
+    if reason is not None and reason not in REASONS:
+        raise BadRequest(f"Invalid reason: {reason}, expected one of {', '.join(REASONS)}")
+    since, until = time_param(params, "from"), time_param(params, "to")
+
+    after = None
+    if params.get("cursor"):
+        cursor = decode_cursor(params["cursor"])
+        if not isinstance(cursor, dict) or cursor.get("reason") != reason:
+            raise BadRequest("Cursor does not match the filters of this request")
+        try:
+            window = (datetime.fromisoformat(cursor["from"]), datetime.fromisoformat(cursor["to"]))
+        except (KeyError, TypeError, ValueError):
+            raise BadRequest("Invalid cursor")
+        if any(moment.tzinfo is None for moment in window):
+            raise BadRequest("Invalid cursor")
+        if since not in (None, window[0]) or until not in (None, window[1]):
+            raise BadRequest("Cursor does not match the window of this request")
+        since, until = window
+        after = cursor.get("after")
+        if not isinstance(after, list) or len(after) != 2 or not all(isinstance(value, str) for value in after):
+            raise BadRequest("Invalid cursor")
+    else:
+        until = until or datetime.now(timezone.utc)
+        since = since or until - default_window
+    if since >= until:
+        raise BadRequest("from must be before to")
+    if until - since > max_window:
+        raise BadRequest(f"from and to can be at most {max_window.days} days apart")
+
+    try:
+        movements, next_after = list_movements(since, until, product_id, reason, limit, after)
+    except psycopg2.DataError:
+        # The window and filters are validated above, so only cursor values can fail to cast
+        raise BadRequest("Invalid cursor")
+    query = {"from": since.isoformat(), "to": until.isoformat(), "reason": reason}
+    return response(200, {
+        **query,
+        "items": movements,
+        "next_cursor": encode_cursor({**query, "after": next_after}) if next_after is not None else None
+    })
+
+
+@api_handler
+def lambda_handler(event, context):
+    return movements_page(event)
@@ -0,0 +1,13 @@
+from datetime import timedelta
+
+from api import api_handler, path_id
+from list_movements import movements_page
+
+# One product's movements come from its own index entries, so a longer window stays cheap
+DEFAULT_WINDOW = timedelta(days=30)
+MAX_WINDOW = timedelta(days=366)
+
+
+@api_handler
+def lambda_handler(event, context):
+    return movements_page(event, path_id(event), DEFAULT_WINDOW, MAX_WINDOW)
@@ -0,0 +1,68 @@
+from decimal import Decimal, InvalidOperation
+
+import psycopg2
+
+from api import BadRequest, api_handler, decode_cursor, encode_cursor, query_int, response
+from products import SORT_KEYS, STOCK_CONDITIONS, list_products
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+FILTERS = ("category", "min_price", "max_price", "stock")
+
+
+def price_param(params, name):
+    value = params.get(name)
+    if value is None:
+        return None
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise BadRequest(f"Invalid {name}: {value}")
+    if not price.is_finite():
+        raise BadRequest(f"Invalid {name}: {value}")
+    return price
+
+
+@api_handler
+def lambda_handler(event, context):
+    params = event.get("queryStringParameters") or {}
+    sort = params.get("sort", "id")
+    sort_key = sort.removeprefix("-")
+    if sort_key not in SORT_KEYS:
+        raise BadRequest(f"Invalid sort: {sort}, expected one of {', '.join(SORT_KEYS)}, optionally prefixed with -")
+    limit = query_int(event, "limit", DEFAULT_LIMIT)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise BadRequest(f"Invalid limit: {limit}, expected 1 to {MAX_LIMIT}")
+    if params.get("stock") is not None and params["stock"] not in STOCK_CONDITIONS:
+        raise BadRequest(f"Invalid stock: {params['stock']}, expected one of {', '.join(STOCK_CONDITIONS)}")
+
+    # The cursor carries the sort and filters it was issued for, so a page is never read with different ones
+    query = {"sort": sort, "filters": {name: params[name] for name in FILTERS if params.get(name) is not None}}
+    after = None
+    if params.get("cursor"):
+        cursor = decode_cursor(params["cursor"])
+        if not isinstance(cursor, dict) or {key: cursor.get(key) for key in query} != query:
+            raise BadRequest("Cursor does not match the sort and filters of this request")
+        after = cursor.get("after")
+        if (
+            not isinstance(after, list)
+            or len(after) != len(SORT_KEYS[sort_key])
+            or not all(isinstance(value, str) for value in after)
+        ):
+            raise BadRequest("Invalid cursor")
+
+    filters = {
+        "category": params.get("category"),
+        "min_price": price_param(params, "min_price"),
+        "max_price": price_param(params, "max_price"),
+        "stock": params.get("stock")
+    }
+    try:
+        products, next_after = list_products(filters, sort_key, sort.startswith("-"), limit, after)
+    except psycopg2.DataError:
+        # The filters are validated above, so only cursor values can fail to cast
+        raise BadRequest("Invalid cursor")
+    return response(200, {
+        "items": products,
+        "next_cursor": encode_cursor({**query, "after": next_after}) if next_after is not None else None
+    })
@@ -0,0 +1,16 @@
+"""Keeps the stock movement partitions current; runs daily on a schedule"""
+import json
+import logging
+
+from movements import maintain_partitions
+
+logger = logging.getLogger()
+
+
+def lambda_handler(event, context):
+    result = maintain_partitions()
+    logger.info(
+        f"Stock movement partitions: created {result['created'] or 'none'}, "
+        f"detached {result['detached'] or 'none'}, archived {list(result['archived']) or 'none'}"
+    )
+    return {"statusCode": 200, "body": json.dumps(result)}
@@ -0,0 +1,25 @@
+import json
+import os
+import time
+
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "InventorySystem")
+
+
+def put_metrics(values, unit="Count", dimensions=None):
+    """Emit several metrics sharing a unit and dimensions as one Embedded Metric Format record"""
+    dimensions = dimensions or {}
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [list(dimensions.keys())],
+                    "Metrics": [{"Name": name, "Unit": unit} for name in values]
+                }
+            ]
+        },
+        **values,
+        **dimensions
+    }
+    print(json.dumps(record))
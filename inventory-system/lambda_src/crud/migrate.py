@@ -0,0 +1,58 @@
+"""Applies the SQL files in migrations/ in name order, each once.
+
+Runs as a deployment trigger in AWS and from the command line against a
+local PostgreSQL (configured through the DB_* variables read by db.py):
+
+    DB_PASSWORD=postgres python lambda_src/crud/migrate.py
+"""
+import json
+import logging
+from pathlib import Path
+
+import db
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+# Serializes concurrent runs (e.g. two deployments) on the same database
+MIGRATION_LOCK_ID = 7410
+
+logger = logging.getLogger()
+
+
+def apply_migrations(connection):
+    applied = []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        try:
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version TEXT PRIMARY KEY, applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+            )
+            cursor.execute("SELECT version FROM schema_migrations")
+            done = {row[0] for row in cursor.fetchall()}
+            connection.commit()
+
+            for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+                if path.stem in done:
+                    continue
+                logger.info(f"Applying migration {path.name}")
+                cursor.execute(path.read_text())
+                cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (path.stem,))
+                connection.commit()
+                applied.append(path.stem)
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            connection.commit()
+    return applied
+
+
+def lambda_handler(event, context):
+    applied = apply_migrations(db.get_connection())
+    return {"statusCode": 200, "body": json.dumps({"applied": applied})}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Applied: {apply_migrations(db.get_connection()) or 'nothing, schema is up to date'}")
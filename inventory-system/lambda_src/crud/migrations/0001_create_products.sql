@@ -0,0 +1,27 @@
+CREATE TABLE IF NOT EXISTS products (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    sku TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    description TEXT,
+    category TEXT,
+    price NUMERIC(12, 2) NOT NULL CHECK (price >= 0),
+    quantity INTEGER NOT NULL DEFAULT 0 CHECK (quantity >= 0),
+    version INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Every update bumps updated_at and the row version, whichever code path wrote it
+CREATE OR REPLACE FUNCTION products_touch() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := now();
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_touch ON products;
+CREATE TRIGGER products_touch
+    BEFORE UPDATE ON products
+    FOR EACH ROW
+    EXECUTE FUNCTION products_touch();
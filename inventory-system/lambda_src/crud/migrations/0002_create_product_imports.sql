@@ -0,0 +1,23 @@
+CREATE TABLE IF NOT EXISTS product_imports (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    format TEXT NOT NULL CHECK (format IN ('csv', 'ndjson')),
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'completed', 'failed')),
+    rows_total INTEGER,
+    rows_inserted INTEGER,
+    rows_updated INTEGER,
+    rows_unchanged INTEGER,
+    rows_failed INTEGER,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+
+-- One row per rejected input line, all of its problems joined in error
+CREATE TABLE IF NOT EXISTS product_import_errors (
+    import_id BIGINT NOT NULL REFERENCES product_imports (id) ON DELETE CASCADE,
+    line INTEGER NOT NULL,
+    sku TEXT,
+    error TEXT NOT NULL,
+    PRIMARY KEY (import_id, line)
+);
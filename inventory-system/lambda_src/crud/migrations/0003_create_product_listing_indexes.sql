@@ -0,0 +1,19 @@
+-- Indexes for GET /products, one per sort key with and without a category filter.
+-- Each ends in id, the keyset tie-breaker, and includes the remaining filter
+-- columns, so a page of ids is found with an index-only scan and only the
+-- rows on the page are read from the table. Descending sorts scan them backwards.
+-- Sorting by id without a category uses the primary key.
+CREATE INDEX IF NOT EXISTS products_category_id_idx
+    ON products (category, id) INCLUDE (price, quantity);
+
+CREATE INDEX IF NOT EXISTS products_price_id_idx
+    ON products (price, id) INCLUDE (category, quantity);
+
+CREATE INDEX IF NOT EXISTS products_category_price_id_idx
+    ON products (category, price, id) INCLUDE (quantity);
+
+CREATE INDEX IF NOT EXISTS products_name_id_idx
+    ON products (name, id) INCLUDE (category, price, quantity);
+
+CREATE INDEX IF NOT EXISTS products_category_name_id_idx
+    ON products (category, name, id) INCLUDE (price, quantity);
@@ -0,0 +1,10 @@
+-- Full-text search document for GET /products/search. SKUs are indexed with the
+-- simple configuration so their parts are not stemmed.
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', sku), 'A')
+    || setweight(to_tsvector('english', name), 'A')
+    || setweight(to_tsvector('english', coalesce(category, '')), 'B')
+    || setweight(to_tsvector('english', coalesce(description, '')), 'C')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS products_search_vector_idx ON products USING gin (search_vector);
@@ -0,0 +1,8 @@
+-- Trigram indexes for substring (ILIKE) and fuzzy (word similarity) search on names and SKUs.
+-- pg_trgm ships with RDS PostgreSQL. A local server needs the contrib modules, or this
+-- migration fails and none after it is applied.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS products_name_trgm_idx ON products USING gin (name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS products_sku_trgm_idx ON products USING gin (sku gin_trgm_ops);
@@ -0,0 +1,15 @@
+CREATE TABLE IF NOT EXISTS stock_reservations (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'active' CHECK (status IN ('active', 'released')),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    released_at TIMESTAMPTZ
+);
+
+-- No foreign key to products: deleting a product keeps the reservation history,
+-- and releasing the reservation skips the product that is gone
+CREATE TABLE IF NOT EXISTS stock_reservation_items (
+    reservation_id BIGINT NOT NULL REFERENCES stock_reservations (id) ON DELETE CASCADE,
+    product_id BIGINT NOT NULL,
+    quantity INTEGER NOT NULL CHECK (quantity > 0),
+    PRIMARY KEY (reservation_id, product_id)
+);
@@ -0,0 +1,93 @@
+-- Append-only ledger of every change to a product's quantity, one partition per
+-- calendar month (UTC). Rows arrive in time order, so a BRIN index on created_at
+-- stays a few pages per partition and still skips everything outside a window.
+-- Per-product history uses the (product_id, created_at) index of each partition.
+-- No foreign key to products: the history outlives the product.
+CREATE TABLE IF NOT EXISTS stock_movements (
+    id BIGSERIAL NOT NULL,
+    product_id BIGINT NOT NULL,
+    delta INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    reason TEXT NOT NULL CHECK (reason IN ('create', 'update', 'import', 'adjustment', 'reservation', 'release')),
+    reservation_id BIGINT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+) PARTITION BY RANGE (created_at);
+
+-- Catches rows for a month whose partition was not created in time
+CREATE TABLE IF NOT EXISTS stock_movements_default PARTITION OF stock_movements DEFAULT;
+
+CREATE INDEX IF NOT EXISTS stock_movements_created_at_brin
+    ON stock_movements USING brin (created_at);
+
+CREATE INDEX IF NOT EXISTS stock_movements_product_id_created_at_idx
+    ON stock_movements (product_id, created_at);
+
+-- Creates the partition for the month of `month` unless it exists. Rows of that
+-- month already in the default partition move into it first, or the attach would fail.
+CREATE OR REPLACE FUNCTION create_stock_movement_partition(month TIMESTAMPTZ) RETURNS TEXT AS $$
+DECLARE
+    starts TIMESTAMPTZ := date_trunc('month', month AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+    ends TIMESTAMPTZ := (date_trunc('month', month AT TIME ZONE 'UTC') + INTERVAL '1 month') AT TIME ZONE 'UTC';
+    partition_name TEXT := 'stock_movements_' || to_char(month AT TIME ZONE 'UTC', 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE stock_movements INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM stock_movements_default WHERE created_at >= %L AND created_at < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved',
+        starts, ends, partition_name
+    );
+    EXECUTE format(
+        'ALTER TABLE stock_movements ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, starts, ends
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_stock_movement_partition(now() + make_interval(months => n)) FROM generate_series(0, 2) AS n;
+
+-- Every quantity change is recorded, whichever code path wrote it. The triggers run
+-- once per statement, so a bulk import adds one INSERT ... SELECT rather than one per row.
+-- Writers name the reason (and reservation) with set_config for their transaction;
+-- inserts default to 'create' and updates to 'update'.
+CREATE OR REPLACE FUNCTION products_record_created_stock() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO stock_movements (product_id, delta, quantity, reason, reservation_id)
+    SELECT id, quantity, quantity,
+        coalesce(nullif(current_setting('inventory.movement_reason', true), ''), 'create'),
+        nullif(current_setting('inventory.movement_reservation_id', true), '')::bigint
+    FROM created
+    WHERE quantity <> 0;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION products_record_updated_stock() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO stock_movements (product_id, delta, quantity, reason, reservation_id)
+    SELECT updated.id, updated.quantity - previous.quantity, updated.quantity,
+        coalesce(nullif(current_setting('inventory.movement_reason', true), ''), 'update'),
+        nullif(current_setting('inventory.movement_reservation_id', true), '')::bigint
+    FROM updated
+    JOIN previous USING (id)
+    WHERE updated.quantity <> previous.quantity;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_record_created_stock ON products;
+CREATE TRIGGER products_record_created_stock
+    AFTER INSERT ON products
+    REFERENCING NEW TABLE AS created
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION products_record_created_stock();
+
+DROP TRIGGER IF EXISTS products_record_updated_stock ON products;
+CREATE TRIGGER products_record_updated_stock
+    AFTER UPDATE ON products
+    REFERENCING OLD TABLE AS previous NEW TABLE AS updated
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION products_record_updated_stock();
@@ -0,0 +1,69 @@
+-- Transactional outbox of product changes and stock movements for the data lake.
+-- Triggers write it in the transaction that makes the change, so a change reaches
+-- the lake if and only if it commits. outbox.py relays it to S3 and deletes it.
+--
+-- Ids are taken at insert, not at commit, so a later id can commit first. The relay
+-- reads in (xid, id) order and only rows of transactions older than every running
+-- one (pg_snapshot_xmin), below which no new row can appear.
+CREATE TABLE IF NOT EXISTS outbox (
+    id BIGINT GENERATED ALWAYS AS IDENTITY,
+    xid xid8 NOT NULL DEFAULT pg_current_xact_id(),
+    topic TEXT NOT NULL CHECK (topic IN ('products', 'stock_movements')),
+    operation TEXT NOT NULL CHECK (operation IN ('insert', 'update', 'delete')),
+    payload JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (xid, id)
+);
+
+-- How far each consumer has relayed. A batch is recorded as pending before any of it
+-- is written, so a relay that fails part way redoes exactly that batch.
+CREATE TABLE IF NOT EXISTS outbox_offsets (
+    consumer TEXT PRIMARY KEY,
+    last_xid xid8 NOT NULL DEFAULT '0',
+    last_id BIGINT NOT NULL DEFAULT 0,
+    pending_xid xid8,
+    pending_id BIGINT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- One function for every table and operation: each trigger names its transition
+-- table "changed", and the topic is the table name. Like the ledger triggers, these
+-- run once per statement, so a bulk import adds one INSERT ... SELECT.
+CREATE OR REPLACE FUNCTION outbox_record() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO outbox (topic, operation, payload)
+    SELECT TG_TABLE_NAME, lower(TG_OP), to_jsonb(changed) - 'search_vector'
+    FROM changed;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_outbox_insert ON products;
+CREATE TRIGGER products_outbox_insert
+    AFTER INSERT ON products
+    REFERENCING NEW TABLE AS changed
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION outbox_record();
+
+DROP TRIGGER IF EXISTS products_outbox_update ON products;
+CREATE TRIGGER products_outbox_update
+    AFTER UPDATE ON products
+    REFERENCING NEW TABLE AS changed
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION outbox_record();
+
+DROP TRIGGER IF EXISTS products_outbox_delete ON products;
+CREATE TRIGGER products_outbox_delete
+    AFTER DELETE ON products
+    REFERENCING OLD TABLE AS changed
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION outbox_record();
+
+-- On the partitioned table, so rows that partition upkeep moves between partitions
+-- (straight into the partition tables) are not recorded twice
+DROP TRIGGER IF EXISTS stock_movements_outbox_insert ON stock_movements;
+CREATE TRIGGER stock_movements_outbox_insert
+    AFTER INSERT ON stock_movements
+    REFERENCING NEW TABLE AS changed
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION outbox_record();
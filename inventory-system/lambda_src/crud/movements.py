@@ -0,0 +1,171 @@
+"""Stock movement history and upkeep of its monthly partitions.
+
+Movements are written by triggers on products (migrations/0007); code that
+changes stock only names the reason with record_reason. History queries always
+carry a time window, which PostgreSQL uses to skip every partition outside it.
+
+maintain_partitions runs on a schedule. It creates the partitions for the
+coming months, detaches those older than the retention period, and archives
+each detached partition to S3 as gzipped CSV before dropping it.
+"""
+import gzip
+import logging
+import os
+import re
+import tempfile
+from datetime import datetime, timezone
+
+import boto3
+
+from db import transaction
+
+ARCHIVE_BUCKET = os.getenv("LEDGER_ARCHIVE_BUCKET")
+PREMAKE_MONTHS = int(os.getenv("LEDGER_PREMAKE_MONTHS", "2"))
+RETENTION_MONTHS = int(os.getenv("LEDGER_RETENTION_MONTHS", "12"))
+# Detaching briefly locks out writers; give up rather than queue them behind a long transaction
+DETACH_LOCK_TIMEOUT = os.getenv("LEDGER_DETACH_LOCK_TIMEOUT", "5s")
+
+MOVEMENT_COLUMNS = "id, product_id, delta, quantity, reason, reservation_id, created_at"
+REASONS = ("create", "update", "import", "adjustment", "reservation", "release")
+PARTITION_PATTERN = re.compile(r"^stock_movements_(\d{4})_(\d{2})$")
+
+logger = logging.getLogger()
+_s3_client = None
+
+
+def get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client("s3")
+    return _s3_client
+
+
+def record_reason(cursor, reason, reservation_id=None):
+    """Name the reason for the stock changes made by the rest of the cursor's transaction"""
+    cursor.execute(
+        "SELECT set_config('inventory.movement_reason', %s, true), "
+        "set_config('inventory.movement_reservation_id', %s, true)",
+        (reason, str(reservation_id) if reservation_id is not None else "")
+    )
+
+
+def list_movements(since, until, product_id=None, reason=None, limit=50, after=None):
+    """Movements in [since, until), newest first, starting after the (created_at, id) key `after`.
+
+    Returns the rows and the key for the next page, or None on the last page.
+    """
+    conditions = ["created_at >= %(since)s", "created_at < %(until)s"]
+    params = {"since": since, "until": until, "limit": limit + 1}
+    if product_id is not None:
+        conditions.append("product_id = %(product_id)s")
+        params["product_id"] = product_id
+    if reason is not None:
+        conditions.append("reason = %(reason)s")
+        params["reason"] = reason
+    if after is not None:
+        conditions.append("(created_at, id) < (%(after_created_at)s, %(after_id)s)")
+        params.update(after_created_at=after[0], after_id=after[1])
+
+    with transaction(read_only=True) as cursor:
+        cursor.execute(
+            f"SELECT {MOVEMENT_COLUMNS} FROM stock_movements WHERE {' AND '.join(conditions)} "
+            f"ORDER BY created_at DESC, id DESC LIMIT %(limit)s",
+            params
+        )
+        rows = cursor.fetchall()
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, [rows[-1]["created_at"].isoformat(), str(rows[-1]["id"])]
+
+
+def partition_month(name):
+    match = PARTITION_PATTERN.match(name)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def months_before(year, month, count):
+    index = year * 12 + month - 1 - count
+    return index // 12, index % 12 + 1
+
+
+def create_partitions(months_ahead=PREMAKE_MONTHS):
+    """Partitions for this month and the next months_ahead; returns the names of those created"""
+    with transaction() as cursor:
+        cursor.execute(
+            "SELECT create_stock_movement_partition(now() + make_interval(months => n)) AS created "
+            "FROM generate_series(0, %s) AS n",
+            (months_ahead,)
+        )
+        return [row["created"] for row in cursor.fetchall() if row["created"] is not None]
+
+
+def detach_expired_partitions(retention_months=RETENTION_MONTHS, now=None):
+    """Detach the partitions older than the last retention_months full months; returns their names"""
+    now = now or datetime.now(timezone.utc)
+    cutoff = months_before(now.year, now.month, retention_months)
+    with transaction() as cursor:
+        cursor.execute(
+            "SELECT child.relname AS name FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = 'stock_movements'::regclass"
+        )
+        expired = sorted(
+            row["name"] for row in cursor.fetchall()
+            if partition_month(row["name"]) is not None and partition_month(row["name"]) < cutoff
+        )
+
+    detached = []
+    for name in expired:
+        with transaction() as cursor:
+            cursor.execute("SELECT set_config('lock_timeout', %s, true)", (DETACH_LOCK_TIMEOUT,))
+            cursor.execute(f'ALTER TABLE stock_movements DETACH PARTITION "{name}"')
+        detached.append(name)
+    return detached
+
+
+def detached_partitions():
+    """Monthly partition tables that are no longer attached, oldest first"""
+    with transaction() as cursor:
+        cursor.execute(
+            "SELECT relname AS name FROM pg_class "
+            "WHERE relkind = 'r' AND relname ~ '^stock_movements_[0-9]{4}_[0-9]{2}$' "
+            "AND NOT EXISTS (SELECT 1 FROM pg_inherits WHERE pg_inherits.inhrelid = pg_class.oid)"
+        )
+        return sorted(row["name"] for row in cursor.fetchall())
+
+
+def export_partition(name, fileobj):
+    """Write a partition's rows to fileobj as gzipped CSV with a header; returns the row count"""
+    with transaction() as cursor:
+        with gzip.GzipFile(fileobj=fileobj, mode="wb") as compressed:
+            cursor.copy_expert(f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)', compressed)
+        return cursor.rowcount
+
+
+def archive_partition(name, bucket=ARCHIVE_BUCKET):
+    """Upload a detached partition to S3, then drop it; returns the object key and the row count"""
+    year, month = partition_month(name)
+    key = f"stock_movements/{year:04d}/{year:04d}-{month:02d}.csv.gz"
+    # Spooled to local storage first, so upload_fileobj can retry parts without re-reading the table
+    with tempfile.TemporaryFile() as spool:
+        rows = export_partition(name, spool)
+        spool.seek(0)
+        get_s3_client().upload_fileobj(spool, bucket, key)
+    with transaction() as cursor:
+        cursor.execute(f'DROP TABLE "{name}"')
+    return key, rows
+
+
+def maintain_partitions(months_ahead=PREMAKE_MONTHS, retention_months=RETENTION_MONTHS):
+    created = create_partitions(months_ahead)
+    detached = detach_expired_partitions(retention_months)
+    # Also picks up partitions detached by an earlier run that stopped before archiving them
+    archived = {}
+    for name in detached_partitions():
+        key, rows = archive_partition(name)
+        logger.info(f"Archived {rows} movements of {name} to s3://{ARCHIVE_BUCKET}/{key}")
+        archived[name] = key
+    return {"created": created, "detached": detached, "archived": archived}
+
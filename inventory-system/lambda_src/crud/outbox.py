@@ -0,0 +1,215 @@
+"""Relay of the transactional outbox into the S3 data lake.
+
+Triggers (migrations/0008) write every product change and stock movement to
+the outbox in the transaction that makes it. relay moves the oldest rows to
+S3 as Parquet, one file per topic and day under
+LAKE_PREFIX/<topic>/year=YYYY/month=MM/day=DD/, where the Glue crawler
+catalogs each topic as a table. Analytics query those tables with Athena
+instead of PostgreSQL.
+
+Each change lands in the lake exactly once. A batch is a fixed range of
+(xid, id) offsets, recorded as pending before anything is written, and its
+files are named after the start of the range. A relay that fails part way
+redoes the same range to the same keys, overwriting rather than adding. Only
+then does the offset move past the range, and its rows leave the outbox in
+the same transaction.
+
+Only the relay function imports this module; pandas comes from its
+AWSSDKPandas layer.
+"""
+import io
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import timezone
+
+import boto3
+import pandas as pd
+
+from db import transaction
+from metrics import put_metrics
+
+LAKE_BUCKET = os.getenv("LAKE_BUCKET")
+LAKE_PREFIX = os.getenv("LAKE_PREFIX", "inventory")
+LAKE_COMPRESSION = os.getenv("LAKE_COMPRESSION", "snappy")
+BATCH_ROWS = int(os.getenv("OUTBOX_BATCH_ROWS", "50000"))
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+CONSUMER = "lake"
+
+OUTBOX_COLUMNS = "id, xid::text AS xid, topic, operation, payload, created_at"
+# Parquet type of each payload field, so every file of a table has the same schema even
+# when a batch has only nulls in a column. The row's own id is renamed to the key column.
+TOPIC_COLUMNS = {
+    "products": {
+        "product_id": "Int64",
+        "sku": "string",
+        "name": "string",
+        "description": "string",
+        "category": "string",
+        "price": "float64",
+        "quantity": "Int64",
+        "version": "Int64",
+        "created_at": "datetime64[ns, UTC]",
+        "updated_at": "datetime64[ns, UTC]"
+    },
+    "stock_movements": {
+        "movement_id": "Int64",
+        "product_id": "Int64",
+        "delta": "Int64",
+        "quantity": "Int64",
+        "reason": "string",
+        "reservation_id": "Int64",
+        "created_at": "datetime64[ns, UTC]"
+    }
+}
+TOPIC_KEYS = {"products": "product_id", "stock_movements": "movement_id"}
+
+logger = logging.getLogger()
+_s3_client = None
+
+
+def get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client("s3", endpoint_url=S3_ENDPOINT_URL)
+    return _s3_client
+
+
+def claim_batch(batch_rows=BATCH_ROWS):
+    """Rows of the pending batch if a relay left one, else of a new batch recorded as pending.
+
+    A new batch takes up to batch_rows of the oldest rows whose transactions
+    are older than every running one. Returns the rows, [] when there are
+    none, and whether they are a pending batch being resumed.
+    """
+    with transaction() as cursor:
+        cursor.execute("INSERT INTO outbox_offsets (consumer) VALUES (%s) ON CONFLICT DO NOTHING", (CONSUMER,))
+        cursor.execute(
+            "SELECT last_xid::text, last_id, pending_xid::text, pending_id FROM outbox_offsets "
+            "WHERE consumer = %s FOR UPDATE",
+            (CONSUMER,)
+        )
+        offset = cursor.fetchone()
+        if offset["pending_id"] is not None:
+            cursor.execute(
+                f"SELECT {OUTBOX_COLUMNS} FROM outbox "
+                f"WHERE (xid, id) > (%(last_xid)s::xid8, %(last_id)s) "
+                f"AND (xid, id) <= (%(pending_xid)s::xid8, %(pending_id)s) "
+                f"ORDER BY xid, id",
+                offset
+            )
+            return cursor.fetchall(), True
+
+        cursor.execute(
+            f"SELECT {OUTBOX_COLUMNS} FROM outbox "
+            f"WHERE (xid, id) > (%(last_xid)s::xid8, %(last_id)s) "
+            f"AND xid < pg_snapshot_xmin(pg_current_snapshot()) "
+            f"ORDER BY xid, id LIMIT %(limit)s",
+            {**offset, "limit": batch_rows}
+        )
+        rows = cursor.fetchall()
+        if rows:
+            cursor.execute(
+                "UPDATE outbox_offsets SET pending_xid = %s::xid8, pending_id = %s, updated_at = now() "
+                "WHERE consumer = %s",
+                (rows[-1]["xid"], rows[-1]["id"], CONSUMER)
+            )
+        return rows, False
+
+
+def complete_batch(rows):
+    """Move the offset past a written batch and delete its rows; False if another relay already did"""
+    with transaction() as cursor:
+        cursor.execute(
+            "UPDATE outbox_offsets SET last_xid = pending_xid, last_id = pending_id, "
+            "pending_xid = NULL, pending_id = NULL, updated_at = now() "
+            "WHERE consumer = %s AND pending_xid = %s::xid8 AND pending_id = %s",
+            (CONSUMER, rows[-1]["xid"], rows[-1]["id"])
+        )
+        if cursor.rowcount == 0:
+            return False
+        cursor.execute(
+            "DELETE FROM outbox WHERE (xid, id) <= (%s::xid8, %s)",
+            (rows[-1]["xid"], rows[-1]["id"])
+        )
+        return True
+
+
+def to_frame(topic, rows):
+    """Rows of one topic as a DataFrame: the outbox event columns, then the payload fields"""
+    key = TOPIC_KEYS[topic]
+    columns = TOPIC_COLUMNS[topic]
+    records = [
+        {
+            "event_id": row["id"],
+            "operation": row["operation"],
+            "changed_at": row["created_at"],
+            **{key if name == "id" else name: value for name, value in row["payload"].items()}
+        }
+        for row in rows
+    ]
+    frame = pd.DataFrame.from_records(records, columns=["event_id", "operation", "changed_at", *columns])
+    for name, dtype in columns.items():
+        if dtype.startswith("datetime64"):
+            frame[name] = pd.to_datetime(frame[name], utc=True, format="ISO8601")
+        else:
+            frame[name] = frame[name].astype(dtype)
+    frame["event_id"] = frame["event_id"].astype("int64")
+    frame["operation"] = frame["operation"].astype("string")
+    frame["changed_at"] = pd.to_datetime(frame["changed_at"], utc=True)
+    return frame
+
+
+def write_batch(rows, bucket=LAKE_BUCKET, prefix=LAKE_PREFIX):
+    """Write a batch as one Parquet file per topic and day of change; returns the keys"""
+    groups = defaultdict(list)
+    for row in rows:
+        groups[(row["topic"], row["created_at"].astimezone(timezone.utc).date())].append(row)
+
+    # Named after the start of the batch's range, so a redone batch overwrites its files
+    part = f"part-{rows[0]['xid']}-{rows[0]['id']}.parquet"
+    keys = []
+    for (topic, day), group in sorted(groups.items()):
+        buffer = io.BytesIO()
+        # Millisecond timestamps, which every Athena engine version reads
+        to_frame(topic, group).to_parquet(
+            buffer, index=False, compression=LAKE_COMPRESSION, coerce_timestamps="ms", allow_truncated_timestamps=True
+        )
+        key = f"{prefix}/{topic}/year={day.year}/month={day.month:02d}/day={day.day:02d}/{part}"
+        get_s3_client().put_object(
+            Bucket=bucket, Key=key, Body=buffer.getvalue(), ContentType="application/vnd.apache.parquet"
+        )
+        keys.append(key)
+    return keys
+
+
+def lag_seconds():
+    """Age of the oldest change not yet relayed, 0 when the outbox is empty"""
+    with transaction() as cursor:
+        # The first row in relay order, from the primary key rather than a scan of a backlog
+        cursor.execute("SELECT extract(epoch FROM now() - created_at) AS lag FROM outbox ORDER BY xid, id LIMIT 1")
+        row = cursor.fetchone()
+        return float(row["lag"]) if row is not None else 0.0
+
+
+def relay(deadline=None, batch_rows=BATCH_ROWS):
+    """Relay batches until the outbox is drained or time.monotonic() passes deadline.
+
+    Returns the number of rows and files written. A batch interrupted by the
+    deadline or a failure is finished by the next run.
+    """
+    relayed, files = 0, 0
+    while deadline is None or time.monotonic() < deadline:
+        rows, resumed = claim_batch(batch_rows)
+        if not rows:
+            break
+        files += len(write_batch(rows))
+        if complete_batch(rows):
+            relayed += len(rows)
+        # A resumed batch may have been claimed with a smaller batch_rows, so only a new one shows the end
+        if len(rows) < batch_rows and not resumed:
+            break
+    put_metrics({"OutboxRelayedRows": relayed})
+    put_metrics({"OutboxLag": lag_seconds()}, unit="Seconds")
+    return {"rows": relayed, "files": files}
@@ -0,0 +1,327 @@
+"""Read-through cache for single products, in two tiers.
+
+- local: LRU in this execution environment, entries live PRODUCT_CACHE_TTL_SECONDS
+- shared: optional DynamoDB table (PRODUCT_CACHE_TABLE), entries versioned by the row version
+
+Batches read with get_many, which asks each tier once for all the products
+it still lacks, and write with store_many.
+
+Writes go through store, evict and invalidate. They replace or drop the local
+entry at once and overwrite the shared entry with the new version, or with a
+tombstone: on delete one that reads as not found, after an import a stale one
+that reads as a miss. Shared writes only move the version forward, so a
+reader that loaded an older row from the database cannot overwrite a newer
+entry or tombstone. Other execution environments may serve their local copy
+for up to the local TTL. Reads that miss every tier load from the primary, not
+a replica that may be behind the last write (see ProductCache.load).
+"""
+import json
+import logging
+import os
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import BotoCoreError, ClientError
+
+from api import to_json
+from db import primary_reads
+from metrics import put_metrics
+
+LOCAL_TTL_SECONDS = float(os.getenv("PRODUCT_CACHE_TTL_SECONDS", "2"))
+LOCAL_MAX_ENTRIES = int(os.getenv("PRODUCT_CACHE_MAX_ENTRIES", "1000"))
+SHARED_TABLE = os.getenv("PRODUCT_CACHE_TABLE")
+SHARED_TTL_SECONDS = int(os.getenv("PRODUCT_CACHE_SHARED_TTL_SECONDS", "120"))
+DYNAMODB_ENDPOINT_URL = os.getenv("DYNAMODB_ENDPOINT_URL")
+# Shared writes are conditional, so DynamoDB takes them one request at a time; a batch sends this many at once
+SHARED_WRITE_CONCURRENCY = int(os.getenv("PRODUCT_CACHE_SHARED_WRITE_CONCURRENCY", "16"))
+
+logger = logging.getLogger()
+
+
+class LocalCache:
+    """LRU with a TTL per entry; a TTL or size of 0 disables it"""
+
+    def __init__(self, ttl_seconds, max_entries, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if self.clock() >= expires_at:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    @property
+    def enabled(self):
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        self.entries[key] = (value, self.clock() + self.ttl_seconds)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def evict(self, key):
+        self.entries.pop(key, None)
+
+
+class SharedCache:
+    """Product entries in DynamoDB, keyed by product id; a deleted product leaves a tombstone"""
+
+    def __init__(self, table_name, ttl_seconds, endpoint_url=None):
+        self.table = boto3.resource("dynamodb", endpoint_url=endpoint_url).Table(table_name)
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, product_id):
+        item = self.table.get_item(Key={"product_id": product_id}, ConsistentRead=True).get("Item")
+        # DynamoDB removes expired items lazily, so check the expiry here too
+        if item is None or item["expires_at"] <= time.time():
+            return None
+        return item
+
+    def get_many(self, product_ids):
+        """Unexpired entries by product id, read in one request for up to 100 ids.
+
+        Keys DynamoDB leaves unprocessed, e.g. when throttled, are missing from
+        the result like uncached products.
+        """
+        result = self.table.meta.client.batch_get_item(RequestItems={
+            self.table.name: {
+                "Keys": [{"product_id": product_id} for product_id in product_ids],
+                "ConsistentRead": True
+            }
+        })
+        now = time.time()
+        return {
+            int(item["product_id"]): item
+            for item in result["Responses"].get(self.table.name, [])
+            if item["expires_at"] > now
+        }
+
+    def put(self, product_id, version, body=None, stale=False):
+        """Store the product body, or a tombstone when body is None, unless a newer version is cached.
+
+        A tombstone marks the product deleted, or with stale only changed: the
+        next read loads it again, and may store the body of this same version.
+        """
+        now = int(time.time())
+        item = {"product_id": product_id, "version": version, "expires_at": now + self.ttl_seconds}
+        if body is not None:
+            item["body"] = body
+        elif stale:
+            item["stale"] = True
+        else:
+            item["deleted"] = True
+        condition = Attr("product_id").not_exists() | Attr("version").lt(version) | Attr("expires_at").lte(now)
+        if body is not None:
+            condition = condition | (Attr("version").eq(version) & Attr("stale").exists())
+        try:
+            self.table.put_item(Item=item, ConditionExpression=condition)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+
+
+class ProductCache:
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+        self.stats = Counter()
+
+    def record(self, source):
+        self.stats[source] += 1
+        # Averages give the hit ratio per tier and the share of reads still served by the database
+        put_metrics({
+            "ProductCacheLocalHit": int(source == "local"),
+            "ProductCacheSharedHit": int(source == "shared"),
+            "ProductDatabaseRead": int(source == "database")
+        })
+
+    def record_many(self, sources):
+        self.stats.update(sources)
+        # A metric value may be a list of up to 100 samples, so each product still counts once in the averages
+        put_metrics({
+            "ProductCacheLocalHit": [int(source == "local") for source in sources],
+            "ProductCacheSharedHit": [int(source == "shared") for source in sources],
+            "ProductDatabaseRead": [int(source == "database") for source in sources]
+        })
+
+    def get(self, product_id, load):
+        """Product from the nearest tier that has it, else load(product_id) from the database"""
+        product = self.local.get(product_id)
+        if product is not None:
+            self.record("local")
+            return product
+
+        if self.shared is not None:
+            try:
+                entry = self.shared.get(product_id)
+            except (BotoCoreError, ClientError) as e:
+                logger.warning(f"Shared product cache read failed: {e}")
+                entry = None
+            if entry is not None and not entry.get("stale"):
+                self.record("shared")
+                if entry.get("deleted"):
+                    return None
+                product = json.loads(entry["body"])
+                self.local.put(product_id, product)
+                return product
+
+        product = self.load(load, product_id)
+        self.record("database")
+        if product is not None:
+            self.fill(product)
+        return product
+
+    def get_many(self, product_ids, load_many):
+        """Products by id, at most 100, each from the nearest tier that has it.
+
+        load_many(ids) reads the rest from the database in one query. Products
+        that do not exist or were deleted are left out.
+        """
+        products, sources = {}, []
+        missing = []
+        for product_id in product_ids:
+            product = self.local.get(product_id)
+            if product is None:
+                missing.append(product_id)
+            else:
+                products[product_id] = product
+                sources.append("local")
+
+        if self.shared is not None and missing:
+            try:
+                entries = self.shared.get_many(missing)
+            except (BotoCoreError, ClientError) as e:
+                logger.warning(f"Shared product cache read failed: {e}")
+                entries = {}
+            entries = {product_id: entry for product_id, entry in entries.items() if not entry.get("stale")}
+            for product_id, entry in entries.items():
+                sources.append("shared")
+                if not entry.get("deleted"):
+                    products[product_id] = json.loads(entry["body"])
+                    self.local.put(product_id, products[product_id])
+            missing = [product_id for product_id in missing if product_id not in entries]
+
+        if missing:
+            loaded = self.load(load_many, missing)
+            sources.extend(["database"] * len(missing))
+            self.fill_many(loaded)
+            products.update((product["id"], product) for product in loaded)
+        if sources:
+            self.record_many(sources)
+        return products
+
+    def load(self, load, argument):
+        """load(argument) from the primary when the rows will fill a tier.
+
+        A lagging replica can still return a row that a write, delete or import
+        has replaced. The shared tier rejects the older version only while the
+        newer entry or tombstone lives, and the local tier would keep it for
+        its TTL. With every tier off, nothing is filled and a replica serves it.
+        """
+        if self.shared is None and not self.local.enabled:
+            return load(argument)
+        with primary_reads():
+            return load(argument)
+
+    def fill(self, product):
+        self.local.put(product["id"], product)
+        if self.shared is not None:
+            try:
+                self.shared.put(product["id"], product["version"], json.dumps(product, default=to_json))
+            except (BotoCoreError, ClientError) as e:
+                logger.warning(f"Shared product cache write failed: {e}")
+
+    def store(self, product):
+        """Write-through after a create or update, with the row as committed"""
+        self.local.put(product["id"], product)
+        if self.shared is not None:
+            try:
+                self.shared.put(product["id"], product["version"], json.dumps(product, default=to_json))
+            except (BotoCoreError, ClientError) as e:
+                logger.error(f"Shared product cache entry for {product['id']} may be stale until it expires: {e}")
+
+    def fill_many(self, products):
+        for product in products:
+            self.local.put(product["id"], product)
+        for product_id, e in self.put_shared_many(bodies(products)).items():
+            logger.warning(f"Shared product cache write failed: {e}")
+
+    def store_many(self, products):
+        """Write-through after a batch update, with the rows as committed"""
+        for product in products:
+            self.local.put(product["id"], product)
+        for product_id, e in self.put_shared_many(bodies(products)).items():
+            logger.error(f"Shared product cache entry for {product_id} may be stale until it expires: {e}")
+
+    def put_shared_many(self, entries, stale=False):
+        """Shared writes of (product_id, version, body) entries, SHARED_WRITE_CONCURRENCY at a time.
+
+        Returns the errors by product id.
+        """
+        if self.shared is None or not entries:
+            return {}
+        errors = {}
+
+        def put(entry):
+            try:
+                self.shared.put(*entry, stale=stale)
+            except (BotoCoreError, ClientError) as e:
+                errors[entry[0]] = e
+
+        with ThreadPoolExecutor(max_workers=min(SHARED_WRITE_CONCURRENCY, len(entries))) as pool:
+            list(pool.map(put, entries))
+        return errors
+
+    def evict(self, product_id, version):
+        """Drop a deleted product; the shared tier keeps a tombstone newer than its last version"""
+        self.local.evict(product_id)
+        if self.shared is not None:
+            try:
+                self.shared.put(product_id, version + 1)
+            except (BotoCoreError, ClientError) as e:
+                logger.error(f"Shared product cache entry for {product_id} may be stale until it expires: {e}")
+
+    def invalidate(self, versions):
+        """Drop products changed in bulk, e.g. by an import, given their new versions by id.
+
+        The shared tier gets a stale tombstone at each new version, so the next
+        read loads the product again, and a read that loaded the old row before
+        the change committed cannot put it back.
+        """
+        for product_id in versions:
+            self.local.evict(product_id)
+        tombstones = [(product_id, version, None) for product_id, version in versions.items()]
+        errors = self.put_shared_many(tombstones, stale=True)
+        if errors:
+            error = next(iter(errors.values()))
+            logger.error(f"{len(errors)} shared product cache entries may be stale until they expire: {error}")
+
+
+def bodies(products):
+    """Shared entries for rows as read or written"""
+    return [(product["id"], product["version"], json.dumps(product, default=to_json)) for product in products]
+
+
+_product_cache = None
+
+
+def get_product_cache():
+    global _product_cache
+    if _product_cache is None:
+        shared = SharedCache(SHARED_TABLE, SHARED_TTL_SECONDS, DYNAMODB_ENDPOINT_URL) if SHARED_TABLE else None
+        _product_cache = ProductCache(LocalCache(LOCAL_TTL_SECONDS, LOCAL_MAX_ENTRIES), shared)
+    return _product_cache
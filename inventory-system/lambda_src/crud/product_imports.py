@@ -0,0 +1,342 @@
+"""Bulk product import from CSV or NDJSON files uploaded to S3.
+
+An import is created through the API, which returns a presigned URL for
+imports/<id>.<format> in IMPORT_BUCKET. The upload triggers import_products,
+which runs run_import in one transaction:
+
+1. Parse the file as it streams from S3 and COPY it into a temporary staging
+   table, IMPORT_CHUNK_ROWS rows per COPY, with every value still as text.
+2. Validate all staged rows with one INSERT ... SELECT into
+   product_import_errors. Invalid lines and every line superseded by a later
+   line with the same SKU are rejected.
+3. Merge the remaining rows into products with one INSERT ... ON CONFLICT (sku)
+   DO UPDATE. Rows whose values did not change are skipped, so their version
+   stays the same.
+
+Empty or missing description, category and quantity keep the current value
+of an existing product; new products get NULL and 0.
+"""
+import codecs
+import csv
+import io
+import json
+import logging
+import os
+import re
+
+import boto3
+from botocore.config import Config
+
+from db import transaction
+from movements import record_reason
+from products import REQUIRED_FIELDS, UPDATABLE_FIELDS
+
+IMPORT_BUCKET = os.getenv("IMPORT_BUCKET")
+CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "50000"))
+UPLOAD_URL_EXPIRY_SECONDS = int(os.getenv("IMPORT_UPLOAD_URL_EXPIRY_SECONDS", "900"))
+# A running import older than this was cut short by the function timeout and may be claimed again
+IMPORT_TIMEOUT_SECONDS = int(os.getenv("IMPORT_TIMEOUT_SECONDS", "900"))
+ERRORS_PAGE_SIZE = 100
+
+FORMATS = ("csv", "ndjson")
+IMPORT_FIELDS = UPDATABLE_FIELDS
+IMPORT_KEY_PATTERN = re.compile(r"^imports/(\d+)\.(csv|ndjson)$")
+IMPORT_COLUMNS = (
+    "id, format, status, rows_total, rows_inserted, rows_updated, rows_unchanged, rows_failed, "
+    "error, created_at, started_at, finished_at"
+)
+
+STAGE_ROWS_SQL = """
+CREATE TEMP TABLE product_import_rows (
+    line INTEGER NOT NULL,
+    sku TEXT,
+    name TEXT,
+    description TEXT,
+    category TEXT,
+    price TEXT,
+    quantity TEXT,
+    problem TEXT
+) ON COMMIT DROP
+"""
+
+COPY_ROWS_SQL = (
+    "COPY product_import_rows (line, sku, name, description, category, price, quantity, problem) "
+    "FROM STDIN WITH (FORMAT csv)"
+)
+
+# The last valid line for a SKU wins; earlier valid lines for it are rejected
+# so that the merge touches each product once.
+REJECT_ROWS_SQL = """
+WITH checked AS (
+    SELECT line, sku, CASE
+        -- A line that could not be parsed at all has no values to check
+        WHEN problem IS NOT NULL AND num_nonnulls(sku, name, description, category, price, quantity) = 0 THEN problem
+        ELSE concat_ws('; ',
+            problem,
+            CASE WHEN sku IS NULL THEN 'sku is required' END,
+            CASE WHEN name IS NULL THEN 'name is required' END,
+            CASE
+                WHEN price IS NULL THEN 'price is required'
+                WHEN NOT pg_input_is_valid(price, 'numeric(12, 2)') THEN 'price is not a valid amount'
+                WHEN price::numeric < 0 THEN 'price must not be negative'
+            END,
+            CASE
+                WHEN quantity IS NULL THEN NULL
+                WHEN NOT pg_input_is_valid(quantity, 'integer') THEN 'quantity is not a valid integer'
+                WHEN quantity::integer < 0 THEN 'quantity must not be negative'
+            END
+        )
+    END AS error
+    FROM product_import_rows
+), ranked AS (
+    SELECT line, sku, error,
+        max(line) FILTER (WHERE error = '') OVER (PARTITION BY sku) AS last_line
+    FROM checked
+)
+INSERT INTO product_import_errors (import_id, line, sku, error)
+SELECT %(import_id)s, line, sku,
+    CASE WHEN error <> '' THEN error ELSE 'sku is imported from line ' || last_line || ' instead' END
+FROM ranked
+WHERE error <> '' OR line < last_line
+"""
+
+# Rows are merged in SKU order, so concurrent imports lock products in the same order
+MERGE_ROWS_SQL = """
+WITH merged AS (
+    INSERT INTO products AS p (sku, name, description, category, price, quantity)
+    SELECT r.sku, r.name,
+        coalesce(r.description, existing.description),
+        coalesce(r.category, existing.category),
+        r.price::numeric(12, 2),
+        coalesce(r.quantity::integer, existing.quantity, 0)
+    FROM product_import_rows r
+    LEFT JOIN products existing ON existing.sku = r.sku
+    WHERE NOT EXISTS (
+        SELECT 1 FROM product_import_errors e WHERE e.import_id = %(import_id)s AND e.line = r.line
+    )
+    ORDER BY r.sku
+    ON CONFLICT (sku) DO UPDATE SET
+        name = EXCLUDED.name,
+        description = EXCLUDED.description,
+        category = EXCLUDED.category,
+        price = EXCLUDED.price,
+        quantity = EXCLUDED.quantity
+    WHERE (p.name, p.description, p.category, p.price, p.quantity)
+        IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.description, EXCLUDED.category, EXCLUDED.price, EXCLUDED.quantity)
+    RETURNING p.id, p.version, p.xmax = 0 AS inserted
+)
+SELECT
+    count(*) FILTER (WHERE inserted) AS inserted,
+    coalesce(array_agg(id) FILTER (WHERE NOT inserted), '{}') AS updated_ids,
+    coalesce(array_agg(version) FILTER (WHERE NOT inserted), '{}') AS updated_versions
+FROM merged
+"""
+
+logger = logging.getLogger()
+
+_s3_client = None
+
+
+class InvalidImportFile(Exception):
+    """The file as a whole cannot be imported, e.g. its CSV header is missing required columns"""
+
+
+def get_s3_client():
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client("s3", config=Config(signature_version="s3v4"))
+    return _s3_client
+
+
+def import_key(product_import):
+    return f"imports/{product_import['id']}.{product_import['format']}"
+
+
+def parse_import_key(key):
+    """Import id for an uploaded object key, or None for keys that are not import files"""
+    match = IMPORT_KEY_PATTERN.match(key)
+    return int(match.group(1)) if match else None
+
+
+def upload_url(product_import):
+    return get_s3_client().generate_presigned_url(
+        "put_object",
+        Params={"Bucket": IMPORT_BUCKET, "Key": import_key(product_import)},
+        ExpiresIn=UPLOAD_URL_EXPIRY_SECONDS
+    )
+
+
+def create_import(file_format):
+    with transaction() as cursor:
+        cursor.execute(
+            f"INSERT INTO product_imports (format) VALUES (%s) RETURNING {IMPORT_COLUMNS}", (file_format,)
+        )
+        return cursor.fetchone()
+
+
+def get_import(import_id, errors_after_line=0):
+    """Import with up to ERRORS_PAGE_SIZE of its rejected lines after errors_after_line, or None"""
+    with transaction(read_only=True) as cursor:
+        cursor.execute(f"SELECT {IMPORT_COLUMNS} FROM product_imports WHERE id = %s", (import_id,))
+        product_import = cursor.fetchone()
+        if product_import is None:
+            return None
+        cursor.execute(
+            "SELECT line, sku, error FROM product_import_errors WHERE import_id = %s AND line > %s "
+            "ORDER BY line LIMIT %s",
+            (import_id, errors_after_line, ERRORS_PAGE_SIZE)
+        )
+        product_import["errors"] = cursor.fetchall()
+        return product_import
+
+
+def claim_import(import_id):
+    """Mark a pending import as running; None if it is unknown, finished or already running"""
+    with transaction() as cursor:
+        cursor.execute(
+            f"UPDATE product_imports SET status = 'running', started_at = now() "
+            f"WHERE id = %s AND (status = 'pending' OR "
+            f"(status = 'running' AND started_at < now() - make_interval(secs => %s))) "
+            f"RETURNING {IMPORT_COLUMNS}",
+            (import_id, IMPORT_TIMEOUT_SECONDS)
+        )
+        return cursor.fetchone()
+
+
+def fail_import(import_id, error):
+    with transaction() as cursor:
+        cursor.execute(
+            "UPDATE product_imports SET status = 'failed', error = %s, finished_at = now() WHERE id = %s",
+            (error, import_id)
+        )
+
+
+def clean(value):
+    if value is None:
+        return None
+    return str(value).strip() or None
+
+
+def csv_rows(lines):
+    """(line, *IMPORT_FIELDS, problem) for each CSV record; the header names the columns"""
+    reader = csv.reader(lines)
+    header = [name.strip().lower() for name in next(reader, [])]
+    unknown = [name for name in header if name not in IMPORT_FIELDS]
+    if unknown:
+        raise InvalidImportFile(f"Unknown columns: {', '.join(unknown)}")
+    missing = [name for name in REQUIRED_FIELDS if name not in header]
+    if missing:
+        raise InvalidImportFile(f"Missing columns: {', '.join(missing)}")
+
+    positions = [header.index(name) if name in header else None for name in IMPORT_FIELDS]
+    for record in reader:
+        if not record:
+            continue
+        problem = None
+        if len(record) != len(header):
+            problem = f"expected {len(header)} fields, found {len(record)}"
+        yield (
+            reader.line_num,
+            *(clean(record[i]) if i is not None and i < len(record) else None for i in positions),
+            problem
+        )
+
+
+def ndjson_rows(lines):
+    """(line, *IMPORT_FIELDS, problem) for each JSON object, one object per line"""
+    empty = (None,) * len(IMPORT_FIELDS)
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            # Numbers stay text, so PostgreSQL validates them like CSV values
+            record = json.loads(line, parse_float=str, parse_int=str)
+        except ValueError:
+            yield (line_number, *empty, "line is not valid JSON")
+            continue
+        if not isinstance(record, dict):
+            yield (line_number, *empty, "line is not a JSON object")
+            continue
+        unknown = sorted(set(record) - set(IMPORT_FIELDS))
+        yield (
+            line_number,
+            *(clean(record.get(name)) for name in IMPORT_FIELDS),
+            f"unknown fields: {', '.join(unknown)}" if unknown else None
+        )
+
+
+def stage_rows(cursor, rows, chunk_rows=CHUNK_ROWS):
+    """COPY rows into product_import_rows, chunk_rows at a time; returns the row count"""
+    cursor.execute(STAGE_ROWS_SQL)
+    total = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        total += 1
+        if total % chunk_rows == 0:
+            buffer.seek(0)
+            cursor.copy_expert(COPY_ROWS_SQL, buffer)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+    if buffer.tell():
+        buffer.seek(0)
+        cursor.copy_expert(COPY_ROWS_SQL, buffer)
+    # Temporary tables are never analyzed automatically; the merge plan depends on the row count
+    cursor.execute("ANALYZE product_import_rows")
+    return total
+
+
+def run_import(import_id, file_format, stream, chunk_rows=CHUNK_ROWS):
+    """Import a claimed import's file from a binary stream.
+
+    Returns the completed import and the new versions of the products it
+    updated, by id. Any error rolls back the whole import, including its
+    staged rows and errors.
+    """
+    lines = codecs.getreader("utf-8-sig")(stream)
+    rows = csv_rows(lines) if file_format == "csv" else ndjson_rows(lines)
+
+    with transaction() as cursor:
+        total = stage_rows(cursor, rows, chunk_rows)
+        cursor.execute(REJECT_ROWS_SQL, {"import_id": import_id})
+        failed = cursor.rowcount
+        record_reason(cursor, "import")
+        cursor.execute(MERGE_ROWS_SQL, {"import_id": import_id})
+        merged = cursor.fetchone()
+        inserted, updated = merged["inserted"], len(merged["updated_ids"])
+        cursor.execute(
+            f"UPDATE product_imports SET status = 'completed', rows_total = %s, rows_inserted = %s, "
+            f"rows_updated = %s, rows_unchanged = %s, rows_failed = %s, finished_at = now() "
+            f"WHERE id = %s RETURNING {IMPORT_COLUMNS}",
+            (total, inserted, updated, total - failed - inserted - updated, failed, import_id)
+        )
+        return cursor.fetchone(), dict(zip(merged["updated_ids"], merged["updated_versions"]))
+
+
+def import_object(bucket, key):
+    """Run the import for an uploaded object.
+
+    Returns the completed import and the new versions of the products it
+    updated, by id, or None when the object is not a pending import or the
+    import failed.
+    """
+    import_id = parse_import_key(key)
+    if import_id is None:
+        logger.warning(f"Ignoring object that is not an import file: {key}")
+        return None
+    # S3 may deliver the same event more than once; only one delivery claims the import
+    product_import = claim_import(import_id)
+    if product_import is None:
+        logger.info(f"Import {import_id} is not pending, skipping")
+        return None
+
+    try:
+        body = get_s3_client().get_object(Bucket=bucket, Key=key)["Body"]
+        return run_import(import_id, product_import["format"], body)
+    except (InvalidImportFile, UnicodeDecodeError, csv.Error) as e:
+        fail_import(import_id, str(e))
+    except Exception as e:
+        logger.exception(f"Import {import_id} failed: {e}")
+        fail_import(import_id, "Import failed unexpectedly")
+    return None
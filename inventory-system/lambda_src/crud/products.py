@@ -0,0 +1,260 @@
+"""Product queries; each function runs in its own transaction"""
+import json
+
+import psycopg2
+import psycopg2.errors
+
+from api import BadRequest, Conflict
+from db import transaction
+
+REQUIRED_FIELDS = ("sku", "name", "price")
+UPDATABLE_FIELDS = ("sku", "name", "description", "category", "price", "quantity")
+COLUMNS = "id, sku, name, description, category, price, quantity, version, created_at, updated_at"
+# Column types of UPDATABLE_FIELDS, for values that arrive as JSON in a batch update
+FIELD_TYPES = {
+    "sku": "text",
+    "name": "text",
+    "description": "text",
+    "category": "text",
+    "price": "numeric",
+    "quantity": "integer"
+}
+# Keyset columns per sort; each has an index with and without category in migrations/0003
+SORT_KEYS = {
+    "id": ("id",),
+    "price": ("price", "id"),
+    "name": ("name", "id")
+}
+# Matching condition and score per search mode; %(query)s is the search term, %(pattern)s its ILIKE pattern.
+# text uses the search_vector GIN index, substring and fuzzy the pg_trgm indexes on name and sku.
+SEARCH_MODES = {
+    "text": (
+        "search_vector @@ websearch_to_tsquery('english', %(query)s)",
+        "ts_rank_cd(search_vector, websearch_to_tsquery('english', %(query)s))"
+    ),
+    "substring": (
+        "(name ILIKE %(pattern)s OR sku ILIKE %(pattern)s)",
+        "greatest(similarity(name, %(query)s), similarity(sku, %(query)s))"
+    ),
+    "fuzzy": (
+        "(%(query)s <%% name OR %(query)s <%% sku)",
+        "greatest(word_similarity(%(query)s, name), word_similarity(%(query)s, sku))"
+    )
+}
+STOCK_CONDITIONS = {
+    "in_stock": "quantity > 0",
+    "out_of_stock": "quantity = 0"
+}
+
+
+def create_product(fields):
+    missing = [name for name in REQUIRED_FIELDS if fields.get(name) in (None, "")]
+    if missing:
+        raise BadRequest(f"Missing fields: {', '.join(missing)}")
+    values = {name: fields.get(name) for name in UPDATABLE_FIELDS}
+    values["quantity"] = values["quantity"] or 0
+
+    with transaction() as cursor:
+        cursor.execute(
+            f"INSERT INTO products (sku, name, description, category, price, quantity) "
+            f"VALUES (%(sku)s, %(name)s, %(description)s, %(category)s, %(price)s, %(quantity)s) "
+            f"RETURNING {COLUMNS}",
+            values
+        )
+        return cursor.fetchone()
+
+
+def get_product(product_id):
+    with transaction(read_only=True) as cursor:
+        cursor.execute(f"SELECT {COLUMNS} FROM products WHERE id = %s", (product_id,))
+        return cursor.fetchone()
+
+
+def update_product(product_id, fields, expected_version=None):
+    """Updated product, or None if there is no such product.
+
+    With expected_version the update only applies if the row is still at that
+    version, and raises Conflict otherwise.
+    """
+    changes = {name: value for name, value in fields.items() if name in UPDATABLE_FIELDS}
+    unknown = sorted(set(fields) - set(UPDATABLE_FIELDS))
+    if unknown:
+        raise BadRequest(f"Fields cannot be updated: {', '.join(unknown)}")
+    if not changes:
+        raise BadRequest("No fields to update")
+
+    assignments = ", ".join(f"{name} = %({name})s" for name in changes)
+    version_check = " AND version = %(expected_version)s" if expected_version is not None else ""
+    with transaction() as cursor:
+        cursor.execute(
+            f"UPDATE products SET {assignments} WHERE id = %(id)s{version_check} RETURNING {COLUMNS}",
+            {**changes, "id": product_id, "expected_version": expected_version}
+        )
+        product = cursor.fetchone()
+        if product is None and expected_version is not None:
+            cursor.execute("SELECT version FROM products WHERE id = %s", (product_id,))
+            current = cursor.fetchone()
+            if current is not None:
+                raise Conflict("Version conflict", {"version": current["version"]})
+        return product
+
+
+def get_products(product_ids):
+    """Products with the given ids, in no particular order; ids with no product are left out"""
+    with transaction(read_only=True) as cursor:
+        cursor.execute(f"SELECT {COLUMNS} FROM products WHERE id = ANY(%s)", (list(product_ids),))
+        return cursor.fetchall()
+
+
+def update_products(updates):
+    """Apply several partial updates in one transaction, each on its own; one result per update, in order.
+
+    updates are (product_id, fields, expected_version) for distinct products.
+    A result has the product id and an HTTP status: 200 with the updated
+    product, 404, 409 for a version conflict or a taken SKU, or 400 for fields
+    that cannot be updated or are invalid. Failed updates leave the others applied.
+
+    The products are locked in id order first, so concurrent batches wait for
+    each other instead of deadlocking, and the versions checked stay current.
+    The updates then run as one UPDATE; only if it fails are they retried one
+    at a time under savepoints, to find the ones at fault.
+    """
+    results = [{"id": product_id} for product_id, _, _ in updates]
+    # Changing the SKU, which has a unique index, takes the stronger row lock
+    lock = "FOR UPDATE" if any("sku" in fields for _, fields, _ in updates) else "FOR NO KEY UPDATE"
+    with transaction() as cursor:
+        cursor.execute(
+            f"SELECT id, version FROM products WHERE id = ANY(%s) ORDER BY id {lock}",
+            (sorted(product_id for product_id, _, _ in updates),)
+        )
+        versions = {row["id"]: row["version"] for row in cursor.fetchall()}
+
+        pending = {}
+        for result, (product_id, fields, expected_version) in zip(results, updates):
+            unknown = sorted(set(fields) - set(UPDATABLE_FIELDS))
+            if unknown:
+                result.update(status=400, error=f"Fields cannot be updated: {', '.join(unknown)}")
+            elif not fields:
+                result.update(status=400, error="No fields to update")
+            elif product_id not in versions:
+                result.update(status=404, error="Product not found")
+            elif expected_version is not None and versions[product_id] != expected_version:
+                result.update(status=409, error="Version conflict", version=versions[product_id])
+            else:
+                pending[product_id] = result
+
+        items = [
+            {"id": product_id, "fields": fields}
+            for product_id, fields, _ in updates if product_id in pending
+        ]
+        if items:
+            cursor.execute("SAVEPOINT batch_update")
+            try:
+                products = apply_updates(cursor, items)
+            except (psycopg2.IntegrityError, psycopg2.DataError):
+                cursor.execute("ROLLBACK TO SAVEPOINT batch_update")
+                products = []
+                for item in items:
+                    cursor.execute("SAVEPOINT batch_item")
+                    try:
+                        products.extend(apply_updates(cursor, [item]))
+                    except psycopg2.errors.UniqueViolation:
+                        cursor.execute("ROLLBACK TO SAVEPOINT batch_item")
+                        pending[item["id"]].update(status=409, error="A product with this SKU already exists")
+                    except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+                        cursor.execute("ROLLBACK TO SAVEPOINT batch_item")
+                        pending[item["id"]].update(
+                            status=400, error="Invalid product data", details=e.diag.message_primary or str(e)
+                        )
+                    else:
+                        cursor.execute("RELEASE SAVEPOINT batch_item")
+            for product in products:
+                pending[product["id"]].update(status=200, product=product)
+    return results
+
+
+def apply_updates(cursor, items):
+    """Run batch update items ({"id", "fields"}) as one UPDATE; fields an item leaves out keep their value"""
+    assignments = ", ".join(
+        f"{name} = CASE WHEN item.fields ? '{name}' THEN (item.fields ->> '{name}')::{column_type} "
+        f"ELSE products.{name} END"
+        for name, column_type in FIELD_TYPES.items()
+    )
+    qualified = ", ".join(f"products.{column}" for column in COLUMNS.split(", "))
+    cursor.execute(
+        f"UPDATE products SET {assignments} "
+        f"FROM jsonb_to_recordset(%s::jsonb) AS item (id bigint, fields jsonb) "
+        f"WHERE products.id = item.id "
+        f"RETURNING {qualified}",
+        (json.dumps(items),)
+    )
+    return cursor.fetchall()
+
+
+def delete_product(product_id):
+    """Deleted row's id and version, or None if there was no such product"""
+    with transaction() as cursor:
+        cursor.execute("DELETE FROM products WHERE id = %s RETURNING id, version", (product_id,))
+        return cursor.fetchone()
+
+
+def list_products(filters, sort="id", descending=False, limit=50, after=None):
+    """A page of products matching filters, ordered by SORT_KEYS[sort] and starting after the key `after`.
+
+    Returns the rows and the key to pass as `after` for the next page, or None
+    on the last page. The inner query finds the page's ids with an index-only
+    scan, so rows skipped by the filters are never read from the table.
+    """
+    keys = SORT_KEYS[sort]
+    conditions = []
+    params = {"limit": limit + 1}
+    if filters.get("category") is not None:
+        conditions.append("category = %(category)s")
+        params["category"] = filters["category"]
+    if filters.get("min_price") is not None:
+        conditions.append("price >= %(min_price)s")
+        params["min_price"] = filters["min_price"]
+    if filters.get("max_price") is not None:
+        conditions.append("price <= %(max_price)s")
+        params["max_price"] = filters["max_price"]
+    if filters.get("stock") is not None:
+        conditions.append(STOCK_CONDITIONS[filters["stock"]])
+    if after is not None:
+        placeholders = ", ".join(f"%(after_{i})s" for i in range(len(keys)))
+        conditions.append(f"({', '.join(keys)}) {'<' if descending else '>'} ({placeholders})")
+        params.update({f"after_{i}": value for i, value in enumerate(after)})
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = ", ".join(f"{key} {'DESC' if descending else 'ASC'}" for key in keys)
+    with transaction(read_only=True) as cursor:
+        cursor.execute(
+            f"SELECT {COLUMNS} FROM ("
+            f"SELECT id FROM products {where} ORDER BY {order} LIMIT %(limit)s"
+            f") page JOIN products USING (id) ORDER BY {order}",
+            params
+        )
+        rows = cursor.fetchall()
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    # Key values travel as text in the cursor; PostgreSQL casts them back to the column types
+    return rows, [str(rows[-1][key]) for key in keys]
+
+
+def search_products(query, mode="text", limit=20):
+    """Best-scoring products for a search term, with their score, ties by id.
+
+    Every match is scored, so the result is the true top of the ranking. The
+    scores come from the rows, so a broad term like "bottle" reads all of its
+    tens of thousands of matches; a more specific term narrows them.
+    """
+    condition, score = SEARCH_MODES[mode]
+    pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    with transaction(read_only=True) as cursor:
+        cursor.execute(
+            f"SELECT {COLUMNS}, {score} AS score FROM products WHERE {condition} "
+            f"ORDER BY score DESC, id LIMIT %(limit)s",
+            {"query": query, "pattern": pattern, "limit": limit}
+        )
+        return cursor.fetchall()
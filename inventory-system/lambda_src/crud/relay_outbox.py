@@ -0,0 +1,19 @@
+"""Relays the outbox to the data lake; runs every few minutes on a schedule"""
+import json
+import logging
+import os
+import time
+
+from outbox import relay
+
+# Stop starting batches this long before the timeout; a batch cut off anyway is finished by the next run
+STOP_BEFORE_TIMEOUT_SECONDS = int(os.getenv("OUTBOX_STOP_BEFORE_TIMEOUT_SECONDS", "60"))
+
+logger = logging.getLogger()
+
+
+def lambda_handler(event, context):
+    deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000 - STOP_BEFORE_TIMEOUT_SECONDS
+    result = relay(deadline)
+    logger.info(f"Outbox relay: {result['rows']} changes in {result['files']} files")
+    return {"statusCode": 200, "body": json.dumps(result)}
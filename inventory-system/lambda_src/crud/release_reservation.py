@@ -0,0 +1,15 @@
+from api import api_handler, path_id, response
+from product_cache import get_product_cache
+from stock import release_reservation
+
+
+@api_handler
+def lambda_handler(event, context):
+    released = release_reservation(path_id(event, "reservation_id"))
+    if released is None:
+        return response(404, {"error": "Reservation not found"})
+    reservation, products = released
+    cache = get_product_cache()
+    for product in products:
+        cache.store(product)
+    return response(200, reservation)
@@ -0,0 +1,50 @@
+"""Single entry point for all product routes, used when lambda.function_mode is "router".
+
+Dispatches on the API Gateway resource template and method to the same
+handlers the per-route functions use, so both modes behave the same.
+"""
+import adjust_stock
+import batch_get_products
+import batch_update_products
+import create_import
+import create_product
+import create_reservation
+import delete_product
+import get_import
+import get_product
+import list_movements
+import list_product_movements
+import list_products
+import release_reservation
+import search_products
+import update_product
+from api import response
+
+ROUTES = {
+    ("POST", "/products"): create_product.lambda_handler,
+    ("GET", "/products"): list_products.lambda_handler,
+    ("GET", "/products/search"): search_products.lambda_handler,
+    ("GET", "/products/batch"): batch_get_products.lambda_handler,
+    ("PATCH", "/products/batch"): batch_update_products.lambda_handler,
+    ("GET", "/products/{product_id}"): get_product.lambda_handler,
+    ("PUT", "/products/{product_id}"): update_product.lambda_handler,
+    ("DELETE", "/products/{product_id}"): delete_product.lambda_handler,
+    ("POST", "/products/imports"): create_import.lambda_handler,
+    ("GET", "/products/imports/{import_id}"): get_import.lambda_handler,
+    ("POST", "/products/{product_id}/stock"): adjust_stock.lambda_handler,
+    ("POST", "/reservations"): create_reservation.lambda_handler,
+    ("DELETE", "/reservations/{reservation_id}"): release_reservation.lambda_handler,
+    ("GET", "/products/{product_id}/movements"): list_product_movements.lambda_handler,
+    ("GET", "/movements"): list_movements.lambda_handler
+}
+
+
+def lambda_handler(event, context):
+    resource = event.get("resource")
+    handler = ROUTES.get((event.get("httpMethod"), resource))
+    if handler is not None:
+        return handler(event, context)
+
+    if any(route_resource == resource for _, route_resource in ROUTES):
+        return response(405, {"error": f"Method {event.get('httpMethod')} not allowed on {resource}"})
+    return response(404, {"error": f"No route for {resource}"})
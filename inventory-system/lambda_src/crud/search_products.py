@@ -0,0 +1,26 @@
+from api import BadRequest, api_handler, query_int, response
+from products import SEARCH_MODES, search_products
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_QUERY_LENGTH = 200
+# Shorter terms have no complete trigram, so the trigram indexes cannot narrow them down
+MIN_TRIGRAM_QUERY_LENGTH = 3
+
+
+@api_handler
+def lambda_handler(event, context):
+    params = event.get("queryStringParameters") or {}
+    query = (params.get("q") or "").strip()
+    mode = params.get("mode", "text")
+    if mode not in SEARCH_MODES:
+        raise BadRequest(f"Invalid mode: {mode}, expected one of {', '.join(SEARCH_MODES)}")
+    if not query or len(query) > MAX_QUERY_LENGTH:
+        raise BadRequest(f"q must be 1 to {MAX_QUERY_LENGTH} characters")
+    if mode != "text" and len(query) < MIN_TRIGRAM_QUERY_LENGTH:
+        raise BadRequest(f"q must be at least {MIN_TRIGRAM_QUERY_LENGTH} characters in {mode} mode")
+    limit = query_int(event, "limit", DEFAULT_LIMIT)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise BadRequest(f"Invalid limit: {limit}, expected 1 to {MAX_LIMIT}")
+
+    return response(200, {"items": search_products(query, mode, limit)})
@@ -0,0 +1,139 @@
+"""Stock changes that stay correct under concurrent orders for the same products.
+
+A single adjustment is one conditional UPDATE: the stock check runs on the
+locked, current row, so two orders can never sell the same unit, and there
+is no read-modify-write window. A reservation changes several products in
+one transaction and locks them in id order first, so reservations that
+share products wait for each other instead of deadlocking. Each function
+also names the reason recorded with its stock movements (see movements.py).
+"""
+from api import BadRequest, Conflict
+from db import transaction
+from movements import record_reason
+from products import COLUMNS
+
+RESERVATION_COLUMNS = "id, status, created_at, released_at"
+# COLUMNS qualified for UPDATE ... FROM, where the other table may share column names
+PRODUCT_COLUMNS = ", ".join(f"products.{column}" for column in COLUMNS.split(", "))
+
+
+def adjust_stock(product_id, delta, expected_version=None):
+    """Add delta (negative to take stock) to a product's quantity; None if there is no such product.
+
+    Raises Conflict if the quantity would go below zero or, with
+    expected_version, if the product has changed since that version.
+    """
+    with transaction() as cursor:
+        record_reason(cursor, "adjustment")
+        cursor.execute(
+            f"UPDATE products SET quantity = quantity + %(delta)s "
+            f"WHERE id = %(id)s AND quantity + %(delta)s >= 0 "
+            f"AND (%(expected_version)s::integer IS NULL OR version = %(expected_version)s) "
+            f"RETURNING {COLUMNS}",
+            {"id": product_id, "delta": delta, "expected_version": expected_version}
+        )
+        product = cursor.fetchone()
+        if product is not None:
+            return product
+        cursor.execute("SELECT quantity, version FROM products WHERE id = %s", (product_id,))
+        current = cursor.fetchone()
+
+    if current is None:
+        return None
+    if expected_version is not None and current["version"] != expected_version:
+        raise Conflict("Version conflict", {"version": current["version"]})
+    raise Conflict("Insufficient stock", {"available": current["quantity"]})
+
+
+def lock_products(cursor, product_ids):
+    """Lock the products in id order; returns their quantities by id"""
+    cursor.execute(
+        "SELECT id, quantity FROM products WHERE id = ANY(%s) ORDER BY id FOR NO KEY UPDATE",
+        (sorted(product_ids),)
+    )
+    return {row["id"]: row["quantity"] for row in cursor.fetchall()}
+
+
+def reserve_stock(quantities):
+    """Take quantities ({product_id: quantity}) out of stock together, or none of them.
+
+    Returns the reservation, with its items, and the updated products. Raises
+    Conflict listing every item that is short.
+    """
+    product_ids = sorted(quantities)
+    with transaction() as cursor:
+        available = lock_products(cursor, product_ids)
+        unknown = [product_id for product_id in product_ids if product_id not in available]
+        if unknown:
+            raise BadRequest(f"Unknown products: {', '.join(map(str, unknown))}")
+        short = [
+            {"product_id": product_id, "requested": quantities[product_id], "available": available[product_id]}
+            for product_id in product_ids
+            if available[product_id] < quantities[product_id]
+        ]
+        if short:
+            raise Conflict("Insufficient stock", {"items": short})
+
+        items = {"ids": product_ids, "quantities": [quantities[product_id] for product_id in product_ids]}
+        cursor.execute(f"INSERT INTO stock_reservations DEFAULT VALUES RETURNING {RESERVATION_COLUMNS}")
+        reservation = cursor.fetchone()
+        record_reason(cursor, "reservation", reservation["id"])
+        cursor.execute(
+            "INSERT INTO stock_reservation_items (reservation_id, product_id, quantity) "
+            "SELECT %(reservation_id)s, * FROM unnest(%(ids)s::bigint[], %(quantities)s::integer[])",
+            {**items, "reservation_id": reservation["id"]}
+        )
+        cursor.execute(
+            f"UPDATE products SET quantity = products.quantity - item.quantity "
+            f"FROM unnest(%(ids)s::bigint[], %(quantities)s::integer[]) AS item (id, quantity) "
+            f"WHERE products.id = item.id "
+            f"RETURNING {PRODUCT_COLUMNS}",
+            items
+        )
+        products = cursor.fetchall()
+
+    reservation["items"] = [
+        {"product_id": product_id, "quantity": quantities[product_id]} for product_id in product_ids
+    ]
+    return reservation, products
+
+
+def release_reservation(reservation_id):
+    """Put an active reservation's items back in stock.
+
+    Returns the reservation and the updated products, or None if there is no
+    such reservation. Raises Conflict if it was already released.
+    """
+    with transaction() as cursor:
+        cursor.execute(
+            f"UPDATE stock_reservations SET status = 'released', released_at = now() "
+            f"WHERE id = %s AND status = 'active' RETURNING {RESERVATION_COLUMNS}",
+            (reservation_id,)
+        )
+        reservation = cursor.fetchone()
+        if reservation is None:
+            cursor.execute("SELECT status FROM stock_reservations WHERE id = %s", (reservation_id,))
+            if cursor.fetchone() is None:
+                return None
+            raise Conflict("Reservation is already released")
+
+        cursor.execute(
+            "SELECT product_id, quantity FROM stock_reservation_items WHERE reservation_id = %s",
+            (reservation_id,)
+        )
+        quantities = {row["product_id"]: row["quantity"] for row in cursor.fetchall()}
+        lock_products(cursor, quantities)
+        record_reason(cursor, "release", reservation_id)
+        cursor.execute(
+            f"UPDATE products SET quantity = products.quantity + item.quantity "
+            f"FROM stock_reservation_items item "
+            f"WHERE item.reservation_id = %s AND products.id = item.product_id "
+            f"RETURNING {PRODUCT_COLUMNS}",
+            (reservation_id,)
+        )
+        products = cursor.fetchall()
+
+    reservation["items"] = [
+        {"product_id": product_id, "quantity": quantity} for product_id, quantity in sorted(quantities.items())
+    ]
+    return reservation, products
@@ -0,0 +1,15 @@
+from api import api_handler, int_field, parse_body, path_id, response
+from product_cache import get_product_cache
+from products import update_product
+
+
+@api_handler
+def lambda_handler(event, context):
+    fields = parse_body(event)
+    expected_version = int_field(fields, "expected_version")
+    fields.pop("expected_version", None)
+    product = update_product(path_id(event), fields, expected_version)
+    if product is None:
+        return response(404, {"error": "Product not found"})
+    get_product_cache().store(product)
+    return response(200, product)
@@ -0,0 +1,15 @@
+from .network_stack import NetworkStack
+from .database_stack import DatabaseStack
+from .layers_stack import LambdaLayersStack
+from .crud_stack import CRUDStack
+from .api_stack import ApiStack
+from .catalog_stack import CatalogStack
+
+__all__ = [
+    "NetworkStack",
+    "DatabaseStack",
+    "LambdaLayersStack",
+    "CRUDStack",
+    "ApiStack",
+    "CatalogStack"
+]
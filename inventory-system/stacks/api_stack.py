@@ -0,0 +1,113 @@
+from aws_cdk import (
+    Stack,
+    Duration,
+    aws_apigateway as apigateway,
+    aws_lambda as lambda_,
+    CfnOutput,
+    Tags
+)
+from constructs import Construct
+
+
+class ApiStack(Stack):
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        config: dict,
+        create_product_function: lambda_.IFunction,
+        get_product_function: lambda_.IFunction,
+        list_products_function: lambda_.IFunction,
+        search_products_function: lambda_.IFunction,
+        batch_get_products_function: lambda_.IFunction,
+        batch_update_products_function: lambda_.IFunction,
+        update_product_function: lambda_.IFunction,
+        delete_product_function: lambda_.IFunction,
+        create_import_function: lambda_.IFunction,
+        get_import_function: lambda_.IFunction,
+        adjust_stock_function: lambda_.IFunction,
+        create_reservation_function: lambda_.IFunction,
+        release_reservation_function: lambda_.IFunction,
+        list_product_movements_function: lambda_.IFunction,
+        list_movements_function: lambda_.IFunction,
+        **kwargs
+    ) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        env_name = config["environment"]
+        api_config = config["api"]
+        cache_config = api_config["cache"]
+
+        # Stage caching only covers GET /products/{product_id}. Writes cannot invalidate
+        # it, so entries can be up to ttl_seconds stale.
+        cache_options = {}
+        if cache_config["enabled"]:
+            cache_options = dict(
+                cache_cluster_enabled=True,
+                cache_cluster_size=cache_config["size_gb"],
+                method_options={
+                    "/products/{product_id}/GET": apigateway.MethodDeploymentOptions(
+                        caching_enabled=True,
+                        cache_ttl=Duration.seconds(cache_config["ttl_seconds"])
+                    )
+                }
+            )
+
+        self.api = apigateway.RestApi(
+            self, "InventoryApi",
+            rest_api_name=f"{env_name}-inventory-api",
+            description=f"Inventory API - {env_name}",
+            deploy_options=apigateway.StageOptions(
+                stage_name=env_name,
+                throttling_rate_limit=api_config["throttle_rate_limit"],
+                throttling_burst_limit=api_config["throttle_burst_limit"],
+                **cache_options
+            )
+        )
+
+        products = self.api.root.add_resource("products")
+        products.add_method("POST", apigateway.LambdaIntegration(create_product_function))
+        products.add_method("GET", apigateway.LambdaIntegration(list_products_function))
+        products.add_resource("search").add_method("GET", apigateway.LambdaIntegration(search_products_function))
+        # A batch is one request to the stage throttle, however many products it carries
+        batch = products.add_resource("batch")
+        batch.add_method("GET", apigateway.LambdaIntegration(batch_get_products_function))
+        batch.add_method("PATCH", apigateway.LambdaIntegration(batch_update_products_function))
+
+        product = products.add_resource("{product_id}")
+        product.add_method(
+            "GET",
+            apigateway.LambdaIntegration(
+                get_product_function,
+                cache_key_parameters=["method.request.path.product_id"]
+            ),
+            request_parameters={"method.request.path.product_id": True}
+        )
+        product.add_method("PUT", apigateway.LambdaIntegration(update_product_function))
+        product.add_method("DELETE", apigateway.LambdaIntegration(delete_product_function))
+        product.add_resource("stock").add_method("POST", apigateway.LambdaIntegration(adjust_stock_function))
+        product.add_resource("movements").add_method(
+            "GET", apigateway.LambdaIntegration(list_product_movements_function)
+        )
+
+        imports = products.add_resource("imports")
+        imports.add_method("POST", apigateway.LambdaIntegration(create_import_function))
+        imports.add_resource("{import_id}").add_method("GET", apigateway.LambdaIntegration(get_import_function))
+
+        reservations = self.api.root.add_resource("reservations")
+        reservations.add_method("POST", apigateway.LambdaIntegration(create_reservation_function))
+        reservations.add_resource("{reservation_id}").add_method(
+            "DELETE", apigateway.LambdaIntegration(release_reservation_function)
+        )
+
+        self.api.root.add_resource("movements").add_method("GET", apigateway.LambdaIntegration(list_movements_function))
+
+        CfnOutput(
+            self, "ApiUrl",
+            value=self.api.url,
+            description="Inventory API base URL",
+            export_name=f"{env_name}-inventory-api-url"
+        )
+
+        for key, value in config["tags"].items():
+            Tags.of(self).add(key, value)
@@ -0,0 +1,78 @@
+from typing import List
+
+from aws_cdk import (
+    Stack,
+    aws_glue as glue,
+    aws_iam as iam,
+    aws_s3 as s3,
+    CfnOutput,
+    Tags
+)
+from constructs import Construct
+
+
+class CatalogStack(Stack):
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        config: dict,
+        data_bucket: s3.IBucket,
+        data_prefix: str,
+        tables: List[str],
+        **kwargs
+    ) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        env_name = config["environment"]
+        lake_config = config["lake"]
+
+        self.database = glue.CfnDatabase(
+            self, "DataLakeDatabase",
+            catalog_id=self.account,
+            database_input=glue.CfnDatabase.DatabaseInputProperty(
+                name=f"{env_name}_inventory_lake",
+                description=f"Product changes and stock movements relayed from the inventory database - {env_name}"
+            )
+        )
+
+        self.crawler_role = iam.Role(
+            self, "CrawlerRole",
+            assumed_by=iam.ServicePrincipal("glue.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSGlueServiceRole")
+            ]
+        )
+        data_bucket.grant_read(self.crawler_role)
+
+        # One target per table folder, so each becomes its own table with year/month/day
+        # partitions. Only new folders are crawled, i.e. a new day's partition once.
+        self.crawler = glue.CfnCrawler(
+            self, "DataLakeCrawler",
+            name=f"{env_name}-inventory-lake-crawler",
+            role=self.crawler_role.role_arn,
+            database_name=self.database.ref,
+            targets=glue.CfnCrawler.TargetsProperty(
+                s3_targets=[
+                    glue.CfnCrawler.S3TargetProperty(path=f"s3://{data_bucket.bucket_name}/{data_prefix}/{table}/")
+                    for table in tables
+                ]
+            ),
+            schedule=glue.CfnCrawler.ScheduleProperty(schedule_expression=lake_config["crawler_schedule"]),
+            schema_change_policy=glue.CfnCrawler.SchemaChangePolicyProperty(
+                update_behavior="LOG", delete_behavior="LOG"
+            ),
+            recrawl_policy=glue.CfnCrawler.RecrawlPolicyProperty(
+                recrawl_behavior="CRAWL_NEW_FOLDERS_ONLY"
+            )
+        )
+        self.crawler.node.add_dependency(self.database)
+
+        CfnOutput(
+            self, "DataLakeDatabaseName",
+            value=self.database.ref,
+            description="Glue database of the inventory data lake tables"
+        )
+
+        for key, value in config["tags"].items():
+            Tags.of(self).add(key, value)
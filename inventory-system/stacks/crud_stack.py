@@ -0,0 +1,309 @@
+from typing import List, Optional
+
+from aws_cdk import (
+    Stack,
+    Duration,
+    RemovalPolicy,
+    Size,
+    aws_lambda as lambda_,
+    aws_ec2 as ec2,
+    aws_dynamodb as dynamodb,
+    aws_events as events,
+    aws_events_targets as targets,
+    aws_s3 as s3,
+    aws_s3_notifications as s3n,
+    aws_secretsmanager as secretsmanager,
+    triggers,
+    Tags
+)
+from constructs import Construct
+
+
+class CRUDStack(Stack):
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        config: dict,
+        vpc: ec2.Vpc,
+        lambda_sg: ec2.SecurityGroup,
+        psycopg2_layer: lambda_.LayerVersion,
+        db_secret: secretsmanager.Secret,
+        db_endpoint: str,
+        db_read_endpoints: Optional[List[str]] = None,
+        **kwargs
+    ) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        self.env_name = config["environment"]
+        self.lambda_config = config["lambda"]
+        db_config = config["database"]
+        cache_config = config["cache"]
+        import_config = config["imports"]
+        ledger_config = config["ledger"]
+        lake_config = config["lake"]
+
+        # The layer only accepts the predefined Runtime instances, not an equal new one
+        self.runtime = next(runtime for runtime in lambda_.Runtime.ALL if runtime.name == self.lambda_config["runtime"])
+        self.vpc = vpc
+        self.lambda_sg = lambda_sg
+        self.psycopg2_layer = psycopg2_layer
+        self.db_secret = db_secret
+
+        # All functions share one asset: the handlers plus the db/products modules
+        self.code = lambda_.Code.from_asset("lambda_src/crud", exclude=["__pycache__", "*.pyc"])
+        self.function_environment = {
+            "DB_HOST": db_endpoint,
+            "DB_PORT": "5432",
+            "DB_NAME": db_config["database_name"],
+            "DB_SECRET_ARN": db_secret.secret_arn,
+            "DB_SSLMODE": "require",
+            "DB_SECRET_TTL_SECONDS": str(db_config.get("secret_ttl_seconds", 300)),
+            "PRODUCT_CACHE_TTL_SECONDS": str(cache_config["local_ttl_seconds"]),
+            "PRODUCT_CACHE_MAX_ENTRIES": str(cache_config["local_max_entries"])
+        }
+        # Read-only queries go to the replicas; a client's reads stay on the primary right after its writes
+        if db_read_endpoints:
+            self.function_environment["DB_READ_HOSTS"] = ",".join(db_read_endpoints)
+            self.function_environment["READ_YOUR_WRITES_SECONDS"] = str(
+                db_config["read_replicas"]["read_your_writes_seconds"]
+            )
+
+        # Shared tier of the product read cache, reached through the DynamoDB gateway endpoint
+        self.product_cache_table = None
+        if cache_config["shared"]["enabled"]:
+            self.product_cache_table = dynamodb.Table(
+                self, "ProductCacheTable",
+                table_name=f"{self.env_name}-inventory-product-cache",
+                partition_key=dynamodb.Attribute(name="product_id", type=dynamodb.AttributeType.NUMBER),
+                billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                time_to_live_attribute="expires_at",
+                removal_policy=RemovalPolicy.DESTROY
+            )
+            self.function_environment["PRODUCT_CACHE_TABLE"] = self.product_cache_table.table_name
+            self.function_environment["PRODUCT_CACHE_SHARED_TTL_SECONDS"] = str(cache_config["shared"]["ttl_seconds"])
+
+        # Import files are uploaded here through presigned URLs and kept for retention_days
+        self.import_bucket = s3.Bucket(
+            self, "ProductImportBucket",
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            enforce_ssl=True,
+            lifecycle_rules=[s3.LifecycleRule(expiration=Duration.days(import_config["retention_days"]))],
+            removal_policy=RemovalPolicy.DESTROY,
+            auto_delete_objects=True
+        )
+        self.function_environment["IMPORT_BUCKET"] = self.import_bucket.bucket_name
+        self.function_environment["IMPORT_UPLOAD_URL_EXPIRY_SECONDS"] = str(import_config["upload_url_expiry_seconds"])
+
+        self.migrate_function = triggers.TriggerFunction(
+            self, "MigrateFunction",
+            execute_on_handler_change=True,
+            **self._function_props("migrate", "migrate.lambda_handler", "Applies database schema migrations")
+        )
+        self.migrate_function.add_environment("DB_CONNECT_TIMEOUT", "30")
+        db_secret.grant_read(self.migrate_function)
+
+        # "router" serves every product route from one function: fewer cold starts and
+        # fewer warm connections; "split" keeps one function per route
+        self.router_function = None
+        if self.lambda_config.get("function_mode", "split") == "router":
+            self.router_function = self._create_function(
+                "ProductRouterFunction", "products", "router.lambda_handler", "Serves all product routes"
+            )
+            self.create_product_function = self.router_function
+            self.get_product_function = self.router_function
+            self.list_products_function = self.router_function
+            self.search_products_function = self.router_function
+            self.batch_get_products_function = self.router_function
+            self.batch_update_products_function = self.router_function
+            self.update_product_function = self.router_function
+            self.delete_product_function = self.router_function
+            self.create_import_function = self.router_function
+            self.get_import_function = self.router_function
+            self.adjust_stock_function = self.router_function
+            self.create_reservation_function = self.router_function
+            self.release_reservation_function = self.router_function
+            self.list_product_movements_function = self.router_function
+            self.list_movements_function = self.router_function
+        else:
+            self.create_product_function = self._create_function(
+                "CreateProductFunction", "create-product", "create_product.lambda_handler", "Creates a product"
+            )
+            self.get_product_function = self._create_function(
+                "GetProductFunction", "get-product", "get_product.lambda_handler", "Gets a product by id"
+            )
+            self.list_products_function = self._create_function(
+                "ListProductsFunction", "list-products", "list_products.lambda_handler", "Lists products a page at a time"
+            )
+            self.search_products_function = self._create_function(
+                "SearchProductsFunction", "search-products", "search_products.lambda_handler",
+                "Searches products by text, substring or similarity"
+            )
+            self.batch_get_products_function = self._create_function(
+                "BatchGetProductsFunction", "batch-get-products", "batch_get_products.lambda_handler",
+                "Gets several products by id at once"
+            )
+            self.batch_update_products_function = self._create_function(
+                "BatchUpdateProductsFunction", "batch-update-products", "batch_update_products.lambda_handler",
+                "Updates several products in one transaction"
+            )
+            self.update_product_function = self._create_function(
+                "UpdateProductFunction", "update-product", "update_product.lambda_handler", "Updates product fields"
+            )
+            self.delete_product_function = self._create_function(
+                "DeleteProductFunction", "delete-product", "delete_product.lambda_handler", "Deletes a product"
+            )
+            self.create_import_function = self._create_function(
+                "CreateImportFunction", "create-import", "create_import.lambda_handler",
+                "Creates a product import and its upload URL"
+            )
+            self.get_import_function = self._create_function(
+                "GetImportFunction", "get-import", "get_import.lambda_handler", "Gets a product import and its errors"
+            )
+            self.adjust_stock_function = self._create_function(
+                "AdjustStockFunction", "adjust-stock", "adjust_stock.lambda_handler", "Adds to or takes from a product's stock"
+            )
+            self.create_reservation_function = self._create_function(
+                "CreateReservationFunction", "create-reservation", "create_reservation.lambda_handler",
+                "Reserves stock of several products at once"
+            )
+            self.release_reservation_function = self._create_function(
+                "ReleaseReservationFunction", "release-reservation", "release_reservation.lambda_handler",
+                "Puts a reservation's stock back"
+            )
+            self.list_product_movements_function = self._create_function(
+                "ListProductMovementsFunction", "list-product-movements", "list_product_movements.lambda_handler",
+                "Lists a product's stock movements in a time window"
+            )
+            self.list_movements_function = self._create_function(
+                "ListMovementsFunction", "list-movements", "list_movements.lambda_handler",
+                "Lists stock movements of all products in a time window"
+            )
+        self.import_bucket.grant_put(self.create_import_function)
+
+        import_props = self._function_props(
+            "import-products", "import_products.lambda_handler", "Imports products from uploaded files"
+        )
+        import_props.update(
+            memory_size=import_config["memory_size"],
+            timeout=Duration.seconds(import_config["timeout"]),
+            environment={
+                **self.function_environment,
+                "IMPORT_CHUNK_ROWS": str(import_config["chunk_rows"]),
+                "IMPORT_TIMEOUT_SECONDS": str(import_config["timeout"])
+            }
+        )
+        self.import_products_function = lambda_.Function(self, "ImportProductsFunction", **import_props)
+        self.db_secret.grant_read(self.import_products_function)
+        if self.product_cache_table is not None:
+            self.product_cache_table.grant_read_write_data(self.import_products_function)
+        self.import_bucket.grant_read(self.import_products_function)
+        self.import_bucket.add_event_notification(
+            s3.EventType.OBJECT_CREATED,
+            s3n.LambdaDestination(self.import_products_function),
+            s3.NotificationKeyFilter(prefix="imports/")
+        )
+
+        # Detached stock movement partitions are archived here before they are dropped. The
+        # archive is the only copy of that history, so it outlives the stack.
+        self.ledger_archive_bucket = s3.Bucket(
+            self, "LedgerArchiveBucket",
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            enforce_ssl=True,
+            removal_policy=RemovalPolicy.RETAIN
+        )
+        maintain_props = self._function_props(
+            "maintain-movements", "maintain_movements.lambda_handler",
+            "Creates, detaches and archives stock movement partitions"
+        )
+        maintain_props.update(
+            memory_size=ledger_config["memory_size"],
+            timeout=Duration.seconds(ledger_config["timeout"]),
+            ephemeral_storage_size=Size.mebibytes(ledger_config["ephemeral_storage_mb"]),
+            environment={
+                **self.function_environment,
+                "LEDGER_ARCHIVE_BUCKET": self.ledger_archive_bucket.bucket_name,
+                "LEDGER_PREMAKE_MONTHS": str(ledger_config["premake_months"]),
+                "LEDGER_RETENTION_MONTHS": str(ledger_config["retention_months"])
+            }
+        )
+        self.maintain_movements_function = lambda_.Function(self, "MaintainMovementsFunction", **maintain_props)
+        self.db_secret.grant_read(self.maintain_movements_function)
+        self.ledger_archive_bucket.grant_put(self.maintain_movements_function)
+        # Daily, so a missed run still leaves premake_months of partitions ahead
+        events.Rule(
+            self, "MaintainMovementsSchedule",
+            schedule=events.Schedule.rate(Duration.days(1)),
+            targets=[targets.LambdaFunction(self.maintain_movements_function)]
+        )
+
+        # Product changes and stock movements reach the data lake through the outbox (migrations/0008);
+        # each topic is a folder of Parquet files that CatalogStack catalogs as a table
+        self.lake_prefix = lake_config["prefix"]
+        self.lake_tables = ["products", "stock_movements"]
+        self.lake_bucket = s3.Bucket(
+            self, "DataLakeBucket",
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            enforce_ssl=True,
+            removal_policy=RemovalPolicy.RETAIN
+        )
+        pandas_layer = lake_config["pandas_layer"]
+        relay_props = self._function_props(
+            "relay-outbox", "relay_outbox.lambda_handler", "Relays product and stock changes to the data lake"
+        )
+        relay_props.update(
+            layers=[
+                self.psycopg2_layer,
+                lambda_.LayerVersion.from_layer_version_arn(
+                    self, "PandasLayer",
+                    f"arn:aws:lambda:{self.region}:{pandas_layer['account']}:layer:"
+                    f"{pandas_layer['name']}:{pandas_layer['version']}"
+                )
+            ],
+            memory_size=lake_config["memory_size"],
+            timeout=Duration.seconds(lake_config["timeout"]),
+            environment={
+                **self.function_environment,
+                "LAKE_BUCKET": self.lake_bucket.bucket_name,
+                "LAKE_PREFIX": self.lake_prefix,
+                "LAKE_COMPRESSION": lake_config["compression"],
+                "OUTBOX_BATCH_ROWS": str(lake_config["batch_rows"])
+            }
+        )
+        self.relay_outbox_function = lambda_.Function(self, "RelayOutboxFunction", **relay_props)
+        self.db_secret.grant_read(self.relay_outbox_function)
+        self.lake_bucket.grant_put(self.relay_outbox_function)
+        events.Rule(
+            self, "RelayOutboxSchedule",
+            schedule=events.Schedule.rate(Duration.minutes(lake_config["schedule_minutes"])),
+            targets=[targets.LambdaFunction(self.relay_outbox_function)]
+        )
+
+        for key, value in config["tags"].items():
+            Tags.of(self).add(key, value)
+
+    def _function_props(self, name: str, handler: str, description: str) -> dict:
+        return dict(
+            function_name=f"{self.env_name}-inventory-{name}",
+            runtime=self.runtime,
+            handler=handler,
+            code=self.code,
+            layers=[self.psycopg2_layer],
+            memory_size=self.lambda_config["memory_size"],
+            timeout=Duration.seconds(self.lambda_config["timeout"]),
+            vpc=self.vpc,
+            vpc_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_ISOLATED),
+            security_groups=[self.lambda_sg],
+            environment=self.function_environment,
+            description=description
+        )
+
+    def _create_function(self, construct_id: str, name: str, handler: str, description: str) -> lambda_.Function:
+        function = lambda_.Function(self, construct_id, **self._function_props(name, handler, description))
+        self.db_secret.grant_read(function)
+        if self.product_cache_table is not None:
+            self.product_cache_table.grant_read_write_data(function)
+        return function
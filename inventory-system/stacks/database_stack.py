@@ -1,4 +1,6 @@
 import json
+from typing import Optional
+
 from aws_cdk import (
     Stack,
     RemovalPolicy,
@@ -20,6 +22,7 @@ class DatabaseStack(Stack):
         config: dict,
         vpc: ec2.Vpc,
         rds_sg: ec2.SecurityGroup,
+        rds_proxy_sg: Optional[ec2.SecurityGroup] = None,
         **kwargs
     ) -> None:
         super().__init__(scope, construct_id, **kwargs)
@@ -48,11 +51,13 @@ class DatabaseStack(Stack):
             subnet_group_name=f"{env_name}-inventory-db-subnet-group"
         )
 
+        engine = rds.DatabaseInstanceEngine.postgres(
+            version=rds.PostgresEngineVersion.of("16.4", "16")
+        )
+
         self.db_instance = rds.DatabaseInstance(
             self, "InventoryDB",
-            engine=rds.DatabaseInstanceEngine.postgres(
-                version=rds.PostgresEngineVersion.of("16.4", "16")
-            ),
+            engine=engine,
             instance_type=ec2.InstanceType(db_config["instance_type"]),
             vpc=vpc,
             vpc_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_ISOLATED),
@@ -70,6 +75,65 @@ class DatabaseStack(Stack):
             storage_encrypted=True
         )
 
+        # Read replicas serve the read-only queries. Lambdas connect to them directly: RDS Proxy
+        # only fronts the primary of an RDS instance.
+        replica_config = db_config.get("read_replicas", {})
+        self.db_read_replicas = []
+        for number in range(1, replica_config.get("count", 0) + 1):
+            self.db_read_replicas.append(rds.DatabaseInstanceReadReplica(
+                self, f"InventoryDBReplica{number}",
+                source_database_instance=self.db_instance,
+                instance_type=ec2.InstanceType(replica_config["instance_type"]),
+                vpc=vpc,
+                vpc_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_ISOLATED),
+                security_groups=[rds_sg],
+                subnet_group=db_subnet_group,
+                deletion_protection=db_config["deletion_protection"],
+                removal_policy=RemovalPolicy.DESTROY if not db_config["deletion_protection"] else RemovalPolicy.RETAIN,
+                instance_identifier=f"{env_name}-inventory-db-replica-{number}",
+                publicly_accessible=False,
+                storage_encrypted=True
+            ))
+        self.db_read_endpoints = [replica.db_instance_endpoint_address for replica in self.db_read_replicas]
+
+        # Lambdas connect through RDS Proxy when enabled, so bursts share a bounded pool
+        proxy_config = db_config.get("rds_proxy", {})
+        self.db_proxy = None
+        self.db_endpoint = self.db_instance.db_instance_endpoint_address
+        if proxy_config.get("enabled", False):
+            # Imported with a literal port: the instance's own port is a token of this
+            # stack, and the proxy's ingress rule on the RDS security group lives in NetworkStack
+            proxy_target = rds.DatabaseInstance.from_database_instance_attributes(
+                self, "InventoryDBProxyTarget",
+                instance_identifier=self.db_instance.instance_identifier,
+                instance_endpoint_address=self.db_instance.db_instance_endpoint_address,
+                port=5432,
+                security_groups=[rds_sg],
+                engine=engine
+            )
+            self.db_proxy = rds.DatabaseProxy(
+                self, "InventoryDBProxy",
+                proxy_target=rds.ProxyTarget.from_instance(proxy_target),
+                db_proxy_name=f"{env_name}-inventory-db-proxy",
+                secrets=[self.db_secret],
+                vpc=vpc,
+                vpc_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_ISOLATED),
+                security_groups=[rds_proxy_sg],
+                require_tls=True,
+                max_connections_percent=proxy_config.get("max_connections_percent", 90),
+                max_idle_connections_percent=proxy_config.get("max_idle_connections_percent", 50),
+                borrow_timeout=Duration.seconds(proxy_config.get("borrow_timeout_seconds", 30)),
+                idle_client_timeout=Duration.seconds(proxy_config.get("idle_client_timeout_seconds", 1800))
+            )
+            self.db_endpoint = self.db_proxy.endpoint
+
+            CfnOutput(
+                self, "DBProxyEndpoint",
+                value=self.db_proxy.endpoint,
+                description="RDS Proxy endpoint",
+                export_name=f"{env_name}-inventory-db-proxy-endpoint"
+            )
+
         CfnOutput(
             self, "DBSecretArn",
             value=self.db_secret.secret_arn,
@@ -84,5 +148,13 @@ class DatabaseStack(Stack):
             export_name=f"{env_name}-inventory-db-endpoint"
         )
 
+        for number, replica in enumerate(self.db_read_replicas, start=1):
+            CfnOutput(
+                self, f"DBReplica{number}Endpoint",
+                value=replica.db_instance_endpoint_address,
+                description=f"Read replica {number} endpoint",
+                export_name=f"{env_name}-inventory-db-replica-{number}-endpoint"
+            )
+
         for key, value in config["tags"].items():
             Tags.of(self).add(key, value)
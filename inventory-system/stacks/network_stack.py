@@ -72,5 +72,50 @@ class NetworkStack(Stack):
             subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_ISOLATED)
         )
 
+        # Product import files, stock movement archives and data lake files move to and from S3
+        # without leaving the VPC
+        self.s3_endpoint = self.vpc.add_gateway_endpoint(
+            "S3Endpoint",
+            service=ec2.GatewayVpcEndpointAwsService.S3,
+            subnets=[ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_ISOLATED)]
+        )
+
+        if config["cache"]["shared"]["enabled"]:
+            # The shared product cache table is reached without leaving the VPC
+            self.dynamodb_endpoint = self.vpc.add_gateway_endpoint(
+                "DynamoDbEndpoint",
+                service=ec2.GatewayVpcEndpointAwsService.DYNAMODB,
+                subnets=[ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_ISOLATED)]
+            )
+
+        # RDS Proxy security group; DatabaseStack adds the proxy-to-RDS rules when it creates the proxy
+        self.rds_proxy_sg = None
+        if config["database"].get("rds_proxy", {}).get("enabled", False):
+            self.rds_proxy_sg = ec2.SecurityGroup(
+                self, "RDSProxySecurityGroup",
+                vpc=self.vpc,
+                security_group_name=f"{env_name}-rds-proxy-sg",
+                description="Security group for RDS Proxy",
+                allow_all_outbound=False
+            )
+
+            self.rds_proxy_sg.add_ingress_rule(
+                peer=self.lambda_sg,
+                connection=ec2.Port.tcp(5432),
+                description="Allow Lambda to access RDS Proxy"
+            )
+
+            self.vpc_endpoint_sg.add_ingress_rule(
+                peer=self.rds_proxy_sg,
+                connection=ec2.Port.tcp(443),
+                description="Allow RDS Proxy to access VPC Endpoints"
+            )
+
+            self.rds_proxy_sg.add_egress_rule(
+                peer=self.vpc_endpoint_sg,
+                connection=ec2.Port.tcp(443),
+                description="Allow RDS Proxy to read the database secret"
+            )
+
         for key, value in config["tags"].items():
             Tags.of(self).add(key, value)
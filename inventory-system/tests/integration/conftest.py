@@ -0,0 +1,108 @@
+"""Fixtures for tests that run the CRUD code against a local PostgreSQL and moto.
+
+The database comes from the DB_* variables read by db.py, as for the
+benchmarks, and the schema is applied with migrate.py. The server needs the
+contrib modules (pg_trgm), e.g. the postgres:16 image. Without DB_PASSWORD,
+or when no server answers, the tests are skipped:
+
+    DB_PASSWORD=postgres python -m pytest tests/integration
+
+Only the tests that take the replica fixture read from DB_READ_HOSTS; the
+others read from the primary, which has their writes at once.
+"""
+import itertools
+import os
+import sys
+import time
+from pathlib import Path
+
+import boto3
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "lambda_src" / "crud"))
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import psycopg2  # noqa: E402
+from moto import mock_aws  # noqa: E402
+
+import db  # noqa: E402
+import migrate  # noqa: E402
+from product_cache import SharedCache  # noqa: E402
+
+_skus = itertools.count()
+_read_hosts, db.DB_READ_HOSTS = db.DB_READ_HOSTS, []
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    if db.DB_PASSWORD is None:
+        pytest.skip("DB_PASSWORD is not set; these tests need a local PostgreSQL")
+    try:
+        connection = db.get_connection()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL is not reachable: {e}")
+    migrate.apply_migrations(connection)
+    yield
+    db.discard_connection()
+
+
+@pytest.fixture(autouse=True)
+def primary_reads_off():
+    # api_handler sets it per request, so a test calling handlers must not leak it into the next
+    yield
+    db.set_primary_reads(False)
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """Routes read-only transactions to the DB_READ_HOSTS replicas; skipped when none is set"""
+    if not _read_hosts:
+        pytest.skip("DB_READ_HOSTS is not set; these tests need a local replica")
+    monkeypatch.setattr(db, "DB_READ_HOSTS", _read_hosts)
+    yield
+    if db._read_connection is not None:
+        db._read_connection.close()
+    db._read_connection = None
+    db._read_host = None
+    db._replica_down_until.clear()
+
+
+@pytest.fixture
+def aws():
+    with mock_aws():
+        yield
+
+
+@pytest.fixture
+def shared_cache(aws):
+    """Shared product cache on a moto table keyed like CRUDStack's"""
+    boto3.client("dynamodb").create_table(
+        TableName="product-cache",
+        KeySchema=[{"AttributeName": "product_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "product_id", "AttributeType": "N"}],
+        BillingMode="PAY_PER_REQUEST"
+    )
+    return SharedCache("product-cache", ttl_seconds=120)
+
+
+@pytest.fixture
+def make_products():
+    """make_products(count, quantity=100) inserts products and returns their ids; all are deleted afterwards"""
+    prefix = f"TEST-{time.time_ns()}-"
+
+    def make(count, quantity=100):
+        with db.transaction() as cursor:
+            cursor.execute(
+                "INSERT INTO products (sku, name, price, quantity) "
+                "SELECT %s || %s || '-' || n, 'Test product ' || n, 9.99, %s "
+                "FROM generate_series(1, %s) AS n ORDER BY n RETURNING id",
+                (prefix, next(_skus), quantity, count)
+            )
+            return [row["id"] for row in cursor.fetchall()]
+
+    yield make
+    db.set_primary_reads(False)
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM products WHERE sku LIKE %s", (prefix + "%",))
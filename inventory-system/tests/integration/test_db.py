@@ -0,0 +1,122 @@
+import json
+import time
+
+import psycopg2
+import pytest
+
+import db
+import list_products
+
+
+def backend_pid():
+    with db.transaction() as cursor:
+        cursor.execute("SELECT pg_backend_pid() AS pid")
+        return cursor.fetchone()["pid"]
+
+
+def terminate(pid):
+    connection = db.connect(db.get_credentials())
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", (pid,))
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def test_warm_invocations_reuse_one_connection(make_products):
+    make_products(3)
+    pid = backend_pid()
+    for _ in range(5):
+        assert list_products.lambda_handler({"queryStringParameters": {"limit": "2"}}, None)["statusCode"] == 200
+    assert backend_pid() == pid
+
+
+def test_health_check_only_after_idle_time(monkeypatch):
+    checks = []
+    is_healthy = db.is_healthy
+    monkeypatch.setattr(db, "is_healthy", lambda connection: checks.append(1) or is_healthy(connection))
+    backend_pid()
+    backend_pid()
+    assert checks == []
+
+    monkeypatch.setattr(db, "_last_used_at", time.monotonic() - db.HEALTH_CHECK_AFTER_SECONDS - 1)
+    backend_pid()
+    assert checks == [1]
+
+
+def test_connection_lost_while_idle_is_replaced(monkeypatch):
+    pid = backend_pid()
+    terminate(pid)
+    monkeypatch.setattr(db, "_last_used_at", time.monotonic() - db.HEALTH_CHECK_AFTER_SECONDS - 1)
+    assert backend_pid() != pid
+
+
+def test_connection_that_fails_mid_request_is_reopened_next_time():
+    pid = backend_pid()
+    terminate(pid)
+    with pytest.raises((psycopg2.OperationalError, psycopg2.InterfaceError)):
+        backend_pid()
+    assert db._connection is None
+    assert backend_pid() != pid
+
+
+@pytest.fixture
+def secret(aws, monkeypatch):
+    """A role for the test, with db.py reading its credentials from a Secrets Manager secret"""
+    role = f"inventory_test_{time.time_ns()}"
+    with db.transaction() as cursor:
+        cursor.execute(f"CREATE ROLE {role} LOGIN PASSWORD 'before'")
+    monkeypatch.setattr(db, "_secrets_client", None)
+    client = db.get_secrets_client()
+    arn = client.create_secret(Name=role, SecretString=json.dumps({"username": role, "password": "before"}))["ARN"]
+    calls = []
+    client.meta.events.register("before-call.secrets-manager.GetSecretValue", lambda **kwargs: calls.append(1))
+    monkeypatch.setattr(db, "DB_PASSWORD", None)
+    monkeypatch.setattr(db, "DB_SECRET_ARN", arn)
+    monkeypatch.setattr(db, "_secret", None)
+    monkeypatch.setattr(db, "_secret_expires_at", 0.0)
+    yield {"role": role, "arn": arn, "client": client, "calls": calls}
+    monkeypatch.undo()
+    with db.transaction() as cursor:
+        cursor.execute(f"DROP ROLE {role}")
+
+
+def connected_user(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT current_user")
+            return cursor.fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_secret_is_fetched_once_per_ttl(secret):
+    for _ in range(3):
+        assert db.get_credentials()["username"] == secret["role"]
+    assert len(secret["calls"]) == 1
+
+    db._secret_expires_at = time.monotonic() - 1
+    db.get_credentials()
+    assert len(secret["calls"]) == 2
+
+
+def test_rotated_secret_is_fetched_again_when_authentication_fails(secret):
+    assert connected_user(db.open_connection()) == secret["role"]
+    try:
+        connected_user(db.connect({"username": secret["role"], "password": "wrong"}))
+        pytest.skip("the server does not check passwords")
+    except psycopg2.OperationalError:
+        pass
+
+    # Rotation changes the password and the secret, while this environment still caches the old one
+    with db.transaction() as cursor:
+        cursor.execute(f"ALTER ROLE {secret['role']} PASSWORD 'after'")
+    secret["client"].put_secret_value(
+        SecretId=secret["arn"], SecretString=json.dumps({"username": secret["role"], "password": "after"})
+    )
+    assert len(secret["calls"]) == 1
+
+    assert connected_user(db.open_connection()) == secret["role"]
+    assert len(secret["calls"]) == 2
+    assert db.get_credentials()["password"] == "after"
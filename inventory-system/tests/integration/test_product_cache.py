@@ -0,0 +1,112 @@
+import io
+
+import pytest
+
+import db
+import product_imports
+import products
+from product_cache import LocalCache, ProductCache
+
+
+def environment(shared_cache):
+    """The cache of one execution environment; each test environment has its own local tier"""
+    return ProductCache(LocalCache(ttl_seconds=60, max_entries=100), shared_cache)
+
+
+def load_never(product_id):
+    raise AssertionError(f"product {product_id} was read from the database")
+
+
+@pytest.fixture
+def run_import():
+    """run_import(csv_text) imports a CSV file; returns the new versions of the products it updated"""
+    import_ids = []
+
+    def run(text):
+        product_import = product_imports.create_import("csv")
+        import_ids.append(product_import["id"])
+        product_imports.claim_import(product_import["id"])
+        _, versions = product_imports.run_import(product_import["id"], "csv", io.BytesIO(text.encode()))
+        return versions
+
+    yield run
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM product_imports WHERE id = ANY(%s)", (import_ids,))
+
+
+def test_reads_fill_both_tiers(shared_cache, make_products):
+    product_id = make_products(1)[0]
+    first = environment(shared_cache)
+    assert first.get(product_id, products.get_product)["id"] == product_id
+    assert first.stats == {"database": 1}
+
+    assert first.get(product_id, load_never)["id"] == product_id
+    second = environment(shared_cache)
+    assert second.get(product_id, load_never)["id"] == product_id
+    assert (first.stats, second.stats) == ({"database": 1, "local": 1}, {"shared": 1})
+
+
+def test_update_cannot_be_overwritten_by_an_older_read(shared_cache, make_products):
+    product_id = make_products(1)[0]
+    old = products.get_product(product_id)
+    new = products.update_product(product_id, {"name": "Renamed"})
+    writer = environment(shared_cache)
+    writer.store(new)
+
+    # A reader that loaded the row before the update fills the cache after it
+    environment(shared_cache).fill(old)
+    assert shared_cache.get(product_id)["version"] == new["version"]
+    assert environment(shared_cache).get(product_id, load_never)["name"] == "Renamed"
+
+
+def test_delete_leaves_a_tombstone_older_reads_cannot_replace(shared_cache, make_products):
+    product_id = make_products(1)[0]
+    old = products.get_product(product_id)
+    environment(shared_cache).fill(old)
+    deleted = products.delete_product(product_id)
+    environment(shared_cache).evict(product_id, deleted["version"])
+
+    environment(shared_cache).fill(old)
+    reader = environment(shared_cache)
+    assert reader.get(product_id, load_never) is None
+    assert reader.stats == {"shared": 1}
+
+
+@pytest.mark.parametrize("cached_before_import", [True, False])
+def test_import_tombstones_keep_out_rows_read_before_the_import(
+    shared_cache, make_products, run_import, cached_before_import
+):
+    product_id = make_products(1)[0]
+    old = products.get_product(product_id)
+    if cached_before_import:
+        environment(shared_cache).fill(old)
+
+    versions = run_import(f"sku,name,price\n{old['sku']},Imported,19.99\n")
+    assert versions == {product_id: old["version"] + 1}
+    environment(shared_cache).invalidate(versions)
+
+    # A read that loaded the row before the import committed fills the cache after the tombstone
+    environment(shared_cache).fill(old)
+    reader = environment(shared_cache)
+    assert reader.get(product_id, products.get_product)["name"] == "Imported"
+    assert reader.stats == {"database": 1}
+
+    # That read stored the imported row over the tombstone, for every other environment
+    assert environment(shared_cache).get(product_id, load_never)["version"] == versions[product_id]
+
+
+def test_batch_reads_load_products_behind_stale_tombstones(shared_cache, make_products, run_import):
+    product_ids = make_products(3)
+    rows = products.get_products(product_ids)
+    environment(shared_cache).fill_many(rows)
+    skus = {row["id"]: row["sku"] for row in rows}
+
+    versions = run_import("sku,name,price\n" + f"{skus[product_ids[0]]},Imported,19.99\n")
+    environment(shared_cache).invalidate(versions)
+    environment(shared_cache).fill_many(rows)
+
+    reader = environment(shared_cache)
+    found = reader.get_many(product_ids, products.get_products)
+    assert found[product_ids[0]]["name"] == "Imported"
+    assert reader.stats == {"shared": 2, "database": 1}
+    assert environment(shared_cache).get_many(product_ids, load_never)[product_ids[0]]["name"] == "Imported"
@@ -0,0 +1,140 @@
+"""Read-only transactions go to the replica, except where they must see the latest writes.
+
+These need a replica that lags, e.g. one made with pg_basebackup as in
+benchmarks/read_routing.py, with recovery_min_apply_delay at 1 s:
+
+    DB_PASSWORD=postgres DB_READ_HOSTS=localhost:5433 python -m pytest tests/integration/test_read_routing.py
+"""
+import json
+import time
+
+import pytest
+
+import api
+import db
+import product_cache
+import products
+import router
+from product_cache import LocalCache, ProductCache
+
+
+def on_replica(read_only):
+    with db.transaction(read_only) as cursor:
+        cursor.execute("SELECT pg_is_in_recovery() AS replica")
+        return cursor.fetchone()["replica"]
+
+
+def call(method, resource, body=None, headers=None, **path):
+    result = router.lambda_handler({
+        "httpMethod": method,
+        "resource": resource,
+        "headers": headers or {},
+        "pathParameters": {name: str(value) for name, value in path.items()},
+        "body": json.dumps(body) if body is not None else None
+    }, None)
+    return result, json.loads(result["body"]) if result["body"] else None
+
+
+def wait_for_replica(product_id, name):
+    """Waits until the replica has the product with that name"""
+    deadline = time.monotonic() + 30
+    while (products.get_product(product_id) or {}).get("name") != name:
+        assert time.monotonic() < deadline, "the replica did not catch up"
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def lagging(replica):
+    """Skips unless the replica misses a write made just before; use it right after the write"""
+
+    def check(product_id, name):
+        if (products.get_product(product_id) or {}).get("name") == name:
+            pytest.skip("the replica does not lag; set its recovery_min_apply_delay")
+
+    return check
+
+
+@pytest.fixture
+def uncached(monkeypatch):
+    """Handlers read through a cache with every tier off, so their reads may use the replica"""
+    monkeypatch.setattr(product_cache, "_product_cache", ProductCache(LocalCache(0, 0)))
+
+
+def test_read_only_transactions_run_on_the_replica(replica):
+    assert on_replica(read_only=True)
+    assert not on_replica(read_only=False)
+
+
+def test_primary_reads_send_read_only_transactions_to_the_primary(replica):
+    with db.primary_reads():
+        assert not on_replica(read_only=True)
+    assert on_replica(read_only=True)
+
+    db.set_primary_reads(True)
+    assert not on_replica(read_only=True)
+    db.set_primary_reads(False)
+    assert on_replica(read_only=True)
+
+
+def test_a_client_reads_its_own_write(replica, lagging, uncached):
+    sku = f"TEST-{time.time_ns()}-ROUTING"
+    created, product = call("POST", "/products", {"sku": sku, "name": "Routing test", "price": 1})
+    try:
+        lagging(product["id"], "Routing test")
+        header = created["headers"][api.LAST_WRITE_HEADER]
+        cookie = created["headers"]["Set-Cookie"].split(";")[0]
+
+        stale, _ = call("GET", "/products/{product_id}", product_id=product["id"])
+        by_header, _ = call(
+            "GET", "/products/{product_id}", headers={api.LAST_WRITE_HEADER: header}, product_id=product["id"]
+        )
+        by_cookie, _ = call("GET", "/products/{product_id}", headers={"Cookie": cookie}, product_id=product["id"])
+
+        assert stale["statusCode"] == 404
+        assert by_header["statusCode"] == 200
+        assert by_cookie["statusCode"] == 200
+        assert not db._primary_reads
+    finally:
+        with db.transaction() as cursor:
+            cursor.execute("DELETE FROM products WHERE sku = %s", (sku,))
+
+
+def test_a_write_time_past_the_window_reads_from_the_replica(replica, lagging, uncached, make_products):
+    [product_id] = make_products(1)
+    wait_for_replica(product_id, "Test product 1")
+    updated, _ = call("PUT", "/products/{product_id}", {"name": "Renamed"}, product_id=product_id)
+    lagging(product_id, "Renamed")
+    old = str(int(updated["headers"][api.LAST_WRITE_HEADER]) - (api.READ_YOUR_WRITES_SECONDS + 1) * 1000)
+
+    _, body = call("GET", "/products/{product_id}", headers={api.LAST_WRITE_HEADER: old}, product_id=product_id)
+
+    assert body["name"] == "Test product 1"
+
+
+@pytest.mark.parametrize("tier", ["local", "shared"])
+def test_cache_fills_load_from_the_primary(replica, lagging, request, tier, make_products):
+    """A row read from the lagging replica would fill the tier with the name before the update"""
+
+    def environment():
+        if tier == "local":
+            return ProductCache(LocalCache(ttl_seconds=60, max_entries=100))
+        return ProductCache(LocalCache(0, 0), request.getfixturevalue("shared_cache"))
+
+    first, second = make_products(2)
+    wait_for_replica(second, "Test product 2")
+    products.update_product(first, {"name": "Renamed"})
+    products.update_product(second, {"name": "Renamed"})
+    lagging(second, "Renamed")
+
+    assert environment().get(first, products.get_product)["name"] == "Renamed"
+    assert [product["name"] for product in environment().get_many([second], products.get_products)] == ["Renamed"]
+
+
+def test_reads_with_every_tier_off_use_the_replica(replica, lagging, make_products):
+    cache = ProductCache(LocalCache(0, 0))
+    [product_id] = make_products(1)
+    wait_for_replica(product_id, "Test product 1")
+    products.update_product(product_id, {"name": "Renamed"})
+    lagging(product_id, "Renamed")
+
+    assert cache.get(product_id, products.get_product)["name"] == "Test product 1"
@@ -0,0 +1,55 @@
+"""Search returns the top of the full ranking, however many rows match"""
+import string
+import time
+
+import pytest
+
+import db
+import products
+
+WEAK_MATCHES = 2500
+
+
+@pytest.fixture
+def catalogue():
+    """A term with many weak matches, inserted first, and three exact ones inserted last; returns both"""
+    prefix = f"TEST-{time.time_ns()}-"
+    term = "qv" + "".join(string.ascii_lowercase[int(digit)] for digit in str(time.time_ns())[-8:])
+    with db.transaction() as cursor:
+        # Weak: the term only in the description, and as the start of a longer word in the name
+        cursor.execute(
+            "INSERT INTO products (sku, name, description, price) "
+            "SELECT %(prefix)s || 'W' || n, %(term)s || 'extra' || n, 'Goes with a ' || %(term)s, 1 "
+            "FROM generate_series(1, %(count)s) AS n ORDER BY n",
+            {"prefix": prefix, "term": term, "count": WEAK_MATCHES}
+        )
+        cursor.execute(
+            "INSERT INTO products (sku, name, price) "
+            "SELECT %(prefix)s || 'S' || n, %(term)s, 1 FROM generate_series(1, 3) AS n ORDER BY n RETURNING id",
+            {"prefix": prefix, "term": term}
+        )
+        exact = [row["id"] for row in cursor.fetchall()]
+    yield term, exact
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM products WHERE sku LIKE %s", (prefix + "%",))
+
+
+@pytest.mark.parametrize("mode", list(products.SEARCH_MODES))
+def test_best_matches_come_first_behind_many_weaker_ones(catalogue, mode):
+    term, exact = catalogue
+
+    found = products.search_products(term, mode, limit=5)
+
+    assert [row["id"] for row in found[:3]] == exact
+    assert found[2]["score"] > found[3]["score"]
+
+
+@pytest.mark.parametrize("mode", list(products.SEARCH_MODES))
+def test_ties_are_ordered_by_id(catalogue, mode):
+    term, _ = catalogue
+
+    found = products.search_products(term, mode, limit=50)
+
+    ranking = [(-row["score"], row["id"]) for row in found]
+    assert ranking == sorted(ranking)
+    assert len(found) == 50
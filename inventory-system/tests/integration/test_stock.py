@@ -0,0 +1,93 @@
+"""Concurrent stock changes never oversell and reservations never deadlock"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import db
+import stock
+from api import Conflict
+
+WORKERS = 8
+
+
+@pytest.fixture
+def connection_per_thread(monkeypatch):
+    """Gives each thread its own primary connection, as each execution environment has"""
+    local = threading.local()
+    opened = []
+
+    def get_connection():
+        if not hasattr(local, "connection"):
+            local.connection = db.open_connection()
+            opened.append(local.connection)
+        return local.connection
+
+    monkeypatch.setattr(db, "get_connection", get_connection)
+    yield
+    for connection in opened:
+        connection.close()
+
+
+def run_concurrently(task, arguments):
+    """task(argument) for every argument on WORKERS threads, started together; returns the results"""
+    start = threading.Barrier(WORKERS)
+
+    def run(chunk):
+        start.wait()
+        return [task(argument) for argument in chunk]
+
+    chunks = [arguments[n::WORKERS] for n in range(WORKERS)]
+    with ThreadPoolExecutor(WORKERS) as pool:
+        return [result for results in pool.map(run, chunks) for result in results]
+
+
+def quantities(product_ids):
+    with db.transaction() as cursor:
+        cursor.execute("SELECT id, quantity FROM products WHERE id = ANY(%s)", (product_ids,))
+        return {row["id"]: row["quantity"] for row in cursor.fetchall()}
+
+
+def outcome(change):
+    try:
+        change()
+        return "done"
+    except Conflict:
+        return "short"
+
+
+def test_concurrent_adjustments_sell_exactly_the_stock(make_products, connection_per_thread):
+    [product_id] = make_products(1, quantity=50)
+
+    results = run_concurrently(lambda _: outcome(lambda: stock.adjust_stock(product_id, -1)), list(range(120)))
+
+    assert results.count("done") == 50
+    assert results.count("short") == 70
+    assert quantities([product_id]) == {product_id: 0}
+
+
+def test_concurrent_reservations_take_all_items_or_none(make_products, connection_per_thread):
+    first, second = make_products(2, quantity=30)
+
+    # Each reservation takes 1 of the first product and 2 of the second, which runs out first
+    results = run_concurrently(lambda _: outcome(lambda: stock.reserve_stock({first: 1, second: 2})), list(range(40)))
+
+    assert results.count("done") == 15
+    assert quantities([first, second]) == {first: 15, second: 0}
+
+
+def test_overlapping_reservations_in_any_order_do_not_deadlock(make_products, connection_per_thread):
+    product_ids = make_products(4, quantity=1000)
+
+    def reserve_and_release(n):
+        # Every other order lists its items in reverse, as clients would send them in any order
+        items = product_ids[::-1] if n % 2 else product_ids
+        reservation, _ = stock.reserve_stock({product_id: 1 + n % 3 for product_id in items})
+        if n % 4 == 0:
+            stock.release_reservation(reservation["id"])
+            return 0
+        return 1 + n % 3
+
+    taken = sum(run_concurrently(reserve_and_release, list(range(200))))
+
+    assert quantities(product_ids) == {product_id: 1000 - taken for product_id in product_ids}
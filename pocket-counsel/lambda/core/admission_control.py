@@ -0,0 +1,283 @@
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import boto3
+from botocore.exceptions import ClientError
+
+from metrics import put_metric
+
+logger = logging.getLogger()
+
+ADMISSION_TABLE = os.environ.get('ADMISSION_TABLE', '')
+DYNAMODB_ENDPOINT_URL = os.environ.get('DYNAMODB_ENDPOINT_URL') or None
+
+REJECT_CHAT_RATE = 'chat_rate'
+REJECT_BUSY = 'busy'
+
+
+class InMemoryCounterStore:
+    """Process-local stand-in for DynamoDBCounterStore (local runs and load tests)"""
+
+    def __init__(self) -> None:
+        self._items: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def take_chat_token(self, chat_id: int, rate_per_minute: float, burst: float, now: float) -> bool:
+        with self._lock:
+            item = self._items.get(f"chat#{chat_id}", {'tokens': burst, 'updated_at': now})
+            tokens = min(burst, item['tokens'] + (now - item['updated_at']) * rate_per_minute / 60)
+            allowed = tokens >= 1
+            self._items[f"chat#{chat_id}"] = {'tokens': tokens - 1 if allowed else tokens, 'updated_at': now}
+            return allowed
+
+    def free_slots(self, slot_count: int, now: float) -> List[int]:
+        with self._lock:
+            return [
+                slot for slot in range(slot_count)
+                if f"slot#{slot}" not in self._items or self._items[f"slot#{slot}"]['lease_expires_at'] <= now
+            ]
+
+    def acquire_slot(self, slot: int, lease_token: str, lease_seconds: float, now: float) -> bool:
+        with self._lock:
+            item = self._items.get(f"slot#{slot}")
+            if item and item['lease_expires_at'] > now:
+                return False
+            self._items[f"slot#{slot}"] = {'lease_expires_at': now + lease_seconds, 'lease_token': lease_token}
+            return True
+
+    def release_slot(self, slot: int, lease_token: str) -> None:
+        with self._lock:
+            if self._items.get(f"slot#{slot}", {}).get('lease_token') == lease_token:
+                del self._items[f"slot#{slot}"]
+
+    def charge_tokens(self, window: int, amount: int, limit: int) -> bool:
+        with self._lock:
+            item = self._items.setdefault(f"tpm#{window}", {'tokens': 0})
+            if item['tokens'] + amount > limit:
+                return False
+            item['tokens'] += amount
+            return True
+
+
+class DynamoDBCounterStore:
+    """Admission state shared by every Lambda instance, using atomic DynamoDB writes.
+
+    - chat#<id>: per-chat token bucket, refilled on read and written back
+      with an optimistic condition on updated_at
+    - slot#<n>: global concurrency slots held under a lease, so a crashed
+      invocation frees its slot when the lease runs out. Each lease carries
+      the holder's token, and only that holder can release it
+    - tpm#<minute>: tokens charged in the current minute, incremented with a
+      conditional ADD
+    """
+
+    def __init__(self, table_name: str) -> None:
+        self.table_name = table_name
+        self._dynamodb = None
+
+    def _client(self):
+        if self._dynamodb is None:
+            self._dynamodb = boto3.client('dynamodb', endpoint_url=DYNAMODB_ENDPOINT_URL)
+        return self._dynamodb
+
+    def take_chat_token(self, chat_id: int, rate_per_minute: float, burst: float, now: float) -> bool:
+        key = {'pk': {'S': f"chat#{chat_id}"}}
+        for _ in range(3):
+            item = self._client().get_item(TableName=self.table_name, Key=key, ConsistentRead=True).get('Item')
+            if item:
+                previous = item['updated_at']['N']
+                elapsed = now - float(previous)
+                tokens = min(burst, float(item['tokens']['N']) + max(0.0, elapsed) * rate_per_minute / 60)
+            else:
+                previous, tokens = None, burst
+
+            allowed = tokens >= 1
+            try:
+                self._client().put_item(
+                    TableName=self.table_name,
+                    Item={
+                        **key,
+                        'tokens': {'N': str(tokens - 1 if allowed else tokens)},
+                        'updated_at': {'N': repr(now)},
+                        'expires_at': {'N': str(int(now + 86400))}
+                    },
+                    **(
+                        {
+                            'ConditionExpression': 'updated_at = :previous',
+                            'ExpressionAttributeValues': {':previous': {'N': previous}}
+                        }
+                        if previous is not None
+                        else {'ConditionExpression': 'attribute_not_exists(pk)'}
+                    )
+                )
+                return allowed
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+        # Lost every race: the chat is clearly sending in bursts
+        return False
+
+    def free_slots(self, slot_count: int, now: float) -> List[int]:
+        """Slots with no lease or an expired one, read with one BatchGetItem per 100 slots"""
+        free = []
+        for start in range(0, slot_count, 100):
+            keys = [{'pk': {'S': f"slot#{slot}"}} for slot in range(start, min(start + 100, slot_count))]
+            response = self._client().batch_get_item(
+                RequestItems={
+                    self.table_name: {
+                        'Keys': keys,
+                        'ConsistentRead': True,
+                        'ProjectionExpression': 'pk, lease_expires_at'
+                    }
+                }
+            )
+            held = {
+                item['pk']['S'] for item in response['Responses'].get(self.table_name, [])
+                if float(item['lease_expires_at']['N']) > now
+            }
+            # Keys DynamoDB did not get to are probed anyway; acquire_slot has the final say
+            unprocessed = response.get('UnprocessedKeys', {}).get(self.table_name, {}).get('Keys', [])
+            unread = {key['pk']['S'] for key in unprocessed}
+            free.extend(
+                int(key['pk']['S'].split('#')[1]) for key in keys
+                if key['pk']['S'] not in held or key['pk']['S'] in unread
+            )
+        return free
+
+    def acquire_slot(self, slot: int, lease_token: str, lease_seconds: float, now: float) -> bool:
+        try:
+            self._client().put_item(
+                TableName=self.table_name,
+                Item={
+                    'pk': {'S': f"slot#{slot}"},
+                    'lease_token': {'S': lease_token},
+                    'lease_expires_at': {'N': repr(now + lease_seconds)},
+                    'expires_at': {'N': str(int(now + lease_seconds + 3600))}
+                },
+                ConditionExpression='attribute_not_exists(pk) OR lease_expires_at < :now',
+                ExpressionAttributeValues={':now': {'N': repr(now)}}
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+    def release_slot(self, slot: int, lease_token: str) -> None:
+        try:
+            self._client().delete_item(
+                TableName=self.table_name,
+                Key={'pk': {'S': f"slot#{slot}"}},
+                ConditionExpression='lease_token = :lease_token',
+                ExpressionAttributeValues={':lease_token': {'S': lease_token}}
+            )
+        except ClientError as e:
+            # The lease ran out and another request holds the slot now
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+    def charge_tokens(self, window: int, amount: int, limit: int) -> bool:
+        try:
+            self._client().update_item(
+                TableName=self.table_name,
+                Key={'pk': {'S': f"tpm#{window}"}},
+                UpdateExpression='ADD tokens :amount SET expires_at = :expires_at',
+                ConditionExpression='attribute_not_exists(tokens) OR tokens <= :remaining',
+                ExpressionAttributeValues={
+                    ':amount': {'N': str(amount)},
+                    ':remaining': {'N': str(limit - amount)},
+                    ':expires_at': {'N': str(window * 60 + 3600)}
+                }
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+
+class AdmissionController:
+    """Decides whether a question may call Bedrock now.
+
+    A chat over its own rate is rejected immediately. When the global
+    concurrency slots or the tokens-per-minute budget are exhausted, the
+    request waits in a short jittered queue up to max_queue_wait_seconds
+    before it is rejected. Store errors fail open.
+    """
+
+    def __init__(self, store, admission_config: Dict[str, Any]) -> None:
+        self.store = store
+        self.chat_rate_per_minute = admission_config.get('chat_rate_per_minute', 6)
+        self.chat_burst = admission_config.get('chat_burst', 3)
+        self.max_concurrency = admission_config.get('max_concurrency', 20)
+        self.tokens_per_minute = admission_config.get('tokens_per_minute', 100000)
+        self.slot_lease_seconds = admission_config.get('slot_lease_seconds', 70)
+        self.max_queue_wait = admission_config.get('max_queue_wait_seconds', 3)
+
+    def _try_acquire(self, estimated_tokens: int) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        lease_token = uuid.uuid4().hex
+        # Every free slot is tried, in random order so concurrent requests rarely race for the same one
+        free = self.store.free_slots(self.max_concurrency, now)
+        random.shuffle(free)
+        for slot in free:
+            if self.store.acquire_slot(slot, lease_token, self.slot_lease_seconds, now):
+                break
+        else:
+            return None
+
+        # Charged only once a slot is held, so queued retries don't burn budget
+        if not self.store.charge_tokens(int(now // 60), estimated_tokens, self.tokens_per_minute):
+            self.store.release_slot(slot, lease_token)
+            return None
+        return {'slot': slot, 'lease_token': lease_token}
+
+    def admit(self, chat_id: int, estimated_tokens: int) -> Dict[str, Any]:
+        """Return {'admitted': bool, 'reason': str, 'slot': int | None, 'lease_token': str | None}"""
+        started_at = time.monotonic()
+        try:
+            if not self.store.take_chat_token(chat_id, self.chat_rate_per_minute, self.chat_burst, time.time()):
+                return self._reject(REJECT_CHAT_RATE)
+
+            while True:
+                lease = self._try_acquire(estimated_tokens)
+                if lease is not None:
+                    put_metric('AdmissionQueueTime', (time.monotonic() - started_at) * 1000)
+                    return {'admitted': True, 'reason': '', **lease}
+                if time.monotonic() - started_at >= self.max_queue_wait:
+                    return self._reject(REJECT_BUSY)
+                time.sleep(random.uniform(0.1, 0.4))
+        except Exception as e:
+            logger.error(f"Admission control unavailable, admitting request: {e}")
+            return {'admitted': True, 'reason': '', 'slot': None, 'lease_token': None}
+
+    def release(self, ticket: Dict[str, Any]) -> None:
+        if ticket.get('slot') is None:
+            return
+        try:
+            self.store.release_slot(ticket['slot'], ticket['lease_token'])
+        except Exception as e:
+            logger.error(f"Failed to release admission slot {ticket['slot']}: {e}")
+
+    @staticmethod
+    def _reject(reason: str) -> Dict[str, Any]:
+        logger.warning(f"Request rejected by admission control: {reason}")
+        put_metric('AdmissionRejected', 1, unit='Count', dimensions={'Reason': reason})
+        return {'admitted': False, 'reason': reason, 'slot': None, 'lease_token': None}
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller(admission_config: Dict[str, Any]) -> AdmissionController:
+    """Return the per-container controller, created on first use"""
+    global _controller
+    if _controller is None:
+        store = DynamoDBCounterStore(ADMISSION_TABLE) if ADMISSION_TABLE else InMemoryCounterStore()
+        _controller = AdmissionController(store, admission_config)
+    return _controller
@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+
+from metrics import put_metric
+
+logger = logging.getLogger()
+
+BEDROCK_REGION = os.environ.get('BEDROCK_REGION', 'us-east-1')
+BEDROCK_ENDPOINT_URL = os.environ.get('BEDROCK_ENDPOINT_URL') or None
+BEDROCK_SECONDARY_ENDPOINT_URL = os.environ.get('BEDROCK_SECONDARY_ENDPOINT_URL') or None
+BEDROCK_HEDGING = json.loads(os.environ.get('BEDROCK_HEDGING') or '{}')
+
+def create_bedrock_client(region: str, endpoint_url: Optional[str] = None, max_pool_connections: int = 10):
+    """bedrock-runtime client with strict timeouts instead of the boto3 defaults (60 s, 3 retries)"""
+    return boto3.client(
+        'bedrock-runtime',
+        region_name=region,
+        endpoint_url=endpoint_url,
+        config=Config(
+            connect_timeout=BEDROCK_HEDGING.get('connect_timeout_seconds', 2),
+            read_timeout=BEDROCK_HEDGING.get('read_timeout_seconds', 25),
+            retries={'max_attempts': BEDROCK_HEDGING.get('max_attempts', 2), 'mode': 'standard'},
+            max_pool_connections=max_pool_connections
+        )
+    )
+
+
+class LatencyTracker:
+    """Rolling latency window per (model, call kind) used to derive the hedge delay"""
+
+    def __init__(self, window: int = 100, min_samples: int = 20) -> None:
+        self.min_samples = min_samples
+        self._samples: Dict[Tuple[str, str], Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, key: Tuple[str, str], latency_ms: float) -> None:
+        with self._lock:
+            self._samples[key].append(latency_ms)
+
+    def p95(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples[key])
+        if len(samples) < self.min_samples:
+            return None
+        return samples[int(len(samples) * 0.95) - 1]
+
+
+class HedgedInvoker:
+    """Deadline-aware Bedrock calls with a hedged request to a secondary model or region.
+
+    The primary request gets until the hedge delay (p95 of recent primary
+    latencies, clamped to [min_delay_ms, max_delay_ms]) before a second request
+    goes to the secondary target; a fast primary failure hedges immediately.
+    The first successful result wins and the loser is cancelled, or closed via
+    the cancel callback if it already started.
+    """
+
+    def __init__(
+        self,
+        primary_client,
+        secondary_client,
+        hedging_config: Dict[str, Any],
+        max_workers: int = 8
+    ) -> None:
+        self.primary_client = primary_client
+        self.secondary_client = secondary_client
+        self.enabled = hedging_config.get('enabled', False) and secondary_client is not None
+        self.secondary_model_id = hedging_config.get('secondary_model_id')
+        self.min_delay_ms = hedging_config.get('min_delay_ms', 1500)
+        self.max_delay_ms = hedging_config.get('max_delay_ms', 8000)
+        self.deadline_margin = hedging_config.get('deadline_margin_seconds', 3)
+        self.latencies = LatencyTracker()
+        # Loser requests keep running until their read timeout, so allow a few in flight
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bedrock')
+
+    def hedge_delay_ms(self, key: Tuple[str, str]) -> float:
+        p95 = self.latencies.p95(key)
+        if p95 is None:
+            return self.max_delay_ms
+        return min(self.max_delay_ms, max(self.min_delay_ms, p95))
+
+    def call(
+        self,
+        kind: str,
+        model_id: str,
+        start: Callable[[Any, str], Any],
+        cancel: Optional[Callable[[Any], None]] = None,
+        deadline: Optional[float] = None
+    ) -> Any:
+        """Run start(client, model_id) against the primary and, if slow, the secondary.
+
+        deadline is a time.monotonic() timestamp; the call gives up
+        deadline_margin_seconds before it so there is time left to reply.
+        """
+        key = (model_id, kind)
+        started_at = time.monotonic()
+        give_up_at = (deadline - self.deadline_margin) if deadline else None
+
+        def remaining() -> Optional[float]:
+            return None if give_up_at is None else max(0.0, give_up_at - time.monotonic())
+
+        def run(label: str, client, target_model_id: str) -> Tuple[str, Any]:
+            call_started_at = time.monotonic()
+            result = start(client, target_model_id)
+            if label == 'primary':
+                self.latencies.record(key, (time.monotonic() - call_started_at) * 1000)
+            return label, result
+
+        primary = self._executor.submit(run, 'primary', self.primary_client, model_id)
+        pending = {primary}
+        hedged = False
+
+        if self.enabled:
+            delay = self.hedge_delay_ms(key) / 1000
+            budget = remaining()
+            wait(pending, timeout=delay if budget is None else min(delay, budget))
+            primary_failed = primary.done() and primary.exception() is not None
+            if (not primary.done() or primary_failed) and (budget is None or remaining() > 0):
+                hedged = True
+                secondary_model_id = self.secondary_model_id or model_id
+                logger.warning(f"Hedging {kind} request for {model_id} to secondary {secondary_model_id}")
+                pending.add(self._executor.submit(run, 'secondary', self.secondary_client, secondary_model_id))
+
+        winner: Optional[Tuple[str, Any]] = None
+        error: Optional[BaseException] = None
+        while pending and winner is None:
+            budget = remaining()
+            if budget is not None and budget <= 0:
+                break
+            done, pending = wait(pending, timeout=budget, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                elif winner is None:
+                    winner = future.result()
+                elif cancel:
+                    cancel(future.result()[1])
+
+        for future in pending:
+            self._cancel_loser(future, cancel)
+
+        put_metric('BedrockHedged', 1 if hedged else 0, unit='Count', dimensions={'Kind': kind})
+        if winner is None:
+            if error is not None:
+                raise error
+            raise TimeoutError(f"Bedrock {kind} call exceeded deadline after {time.monotonic() - started_at:.1f}s")
+
+        if hedged:
+            put_metric('BedrockHedgeWin', 1 if winner[0] == 'secondary' else 0, unit='Count', dimensions={'Kind': kind})
+        return winner[1]
+
+    @staticmethod
+    def _cancel_loser(future: Future, cancel: Optional[Callable[[Any], None]]) -> None:
+        if future.cancel() or cancel is None:
+            return
+
+        def close(f: Future) -> None:
+            if not f.cancelled() and f.exception() is None:
+                cancel(f.result()[1])
+
+        future.add_done_callback(close)
+
+
+def create_invoker(max_workers: int = 8) -> HedgedInvoker:
+    max_pool_connections = max(10, max_workers)
+    primary_client = create_bedrock_client(BEDROCK_REGION, BEDROCK_ENDPOINT_URL, max_pool_connections)
+    secondary_client = None
+    if BEDROCK_HEDGING.get('enabled', False):
+        secondary_client = create_bedrock_client(
+            BEDROCK_HEDGING.get('secondary_region', BEDROCK_REGION),
+            BEDROCK_SECONDARY_ENDPOINT_URL or BEDROCK_ENDPOINT_URL,
+            max_pool_connections
+        )
+    return HedgedInvoker(primary_client, secondary_client, BEDROCK_HEDGING, max_workers=max_workers)
@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+import boto3
+
+logger = logging.getLogger()
+
+CONVERSATION_TABLE = os.environ.get('CONVERSATION_TABLE', '')
+DYNAMODB_ENDPOINT_URL = os.environ.get('DYNAMODB_ENDPOINT_URL') or None
+
+CHARS_PER_TOKEN = 4
+SUMMARY_SNIPPET_CHARS = 160
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for budgeting"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _first_sentence(text: str) -> str:
+    sentence = _SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    if len(sentence) > SUMMARY_SNIPPET_CHARS:
+        sentence = sentence[:SUMMARY_SNIPPET_CHARS].rstrip() + '…'
+    return sentence
+
+
+class Conversation:
+    """Rolling summary plus the most recent turns of one chat"""
+
+    def __init__(self, chat_id: int, summary: str = '', turns: Optional[List[Dict[str, str]]] = None) -> None:
+        self.chat_id = chat_id
+        self.summary = summary
+        self.turns = turns or []
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.summary and not self.turns
+
+    def context_messages(self) -> List[Dict[str, str]]:
+        """Messages to place between the system prompt and the new question"""
+        messages = []
+        if self.summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{self.summary}"
+            })
+        messages.extend(self.turns)
+        return messages
+
+    def add_exchange(self, user_message: str, response: str) -> None:
+        self.turns.append({"role": "user", "content": user_message})
+        self.turns.append({"role": "assistant", "content": response})
+
+    def compact(self, max_context_tokens: int, min_recent_turns: int, max_summary_tokens: int) -> None:
+        """Fold the oldest turns into the summary until the context fits the budget.
+
+        At least min_recent_turns messages stay verbatim; the summary keeps the
+        first sentence of each folded turn and drops its oldest lines once it
+        exceeds max_summary_tokens.
+        """
+        def context_tokens() -> int:
+            return estimate_tokens(self.summary) + sum(estimate_tokens(t['content']) for t in self.turns)
+
+        summary_lines = self.summary.splitlines() if self.summary else []
+        while context_tokens() > max_context_tokens and len(self.turns) > min_recent_turns:
+            # Fold a question together with its answer
+            folded = self.turns[:2] if len(self.turns) > 1 and self.turns[1]['role'] == 'assistant' else self.turns[:1]
+            del self.turns[:len(folded)]
+            for turn in folded:
+                speaker = 'User' if turn['role'] == 'user' else 'Advisor'
+                summary_lines.append(f"- {speaker}: {_first_sentence(turn['content'])}")
+            self.summary = '\n'.join(summary_lines)
+
+        while summary_lines and estimate_tokens(self.summary) > max_summary_tokens:
+            summary_lines.pop(0)
+            self.summary = '\n'.join(summary_lines)
+
+        # The newest turns alone may still exceed the budget
+        while self.turns and context_tokens() > max_context_tokens:
+            self.turns.pop(0)
+
+
+class ConversationStore:
+    """Per-chat conversation history in DynamoDB, expired by TTL after idle_ttl_seconds.
+
+    Without a table name (local runs) conversations are kept in memory.
+    """
+
+    def __init__(self, table_name: str, idle_ttl_seconds: int) -> None:
+        self.table_name = table_name
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._local: Dict[int, Dict[str, Any]] = {}
+        self._dynamodb = None
+
+    def _client(self):
+        if self._dynamodb is None:
+            self._dynamodb = boto3.client('dynamodb', endpoint_url=DYNAMODB_ENDPOINT_URL)
+        return self._dynamodb
+
+    def load(self, chat_id: int) -> Conversation:
+        if not self.table_name:
+            record = self._local.get(chat_id)
+            if record and record['expires_at'] > time.time():
+                return Conversation(chat_id, record['summary'], list(record['turns']))
+            return Conversation(chat_id)
+
+        try:
+            item = self._client().get_item(
+                TableName=self.table_name,
+                Key={'pk': {'S': f"chat#{chat_id}"}}
+            ).get('Item')
+            if item and float(item['expires_at']['N']) > time.time():
+                return Conversation(
+                    chat_id,
+                    item.get('summary', {}).get('S', ''),
+                    json.loads(item.get('turns', {}).get('S', '[]'))
+                )
+        except Exception as e:
+            logger.error(f"Conversation load failed for chat_id {chat_id}: {e}")
+        return Conversation(chat_id)
+
+    def save(self, conversation: Conversation) -> None:
+        expires_at = int(time.time() + self.idle_ttl_seconds)
+
+        if not self.table_name:
+            self._local[conversation.chat_id] = {
+                'summary': conversation.summary,
+                'turns': list(conversation.turns),
+                'expires_at': expires_at
+            }
+            return
+
+        try:
+            self._client().put_item(
+                TableName=self.table_name,
+                Item={
+                    'pk': {'S': f"chat#{conversation.chat_id}"},
+                    'summary': {'S': conversation.summary},
+                    'turns': {'S': json.dumps(conversation.turns, ensure_ascii=False)},
+                    'expires_at': {'N': str(expires_at)}
+                }
+            )
+        except Exception as e:
+            logger.error(f"Conversation save failed for chat_id {conversation.chat_id}: {e}")
+
+
+_store: Optional[ConversationStore] = None
+
+
+def get_conversation_store(memory_config: Dict[str, Any]) -> ConversationStore:
+    """Return the per-container store, created on first use"""
+    global _store
+    if _store is None:
+        _store = ConversationStore(
+            table_name=CONVERSATION_TABLE,
+            idle_ttl_seconds=memory_config.get('idle_ttl_seconds', 604800)
+        )
+    return _store
@@ -0,0 +1,132 @@
+import json
+import logging
+import math
+import zlib
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from text_utils import normalize_question
+
+logger = logging.getLogger()
+
+INDEX_PATH = Path(__file__).parent / 'faq_index.json'
+INDEX_VERSION = 1
+HASH_BUCKETS = 2 ** 18
+CHAR_NGRAM = 4
+
+
+def extract_features(text: str) -> Counter:
+    """Hashed word unigrams, word bigrams and character n-grams of a question.
+
+    Character n-grams keep typos and inflections ("ahorrar"/"ahorro") close.
+    crc32 is used instead of hash() because the latter is salted per process.
+    """
+    words = normalize_question(text).split()
+    features = list(words)
+    features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = f" {word} "
+        features.extend(
+            f"#{padded[i:i + CHAR_NGRAM]}"
+            for i in range(max(1, len(padded) - CHAR_NGRAM + 1))
+        )
+    return Counter(zlib.crc32(f.encode('utf-8')) % HASH_BUCKETS for f in features)
+
+
+def tfidf_vector(features: Counter, idf: Dict[int, float], default_idf: float) -> Dict[int, float]:
+    """Sublinear TF-IDF weights, L2-normalized so a dot product is the cosine"""
+    weights = {
+        bucket: (1.0 + math.log(count)) * idf.get(bucket, default_idf)
+        for bucket, count in features.items()
+    }
+    norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+    return {bucket: w / norm for bucket, w in weights.items()}
+
+
+def build_index(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the serialized index from canonical Q&A entries.
+
+    Each entry has an id, a list of question paraphrases and an answer.
+    """
+    questions = [(i, q) for i, entry in enumerate(entries) for q in entry['questions']]
+    features = [extract_features(q) for _, q in questions]
+
+    document_frequency = Counter(bucket for f in features for bucket in f)
+    total = len(features)
+    idf = {
+        bucket: math.log((1 + total) / (1 + df)) + 1.0
+        for bucket, df in document_frequency.items()
+    }
+    default_idf = math.log(1 + total) + 1.0
+
+    postings = defaultdict(list)
+    for question_id, feature_counts in enumerate(features):
+        for bucket, weight in tfidf_vector(feature_counts, idf, default_idf).items():
+            postings[bucket].append([question_id, round(weight, 6)])
+
+    return {
+        'version': INDEX_VERSION,
+        'default_idf': default_idf,
+        'idf': {str(b): round(w, 6) for b, w in idf.items()},
+        'postings': {str(b): p for b, p in postings.items()},
+        'question_entry': [entry_id for entry_id, _ in questions],
+        'entries': [{'id': e['id'], 'answer': e['answer'].strip()} for e in entries]
+    }
+
+
+class FaqIndex:
+    """Nearest-neighbour lookup over the canonical questions.
+
+    Scoring walks the inverted index of the query's buckets, so the cost depends
+    on the query length rather than on the number of indexed questions.
+    """
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self.default_idf = data['default_idf']
+        self.idf = {int(b): w for b, w in data['idf'].items()}
+        self.postings = {int(b): p for b, p in data['postings'].items()}
+        self.question_entry = data['question_entry']
+        self.entries = data['entries']
+
+    @classmethod
+    def load(cls, path: Path = INDEX_PATH) -> 'FaqIndex':
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def search(self, text: str) -> Tuple[Optional[Dict[str, Any]], float]:
+        """Return the best matching entry and its cosine similarity"""
+        query = tfidf_vector(extract_features(text), self.idf, self.default_idf)
+        scores: Dict[int, float] = defaultdict(float)
+        for bucket, query_weight in query.items():
+            for question_id, weight in self.postings.get(bucket, ()):
+                scores[question_id] += query_weight * weight
+
+        if not scores:
+            return None, 0.0
+        question_id, score = max(scores.items(), key=lambda item: item[1])
+        return self.entries[self.question_entry[question_id]], score
+
+
+_index: Optional[FaqIndex] = None
+_index_unavailable = False
+
+
+def match_faq(text: str, min_score: float) -> Optional[Dict[str, Any]]:
+    """Return the canonical entry for text if it clears min_score"""
+    global _index, _index_unavailable
+    if _index_unavailable:
+        return None
+    if _index is None:
+        try:
+            _index = FaqIndex.load()
+        except Exception as e:
+            logger.error(f"Error loading {INDEX_PATH.name}: {e}")
+            _index_unavailable = True
+            return None
+
+    entry, score = _index.search(text)
+    if entry is None or score < min_score:
+        return None
+    logger.debug(f"FAQ fast-path match {entry['id']} (score {score:.3f})")
+    return entry
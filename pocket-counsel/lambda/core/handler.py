@@ -1,20 +1,36 @@
 import json
 import os
+import itertools
 import logging
-from typing import Dict, Any
-import boto3
-import urllib3
-import yaml
-from pathlib import Path
+import time
+from typing import Dict, Any, Optional
+from admission_control import get_admission_controller
+from bedrock_invoker import create_invoker
+from conversation_memory import Conversation, estimate_tokens, get_conversation_store
+from faq_index import match_faq
+from idempotency import get_update_idempotency
+from metrics import put_metric, put_metrics
+from model_router import route
+from prompt_config import (
+    ANTHROPIC_REQUEST_BODY_PREFIX_KEY,
+    CACHED_ANTHROPIC_REQUEST_BODY_PREFIX_KEY,
+    REQUEST_BODY_PREFIX_KEY,
+    anthropic_request_body_prefix,
+    load_prompt_config,
+    request_body_prefix
+)
+from response_cache import config_fingerprint, get_response_cache
+from streaming import ReasoningFilter, extract_token_usage, iter_stream_text
+from telegram_client import TelegramClient, get_telegram_client
+from tracing import annotate, configure_logging, finish_invocation, span, start_invocation
 
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
 
-BEDROCK_MODEL_ID = os.environ.get('BEDROCK_MODEL_ID', 'openai.gpt-oss-120b-1:0')
-BEDROCK_REGION = os.environ.get('BEDROCK_REGION', 'us-east-1')
-TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '')
+bedrock_invoker = create_invoker()
 
-bedrock_runtime = boto3.client('bedrock-runtime', region_name=BEDROCK_REGION)
+BEDROCK_ERROR_MESSAGE = "I'm experiencing technical difficulties. Please try again in a moment."
+BEDROCK_FORMAT_ERROR_MESSAGE = "I apologize, but I'm having trouble processing your request right now. Please try again."
+FALLBACK_MESSAGES = (BEDROCK_ERROR_MESSAGE, BEDROCK_FORMAT_ERROR_MESSAGE)
 
 CONFIG_CACHE = None
 
@@ -24,14 +40,12 @@ def load_config() -> Dict[str, Any]:
     if CONFIG_CACHE is not None:
         return CONFIG_CACHE
     
-    config_path = Path(__file__).parent / 'prompt_config.yaml'
     try:
-        with open(config_path, 'r') as f:
-            CONFIG_CACHE = yaml.safe_load(f)
-            logger.info("Prompt configuration loaded successfully")
-            return CONFIG_CACHE
+        CONFIG_CACHE = load_prompt_config()
+        logger.info("Prompt configuration loaded successfully")
+        return CONFIG_CACHE
     except Exception as e:
-        logger.error(f"Error loading prompt_config.yaml: {e}")
+        logger.error(f"Error loading prompt configuration: {e}")
         return {
             'prompts': {
                 'system': 'You are a helpful financial advisor.',
@@ -48,37 +62,32 @@ def load_config() -> Dict[str, Any]:
         }
 
 
-def send_telegram_message(chat_id: int, text: str) -> bool:
-    """Send message to Telegram user via Bot API"""
-    if not TELEGRAM_BOT_TOKEN:
-        logger.warning("TELEGRAM_BOT_TOKEN not configured")
-        return False
-    
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": chat_id,
-        "text": text,
-        "parse_mode": "Markdown"
-    }
-    
-    try:
-        http = urllib3.PoolManager()
-        response = http.request(
-            'POST',
-            url,
-            body=json.dumps(payload),
-            headers={'Content-Type': 'application/json'},
-            timeout=10
-        )
-        
-        if response.status >= 400:
-            raise Exception(f"HTTP {response.status}")
-            
-        logger.info(f"Message sent successfully to chat_id: {chat_id}")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to send Telegram message: {e}")
-        return False
+# Loaded during init so the first request (and SnapStart snapshots) skip it
+configure_logging(load_config().get('logging', {}))
+
+
+def telegram() -> TelegramClient:
+    return get_telegram_client(load_config().get('telegram', {}))
+
+
+def send_telegram_message(chat_id: int, text: str, parse_mode: Optional[str] = "Markdown") -> Optional[int]:
+    """Send message to Telegram user via Bot API, returning its message_id"""
+    with span('telegram'):
+        message_id = telegram().send_message(chat_id, text, parse_mode=parse_mode)
+    if message_id is not None:
+        logger.debug(f"Message sent successfully to chat_id: {chat_id}")
+    return message_id
+
+
+def edit_telegram_message(
+    chat_id: int,
+    message_id: int,
+    text: str,
+    parse_mode: Optional[str] = None
+) -> bool:
+    """Replace the text of a previously sent Telegram message"""
+    with span('telegram'):
+        return telegram().edit_message(chat_id, message_id, text, parse_mode=parse_mode)
 
 
 def handle_command(command: str, user_name: str, config: Dict[str, Any]) -> str:
@@ -93,31 +102,109 @@ def handle_command(command: str, user_name: str, config: Dict[str, Any]) -> str:
         return commands['unknown']
 
 
-def invoke_bedrock(user_message: str, user_name: str, config: Dict[str, Any]) -> str:
-    bedrock_params = config['bedrock']
+def uses_prompt_cache(model_id: str, config: Dict[str, Any]) -> bool:
+    """Whether requests to model_id get a prompt-cache checkpoint"""
+    cache_config = config.get('prompt_cache', {})
+    return cache_config.get('enabled', False) and any(
+        family in model_id for family in cache_config.get('model_families', [])
+    )
+
+
+def build_request_body(
+    user_message: str,
+    user_name: str,
+    config: Dict[str, Any],
+    conversation: Optional[Conversation] = None,
+    model_id: str = ''
+) -> str:
+    """Serialized request body; the constant part up to the system prompt is precompiled.
+    
+    The layout is fixed: static system prompt, conversation summary, recent
+    turns, new question. Anthropic models get the messages format, where the
+    static prompt can end in a cache checkpoint; it is then the only part that
+    has to repeat byte for byte.
+    """
+    started_at = time.perf_counter()
     system_prompt = config['prompts']['system']
     
-    request_body = {
-        **bedrock_params,
-        "messages": [
-            {
-                "role": "system",
-                "content": system_prompt
-            },
-            {
-                "role": "user",
-                "content": f"User {user_name} asks: {user_message}"
-            }
-        ]
-    }
+    messages = conversation.context_messages() if conversation is not None else []
+    messages.append({
+        "role": "user",
+        "content": f"User {user_name} asks: {user_message}"
+    })
     
-    try:
-        response = bedrock_runtime.invoke_model(
-            modelId=BEDROCK_MODEL_ID,
-            body=json.dumps(request_body)
+    if 'anthropic.' in model_id:
+        if uses_prompt_cache(model_id, config):
+            prefix = (config.get(CACHED_ANTHROPIC_REQUEST_BODY_PREFIX_KEY)
+                      or anthropic_request_body_prefix(config, cache_checkpoint=True))
+        else:
+            prefix = config.get(ANTHROPIC_REQUEST_BODY_PREFIX_KEY) or anthropic_request_body_prefix(config)
+        # Anthropic takes system text as blocks, separate from the user/assistant turns
+        system_blocks = [{"type": "text", "text": m["content"]} for m in messages if m["role"] == "system"]
+        turns = [m for m in messages if m["role"] != "system"]
+        body = (
+            prefix
+            + ''.join(', ' + json.dumps(block) for block in system_blocks)
+            + '], "messages": ['
+            + ', '.join(json.dumps(turn) for turn in turns)
+            + ']}'
         )
-        
-        response_body = json.loads(response['body'].read())
+    else:
+        prefix = config.get(REQUEST_BODY_PREFIX_KEY) or request_body_prefix(config)
+        body = prefix + ''.join(', ' + json.dumps(message) for message in messages) + ']}'
+    
+    put_metric("PromptAssemblyTime", (time.perf_counter() - started_at) * 1000)
+    put_metric(
+        "PromptTokens",
+        estimate_tokens(system_prompt) + sum(estimate_tokens(m["content"]) for m in messages),
+        unit="Count"
+    )
+    
+    return body
+
+
+def record_bedrock_usage(tier: str, started_at: float, usage: Dict[str, int]) -> None:
+    """Per-tier latency and token metrics used to tune the routing thresholds"""
+    dimensions = {"Tier": tier}
+    put_metric("BedrockLatency", (time.monotonic() - started_at) * 1000, dimensions=dimensions)
+    put_metrics(
+        {
+            "BedrockInputTokens": usage.get('input_tokens', 0),
+            "BedrockOutputTokens": usage.get('output_tokens', 0),
+            "BedrockCacheReadTokens": usage.get('cache_read_tokens', 0),
+            "BedrockCacheWriteTokens": usage.get('cache_write_tokens', 0)
+        },
+        unit="Count",
+        dimensions=dimensions
+    )
+    annotate(
+        tier=tier,
+        input_tokens=usage.get('input_tokens', 0),
+        output_tokens=usage.get('output_tokens', 0),
+        cache_read_tokens=usage.get('cache_read_tokens', 0),
+        cache_write_tokens=usage.get('cache_write_tokens', 0)
+    )
+
+
+def invoke_bedrock(
+    user_message: str,
+    user_name: str,
+    config: Dict[str, Any],
+    conversation: Optional[Conversation] = None,
+    tier: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None
+) -> str:
+    tier = tier or route(user_message)
+    request_body = build_request_body(user_message, user_name, config, conversation, tier['model_id'])
+    
+    def start(client, model_id: str) -> Dict[str, Any]:
+        response = client.invoke_model(modelId=model_id, body=request_body)
+        return json.loads(response['body'].read())
+    
+    try:
+        started_at = time.monotonic()
+        response_body = bedrock_invoker.call('invoke', tier['model_id'], start, deadline=deadline)
+        record_bedrock_usage(tier['name'], started_at, extract_token_usage(response_body))
         
         # Check for OpenAI-style response format (choices[0].message.content)
         if 'choices' in response_body and len(response_body['choices']) > 0:
@@ -125,65 +212,281 @@ def invoke_bedrock(user_message: str, user_name: str, config: Dict[str, Any]) ->
             
             # Remove <reasoning> blocks if present
             if '<reasoning>' in content and '</reasoning>' in content:
-                import re
-                content = re.sub(r'<reasoning>.*?</reasoning>', '', content, flags=re.DOTALL).strip()
+                reasoning_filter = ReasoningFilter()
+                content = (reasoning_filter.feed(content) + reasoning_filter.finish()).strip()
             
             return content
         # Fallback to standard Bedrock format
         elif 'content' in response_body and len(response_body['content']) > 0:
             return response_body['content'][0]['text']
         else:
-            logger.error(f"Unexpected Bedrock response format: {response_body}")
-            return "I apologize, but I'm having trouble processing your request right now. Please try again."
+            logger.error(f"Unexpected Bedrock response format: {json.dumps(response_body)[:500]}")
+            return BEDROCK_FORMAT_ERROR_MESSAGE
             
     except Exception as e:
         logger.error(f"Bedrock invocation error: {e}")
-        return "I'm experiencing technical difficulties. Please try again in a moment."
+        return BEDROCK_ERROR_MESSAGE
 
 
-def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    logger.info(f"Received event: {json.dumps(event)}")
+def stream_bedrock_reply(
+    chat_id: int,
+    user_message: str,
+    user_name: str,
+    config: Dict[str, Any],
+    conversation: Optional[Conversation] = None,
+    tier: Optional[Dict[str, Any]] = None,
+    deadline: Optional[float] = None
+) -> str:
+    """Stream a Bedrock response into a Telegram message that is edited in place.
+    
+    The first visible text is posted as a new message and later text is applied
+    with editMessageText at most once per edit_interval_seconds. Hedging applies
+    to the wait for the first stream event.
+    """
+    streaming_config = config.get('streaming', {})
+    edit_interval = streaming_config.get('edit_interval_seconds', 1.0)
+    min_chars_per_edit = streaming_config.get('min_chars_per_edit', 20)
+    
+    tier = tier or route(user_message)
+    request_body = build_request_body(user_message, user_name, config, conversation, tier['model_id'])
+    reasoning_filter = ReasoningFilter()
+    usage: Dict[str, int] = {}
+    started_at = time.monotonic()
+    text = ''
+    shown_text = ''
+    message_id = None
+    last_edit_at = 0.0
+    
+    def start(client, model_id: str) -> Dict[str, Any]:
+        response = client.invoke_model_with_response_stream(modelId=model_id, body=request_body)
+        events = iter(response['body'])
+        first_event = next(events, None)
+        head = [first_event] if first_event is not None else []
+        return {'body': itertools.chain(head, events), 'stream': response['body']}
     
     try:
-        config = load_config()
-        
-        body = json.loads(event.get('body', '{}'))
-        logger.info(f"Parsed body: {json.dumps(body)}")
-        
-        telegram_message = body.get('message', {})
-        user_message = telegram_message.get('text', '')
-        chat_id = telegram_message.get('chat', {}).get('id')
-        
-        from_user = telegram_message.get('from', {})
-        user_name = from_user.get('first_name', 'User')
+        response = bedrock_invoker.call(
+            'stream',
+            tier['model_id'],
+            start,
+            cancel=lambda loser: loser['stream'].close(),
+            deadline=deadline
+        )
         
-        if not user_message or not chat_id:
-            logger.warning("No text or chat_id found in Telegram message")
-            return {
-                'statusCode': 200,
-                'body': json.dumps({'ok': True})
-            }
+        for delta in iter_stream_text(response, usage):
+            text += reasoning_filter.feed(delta)
+            visible = text.strip()
+            if not visible:
+                continue
+            
+            now = time.monotonic()
+            if message_id is None:
+                message_id = send_telegram_message(chat_id, visible, parse_mode=None)
+                if message_id is None:
+                    continue
+                put_metric(
+                    "TimeToFirstVisibleText",
+                    (now - started_at) * 1000,
+                    dimensions={"Mode": "stream"}
+                )
+                shown_text, last_edit_at = visible, now
+            elif (now - last_edit_at >= edit_interval
+                    and len(visible) - len(shown_text) >= min_chars_per_edit):
+                if edit_telegram_message(chat_id, message_id, visible):
+                    shown_text, last_edit_at = visible, now
         
-        logger.info(f"Processing message from {user_name} (chat_id: {chat_id}): {user_message}")
+        text = (text + reasoning_filter.finish()).strip()
+        record_bedrock_usage(tier['name'], started_at, usage)
+    except Exception as e:
+        logger.error(f"Bedrock streaming error: {e}")
+        text = f"{text.strip()}\n\n{BEDROCK_ERROR_MESSAGE}" if text.strip() else BEDROCK_ERROR_MESSAGE
+    
+    if message_id is None:
+        send_telegram_message(chat_id, text)
+    elif text != shown_text:
+        # Final edit carries Markdown; partial edits are plain text because
+        # half-written Markdown entities are rejected by Telegram.
+        edit_telegram_message(chat_id, message_id, text, parse_mode="Markdown")
+    
+    return text
+
+
+def reply_with_bedrock(
+    chat_id: int,
+    user_message: str,
+    user_name: str,
+    config: Dict[str, Any],
+    deadline: Optional[float] = None
+) -> str:
+    """Answer a free-text question from the FAQ index or response cache when possible"""
+    started_at = time.monotonic()
+    
+    memory_config = config.get('memory', {})
+    store = get_conversation_store(memory_config) if memory_config.get('enabled', False) else None
+    conversation = store.load(chat_id) if store else None
+    
+    cache_config = config.get('cache', {})
+    # Cached answers ignore context, so they only serve chats without history
+    cache = None
+    if cache_config.get('enabled', False) and (conversation is None or conversation.is_empty):
+        cache = get_response_cache(cache_config)
+    tier = route(user_message, has_history=conversation is not None and not conversation.is_empty)
+    fingerprint = config_fingerprint(config, tier['model_id'])
+    
+    fast_path_config = config.get('fast_path', {})
+    faq_entry = None
+    if fast_path_config.get('enabled', False):
+        faq_entry = match_faq(user_message, fast_path_config.get('min_score', 0.5))
+        put_metric('FastPathHit', 1 if faq_entry else 0, unit='Count')
+    
+    cached = cache.get(user_message, fingerprint) if cache and not faq_entry else None
+    
+    if faq_entry:
+        response_text = faq_entry['answer']
+        mode = "fast_path"
+        annotate(faq_entry=faq_entry['id'])
+        delivered = send_telegram_message(chat_id, response_text) is not None
+    elif cached is not None:
+        response_text = cached
+        mode = "cache"
+        delivered = send_telegram_message(chat_id, response_text) is not None
+    else:
+        admission_config = config.get('admission', {})
+        admission = get_admission_controller(admission_config) if admission_config.get('enabled', False) else None
+        ticket = None
+        if admission:
+            estimated_tokens = (
+                estimate_tokens(config['prompts']['system'])
+                + sum(estimate_tokens(m['content']) for m in (conversation.context_messages() if conversation else []))
+                + estimate_tokens(user_message)
+                + admission_config.get('expected_output_tokens', 150)
+            )
+            ticket = admission.admit(chat_id, estimated_tokens)
+            if not ticket['admitted']:
+                annotate(mode="rejected", rejected_reason=ticket['reason'])
+                rejection_text = config['prompts'].get('admission', {}).get(ticket['reason'], BEDROCK_ERROR_MESSAGE)
+                send_telegram_message(chat_id, rejection_text)
+                return rejection_text
         
+        try:
+            if config.get('streaming', {}).get('enabled', False):
+                # Includes the Telegram edits made while streaming
+                with span('bedrock'):
+                    response_text = stream_bedrock_reply(
+                        chat_id, user_message, user_name, config, conversation, tier, deadline
+                    )
+                mode = "stream"
+                delivered = False
+            else:
+                with span('bedrock'):
+                    response_text = invoke_bedrock(user_message, user_name, config, conversation, tier, deadline)
+                mode = "blocking"
+                delivered = send_telegram_message(chat_id, response_text) is not None
+        finally:
+            if ticket:
+                admission.release(ticket)
+    
+    annotate(mode=mode)
+    
+    # stream_bedrock_reply records its own time-to-first-visible-text
+    if delivered:
+        put_metric(
+            "TimeToFirstVisibleText",
+            (time.monotonic() - started_at) * 1000,
+            dimensions={"Mode": mode}
+        )
+    
+    if response_text.endswith(FALLBACK_MESSAGES):
+        return response_text
+    
+    if cache and mode in ("stream", "blocking"):
+        cache.put(user_message, fingerprint, response_text)
+    
+    if conversation is not None:
+        conversation.add_exchange(user_message, response_text)
+        conversation.compact(
+            max_context_tokens=memory_config.get('max_context_tokens', 1500),
+            min_recent_turns=memory_config.get('min_recent_turns', 4),
+            max_summary_tokens=memory_config.get('max_summary_tokens', 400)
+        )
+        store.save(conversation)
+    
+    return response_text
+
+
+def process_update(update: Dict[str, Any], deadline: Optional[float] = None) -> Optional[str]:
+    """Handle one Telegram update and return the reply text, or None if there was nothing to answer.
+    
+    Shared by the webhook Lambda and the long-polling worker. Raises on failure,
+    after releasing the update's idempotency claim so it can be retried.
+    """
+    config = load_config()
+    
+    telegram_message = update.get('message', {})
+    user_message = telegram_message.get('text', '')
+    chat_id = telegram_message.get('chat', {}).get('id')
+    
+    from_user = telegram_message.get('from', {})
+    user_name = from_user.get('first_name', 'User')
+    
+    update_id = update.get('update_id')
+    annotate(update_id=update_id, chat_id=chat_id, text_chars=len(user_message))
+    
+    if not user_message or not chat_id:
+        logger.warning("No text or chat_id found in Telegram message")
+        annotate(mode="ignored")
+        return None
+    
+    idempotency_config = config.get('idempotency', {})
+    idempotency = None
+    if update_id is not None and idempotency_config.get('enabled', False):
+        idempotency = get_update_idempotency(idempotency_config)
+        if not idempotency.claim(update_id):
+            logger.info(f"Skipping duplicate update_id: {update_id}")
+            annotate(mode="duplicate")
+            return None
+    
+    try:
         if user_message.startswith('/'):
-            response_text = handle_command(user_message, user_name, config)
+            with span('command'):
+                response_text = handle_command(user_message, user_name, config)
+            annotate(mode="command")
+            send_telegram_message(chat_id, response_text)
         else:
-            response_text = invoke_bedrock(user_message, user_name, config)
-        
-        logger.info(f"Response generated: {response_text[:100]}...")
-        
-        # Send response to Telegram
-        send_telegram_message(chat_id, response_text)
+            response_text = reply_with_bedrock(chat_id, user_message, user_name, config, deadline)
+    except Exception:
+        if idempotency:
+            idempotency.release(update_id)
+        raise
+    
+    if idempotency:
+        idempotency.complete(update_id)
+    
+    annotate(response_chars=len(response_text))
+    logger.debug(f"Response generated: {response_text[:100]}...")
+    return response_text
+
+
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    start_invocation(getattr(context, 'aws_request_id', None) or 'local')
+    
+    try:
+        with span('parse'):
+            update = json.loads(event.get('body') or '{}')
+        logger.debug(f"Received update {update.get('update_id')} ({len(event.get('body') or '')} bytes)")
         
-        return {
-            'statusCode': 200,
-            'body': json.dumps({'ok': True})
-        }
+        deadline = None
+        if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+            deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000
+        process_update(update, deadline)
         
     except Exception as e:
         logger.error(f"Error processing request: {e}", exc_info=True)
-        return {
-            'statusCode': 200,
-            'body': json.dumps({'ok': True})
-        }
+        annotate(mode="error")
+    finally:
+        finish_invocation(logger)
+    
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'ok': True})
+    }
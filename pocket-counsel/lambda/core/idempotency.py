@@ -0,0 +1,145 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import boto3
+from botocore.exceptions import ClientError
+
+from metrics import put_metric
+
+logger = logging.getLogger()
+
+IDEMPOTENCY_TABLE = os.environ.get('IDEMPOTENCY_TABLE', '')
+DYNAMODB_ENDPOINT_URL = os.environ.get('DYNAMODB_ENDPOINT_URL') or None
+
+STATUS_IN_FLIGHT = 'IN_FLIGHT'
+STATUS_COMPLETED = 'COMPLETED'
+
+
+class UpdateIdempotency:
+    """Claims Telegram update_ids so a re-delivered update is processed once.
+
+    A claim is a conditional write that succeeds only if the update is unknown
+    or its IN_FLIGHT lease has expired, so a crashed worker's claim can be
+    taken over once lease_seconds pass. COMPLETED records are kept for
+    ttl_seconds and removed by DynamoDB TTL. Updates already seen by this
+    container are rejected from memory without a DynamoDB round trip.
+    """
+
+    MAX_LOCAL_ENTRIES = 2048
+
+    def __init__(self, table_name: str, lease_seconds: int, ttl_seconds: int) -> None:
+        self.table_name = table_name
+        self.lease_seconds = lease_seconds
+        self.ttl_seconds = ttl_seconds
+        self._seen: 'OrderedDict[str, float]' = OrderedDict()
+        self._dynamodb = None
+
+    def _client(self):
+        if self._dynamodb is None:
+            self._dynamodb = boto3.client('dynamodb', endpoint_url=DYNAMODB_ENDPOINT_URL)
+        return self._dynamodb
+
+    def _remember(self, key: str, until: float) -> None:
+        self._seen[key] = until
+        self._seen.move_to_end(key)
+        while len(self._seen) > self.MAX_LOCAL_ENTRIES:
+            self._seen.popitem(last=False)
+
+    def claim(self, update_id: int) -> bool:
+        """Return True if this worker should process the update"""
+        key = f"update#{update_id}"
+        now = time.time()
+
+        seen_until = self._seen.get(key)
+        if seen_until is not None and seen_until > now:
+            self._record_duplicate('memory')
+            return False
+
+        if self.table_name:
+            try:
+                self._client().put_item(
+                    TableName=self.table_name,
+                    Item={
+                        'pk': {'S': key},
+                        'status': {'S': STATUS_IN_FLIGHT},
+                        'lease_expires_at': {'N': str(int(now + self.lease_seconds))},
+                        'expires_at': {'N': str(int(now + self.ttl_seconds))}
+                    },
+                    ConditionExpression='attribute_not_exists(pk) OR (#status = :in_flight AND lease_expires_at < :now)',
+                    ExpressionAttributeNames={'#status': 'status'},
+                    ExpressionAttributeValues={
+                        ':in_flight': {'S': STATUS_IN_FLIGHT},
+                        ':now': {'N': str(int(now))}
+                    }
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    # Fail open: answering twice is better than not answering
+                    logger.error(f"Idempotency claim failed for {key}: {e}")
+                    return True
+                self._remember(key, now + self.lease_seconds)
+                self._record_duplicate('dynamodb')
+                return False
+
+        self._remember(key, now + self.lease_seconds)
+        return True
+
+    def complete(self, update_id: int) -> None:
+        key = f"update#{update_id}"
+        now = time.time()
+        self._remember(key, now + self.ttl_seconds)
+
+        if self.table_name:
+            try:
+                self._client().update_item(
+                    TableName=self.table_name,
+                    Key={'pk': {'S': key}},
+                    UpdateExpression='SET #status = :completed, completed_at = :now',
+                    ExpressionAttributeNames={'#status': 'status'},
+                    ExpressionAttributeValues={
+                        ':completed': {'S': STATUS_COMPLETED},
+                        ':now': {'N': str(int(now))}
+                    }
+                )
+            except Exception as e:
+                logger.error(f"Idempotency completion failed for {key}: {e}")
+
+    def release(self, update_id: int) -> None:
+        """Drop an IN_FLIGHT claim after a failure so a redelivery can retry"""
+        key = f"update#{update_id}"
+        self._seen.pop(key, None)
+
+        if self.table_name:
+            try:
+                self._client().delete_item(
+                    TableName=self.table_name,
+                    Key={'pk': {'S': key}},
+                    ConditionExpression='#status = :in_flight',
+                    ExpressionAttributeNames={'#status': 'status'},
+                    ExpressionAttributeValues={':in_flight': {'S': STATUS_IN_FLIGHT}}
+                )
+            except Exception as e:
+                logger.error(f"Idempotency release failed for {key}: {e}")
+
+    @staticmethod
+    def _record_duplicate(tier: str) -> None:
+        logger.info(f"Duplicate update dropped ({tier})")
+        put_metric('DuplicateUpdate', 1, unit='Count')
+
+
+_idempotency: Optional[UpdateIdempotency] = None
+
+
+def get_update_idempotency(idempotency_config: Dict[str, Any]) -> UpdateIdempotency:
+    """Return the per-container idempotency guard, created on first use"""
+    global _idempotency
+    if _idempotency is None:
+        _idempotency = UpdateIdempotency(
+            table_name=IDEMPOTENCY_TABLE,
+            lease_seconds=idempotency_config.get('lease_seconds', 90),
+            ttl_seconds=idempotency_config.get('ttl_seconds', 86400)
+        )
+    return _idempotency
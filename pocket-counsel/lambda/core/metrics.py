@@ -0,0 +1,55 @@
+import json
+import os
+import time
+from typing import Dict, Optional
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'PocketCounsel')
+
+
+def put_metric(
+    name: str,
+    value: float,
+    unit: str = 'Milliseconds',
+    dimensions: Optional[Dict[str, str]] = None
+) -> None:
+    """Emit a CloudWatch metric using the Embedded Metric Format (EMF)"""
+    dimensions = dimensions or {}
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [
+                {
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [list(dimensions.keys())],
+                    'Metrics': [{'Name': name, 'Unit': unit}]
+                }
+            ]
+        },
+        name: value,
+        **dimensions
+    }
+    print(json.dumps(record))
+
+
+def put_metrics(
+    values: Dict[str, float],
+    unit: str = 'Milliseconds',
+    dimensions: Optional[Dict[str, str]] = None
+) -> None:
+    """Emit several metrics sharing a unit and dimensions as a single EMF record"""
+    dimensions = dimensions or {}
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [
+                {
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [list(dimensions.keys())],
+                    'Metrics': [{'Name': name, 'Unit': unit} for name in values]
+                }
+            ]
+        },
+        **values,
+        **dimensions
+    }
+    print(json.dumps(record))
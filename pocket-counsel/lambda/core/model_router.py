@@ -0,0 +1,86 @@
+import json
+import logging
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from text_utils import normalize_question
+
+logger = logging.getLogger()
+
+BEDROCK_MODEL_ID = os.environ.get('BEDROCK_MODEL_ID', 'openai.gpt-oss-120b-1:0')
+BEDROCK_ROUTING_TABLE = os.environ.get('BEDROCK_ROUTING_TABLE', '')
+
+# Words that signal multi-factor questions (English and Spanish, normalized)
+COMPLEX_KEYWORDS = {
+    'compare', 'versus', 'vs', 'tradeoff', 'strategy', 'plan', 'portfolio', 'allocation',
+    'mortgage', 'refinance', 'taxes', 'tax', 'retirement', 'pension', 'inheritance',
+    'scenario', 'calculate', 'interest', 'rate', 'years', 'percent',
+    'comparar', 'estrategia', 'portafolio', 'hipoteca', 'refinanciar', 'impuestos',
+    'jubilacion', 'pension', 'herencia', 'escenario', 'calcular', 'interes', 'tasa',
+    'anos', 'porcentaje'
+}
+SIMPLE_KEYWORDS = {
+    'what', 'is', 'define', 'meaning', 'hi', 'hello', 'thanks',
+    'que', 'es', 'significa', 'hola', 'gracias'
+}
+_NUMBER = re.compile(r'\d')
+
+# Tiny logistic-regression style classifier; weights were set by hand against
+# sample traffic and can be re-fit from the ModelTier* metrics.
+CLASSIFIER_BIAS = -2.2
+CLASSIFIER_WEIGHTS = {
+    'words': 0.045,
+    'sentences': 0.35,
+    'numbers': 0.25,
+    'complex_keywords': 0.6,
+    'simple_keywords': -0.3,
+    'has_history': 0.4
+}
+
+
+def extract_features(text: str, has_history: bool = False) -> Dict[str, float]:
+    words = normalize_question(text).split()
+    return {
+        'words': min(len(words), 80),
+        'sentences': min(text.count('?') + text.count('.') + text.count('!'), 6),
+        'numbers': min(len(_NUMBER.findall(text)), 8),
+        'complex_keywords': sum(1 for w in words if w in COMPLEX_KEYWORDS),
+        'simple_keywords': sum(1 for w in words[:3] if w in SIMPLE_KEYWORDS),
+        'has_history': 1.0 if has_history else 0.0
+    }
+
+
+def complexity_score(text: str, has_history: bool = False) -> float:
+    """Probability-like score in [0, 1]; higher means a larger model is worth it"""
+    features = extract_features(text, has_history)
+    z = CLASSIFIER_BIAS + sum(CLASSIFIER_WEIGHTS[name] * value for name, value in features.items())
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+def load_routing_table() -> List[Dict[str, Any]]:
+    """Tiers sorted by max_complexity, from the BEDROCK_ROUTING_TABLE env var"""
+    try:
+        tiers = json.loads(BEDROCK_ROUTING_TABLE or '{}').get('tiers')
+        if tiers:
+            return sorted(tiers, key=lambda tier: tier['max_complexity'])
+    except Exception as e:
+        logger.error(f"Invalid BEDROCK_ROUTING_TABLE, using {BEDROCK_MODEL_ID}: {e}")
+    return [{'name': 'default', 'model_id': BEDROCK_MODEL_ID, 'max_complexity': 1.0}]
+
+
+ROUTING_TABLE = load_routing_table()
+
+
+def route(text: str, has_history: bool = False, tiers: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Pick the cheapest tier whose max_complexity covers the message"""
+    tiers = tiers or ROUTING_TABLE
+    score = complexity_score(text, has_history)
+    for tier in tiers:
+        if score <= tier['max_complexity']:
+            break
+    else:
+        tier = tiers[-1]
+    logger.debug(f"Routed to {tier['name']} ({tier['model_id']}), complexity {score:.2f}")
+    return tier
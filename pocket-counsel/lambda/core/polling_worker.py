@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Long-polling runtime for the core handler, as an alternative to the webhook Lambda.
+
+Polls getUpdates and processes each batch concurrently with the same
+process_update used by lambda_handler, sharing one Bedrock invoker and one
+Telegram client. Telegram refuses getUpdates while a webhook is set, so pass
+--delete-webhook the first time (set it again with the webhook URL to go back).
+
+Usage:
+    TELEGRAM_BOT_TOKEN=... python lambda/core/polling_worker.py [--delete-webhook]
+"""
+import argparse
+import asyncio
+import logging
+import signal
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import handler
+from bedrock_invoker import create_invoker
+from telegram_client import TelegramClient
+from tracing import annotate, finish_invocation, start_invocation
+
+logger = logging.getLogger()
+
+
+class PollingWorker:
+    """Fetches getUpdates batches and processes the updates of a batch concurrently.
+
+    The offset sent with the next getUpdates call is what confirms updates to
+    Telegram. It only moves past an update once that update was processed, or
+    failed max_attempts times, so a crash or error means redelivery rather
+    than a lost message. Updates after a failed one are redelivered too; the
+    worker remembers which of them it already finished and skips them, so
+    only the failed update runs again, with or without the idempotency table.
+    """
+
+    def __init__(
+        self,
+        client: TelegramClient,
+        polling_config: Dict[str, Any],
+        process: Callable[[Dict[str, Any], Optional[float]], Any] = handler.process_update
+    ) -> None:
+        self.client = client
+        self.process = process
+        self.poll_timeout = polling_config.get('timeout_seconds', 25)
+        self.limit = polling_config.get('limit', 100)
+        self.max_concurrency = polling_config.get('max_concurrency', 16)
+        self.max_attempts = polling_config.get('max_attempts', 3)
+        self.update_timeout = polling_config.get('update_timeout_seconds', 60)
+        self.offset: Optional[int] = None
+        self.attempts: Dict[int, int] = {}
+        # Finished update_ids at or past the offset, which Telegram will deliver again
+        self.completed: Set[int] = set()
+        self.stats: Counter = Counter()
+
+    def _process_sync(self, update: Dict[str, Any]) -> bool:
+        start_invocation(f"update-{update.get('update_id')}")
+        try:
+            self.process(update, time.monotonic() + self.update_timeout)
+            return True
+        except Exception as e:
+            logger.error(f"Error processing update {update.get('update_id')}: {e}", exc_info=True)
+            annotate(mode="error")
+            return False
+        finally:
+            finish_invocation(logger)
+
+    async def process_batch(self, updates: List[Dict[str, Any]]) -> None:
+        # One of each update_id, and none that finished in an earlier batch
+        pending = {u['update_id']: u for u in updates if u['update_id'] not in self.completed}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def process_one(update: Dict[str, Any]) -> bool:
+            async with semaphore:
+                # to_thread copies the context, so each update gets its own tracing span
+                return await asyncio.to_thread(self._process_sync, update)
+
+        results = await asyncio.gather(*(process_one(update) for update in pending.values()))
+
+        retry = set()
+        for update_id, ok in zip(pending, results):
+            if ok:
+                self.stats['processed'] += 1
+                self.completed.add(update_id)
+                self.attempts.pop(update_id, None)
+                continue
+            attempts = self.attempts.get(update_id, 0) + 1
+            self.attempts[update_id] = attempts
+            self.stats['failed'] += 1
+            if attempts < self.max_attempts:
+                retry.add(update_id)
+            else:
+                logger.error(f"Giving up on update {update_id} after {attempts} attempts")
+                self.stats['abandoned'] += 1
+                self.completed.add(update_id)
+                self.attempts.pop(update_id, None)
+        self.stats['skipped'] += len(updates) - len(pending)
+
+        # Commit the offset up to the first update that still deserves a retry
+        for update_id in sorted({u['update_id'] for u in updates}):
+            if update_id in retry:
+                break
+            self.offset = update_id + 1
+        if self.offset is not None:
+            self.completed = {update_id for update_id in self.completed if update_id >= self.offset}
+
+    async def poll_once(self) -> None:
+        updates = await asyncio.to_thread(self.client.get_updates, self.offset, self.poll_timeout, self.limit)
+        self.stats['polls'] += 1
+        if updates is None:
+            # TelegramClient already retried; back off before polling again
+            await asyncio.sleep(1)
+        elif updates:
+            await self.process_batch(updates)
+
+    async def run(self, stop: asyncio.Event) -> None:
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=self.max_concurrency + 1, thread_name_prefix='update')
+        )
+        logger.info(f"Polling for updates (timeout {self.poll_timeout}s, concurrency {self.max_concurrency})")
+
+        while not stop.is_set():
+            await self.poll_once()
+
+        if self.offset is not None:
+            # Confirm the last processed updates before exiting
+            await asyncio.to_thread(self.client.get_updates, self.offset, 0, 1)
+        logger.info(f"Polling stopped: {dict(self.stats)}")
+
+
+async def serve(delete_webhook: bool) -> None:
+    config = handler.load_config()
+    polling_config = config.get('polling', {})
+    client = handler.telegram()
+
+    # Each in-flight update may hold a primary and a hedged Bedrock request
+    handler.bedrock_invoker = create_invoker(max_workers=2 * polling_config.get('max_concurrency', 16))
+
+    if delete_webhook and not client.delete_webhook():
+        raise SystemExit("deleteWebhook failed")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        # The poll in flight finishes (up to timeout_seconds) before the worker exits
+        loop.add_signal_handler(signum, stop.set)
+
+    await PollingWorker(client, polling_config).run(stop)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delete-webhook", action="store_true", help="remove the webhook so getUpdates is allowed")
+    args = parser.parse_args()
+    asyncio.run(serve(args.delete_webhook))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict
+
+logger = logging.getLogger()
+
+COMPILED_CONFIG_PATH = Path(__file__).parent / 'prompt_config.json'
+SOURCE_CONFIG_PATH = Path(__file__).parent / 'prompt_config.yaml'
+REQUEST_BODY_PREFIX_KEY = 'request_body_prefix'
+ANTHROPIC_REQUEST_BODY_PREFIX_KEY = 'anthropic_request_body_prefix'
+CACHED_ANTHROPIC_REQUEST_BODY_PREFIX_KEY = 'cached_anthropic_request_body_prefix'
+ANTHROPIC_VERSION = 'bedrock-2023-05-31'
+
+
+def request_body_prefix(config: Dict[str, Any]) -> str:
+    """Serialized Bedrock request body up to and including the system message.
+
+    A full body is the prefix, each further message as ', ' + json.dumps(message),
+    and a closing ']}', which is byte-identical to json.dumps of the whole body.
+    """
+    body = json.dumps({
+        **config['bedrock'],
+        "messages": [{"role": "system", "content": config['prompts']['system']}]
+    })
+    return body[:-2]
+
+
+def anthropic_request_body_prefix(config: Dict[str, Any], cache_checkpoint: bool = False) -> str:
+    """Anthropic messages body up to the static system prompt block, left open for more blocks.
+
+    With cache_checkpoint the block ends in a prompt-cache checkpoint. Everything
+    before it must be byte-identical across requests for cache hits, so per-chat
+    context goes into later system blocks and messages.
+    """
+    system_block = {"type": "text", "text": config['prompts']['system']}
+    if cache_checkpoint:
+        system_block["cache_control"] = {"type": "ephemeral"}
+    body = json.dumps({"anthropic_version": ANTHROPIC_VERSION, **config['bedrock'], "system": [system_block]})
+    return body[:-2]
+
+
+def compile_prompt_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Config plus the values the handler would otherwise derive on every request"""
+    return {
+        **config,
+        REQUEST_BODY_PREFIX_KEY: request_body_prefix(config),
+        ANTHROPIC_REQUEST_BODY_PREFIX_KEY: anthropic_request_body_prefix(config),
+        CACHED_ANTHROPIC_REQUEST_BODY_PREFIX_KEY: anthropic_request_body_prefix(config, cache_checkpoint=True)
+    }
+
+
+def load_prompt_config() -> Dict[str, Any]:
+    """Load the JSON compiled at bundle time, or compile the YAML source (local runs)"""
+    if COMPILED_CONFIG_PATH.exists():
+        with open(COMPILED_CONFIG_PATH, 'r') as f:
+            return json.load(f)
+
+    # PyYAML is only needed when running from the source tree
+    import yaml
+
+    logger.warning(f"{COMPILED_CONFIG_PATH.name} not found, compiling {SOURCE_CONFIG_PATH.name}")
+    with open(SOURCE_CONFIG_PATH, 'r') as f:
+        return compile_prompt_config(yaml.safe_load(f))
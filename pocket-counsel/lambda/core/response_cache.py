@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import boto3
+
+from metrics import put_metric
+from text_utils import normalize_question
+
+logger = logging.getLogger()
+
+RESPONSE_CACHE_TABLE = os.environ.get('RESPONSE_CACHE_TABLE', '')
+DYNAMODB_ENDPOINT_URL = os.environ.get('DYNAMODB_ENDPOINT_URL') or None
+
+
+def config_fingerprint(config: Dict[str, Any], model_id: str) -> str:
+    """Hash of everything in the config that shapes a Bedrock answer"""
+    material = json.dumps(
+        {
+            'model_id': model_id,
+            'system': config['prompts']['system'],
+            'bedrock': config['bedrock']
+        },
+        sort_keys=True
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]
+
+
+class ResponseCache:
+    """Two-tier response cache: an in-process LRU backed by a shared DynamoDB table.
+
+    Keys combine the normalized question with a fingerprint of the prompt and
+    model parameters, so a config change naturally misses every old entry.
+    """
+
+    def __init__(self, table_name: str, ttl_seconds: int, max_entries: int) -> None:
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+        self._dynamodb = None
+
+    def _client(self):
+        if self._dynamodb is None:
+            self._dynamodb = boto3.client('dynamodb', endpoint_url=DYNAMODB_ENDPOINT_URL)
+        return self._dynamodb
+
+    @staticmethod
+    def make_key(question: str, fingerprint: str) -> str:
+        normalized = normalize_question(question)
+        return hashlib.sha256(f"{fingerprint}:{normalized}".encode('utf-8')).hexdigest()
+
+    def _remember(self, key: str, expires_at: float, response: str) -> None:
+        self._entries[key] = (expires_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, question: str, fingerprint: str) -> Optional[str]:
+        key = self.make_key(question, fingerprint)
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, response = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self._record('memory', hit=True)
+                return response
+            del self._entries[key]
+
+        if self.table_name:
+            try:
+                item = self._client().get_item(
+                    TableName=self.table_name,
+                    Key={'pk': {'S': key}}
+                ).get('Item')
+                # DynamoDB TTL deletes lazily, so expiry is checked on read too
+                if item and float(item['expires_at']['N']) > now:
+                    expires_at = float(item['expires_at']['N'])
+                    response = item['response']['S']
+                    self._remember(key, expires_at, response)
+                    self._record('dynamodb', hit=True)
+                    return response
+            except Exception as e:
+                logger.error(f"Response cache read failed: {e}")
+
+        self._record('miss', hit=False)
+        return None
+
+    def put(self, question: str, fingerprint: str, response: str) -> None:
+        key = self.make_key(question, fingerprint)
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, expires_at, response)
+
+        if self.table_name:
+            try:
+                self._client().put_item(
+                    TableName=self.table_name,
+                    Item={
+                        'pk': {'S': key},
+                        'question': {'S': normalize_question(question)},
+                        'response': {'S': response},
+                        'expires_at': {'N': str(int(expires_at))}
+                    }
+                )
+            except Exception as e:
+                logger.error(f"Response cache write failed: {e}")
+
+    @staticmethod
+    def _record(tier: str, hit: bool) -> None:
+        logger.debug(f"Response cache {'hit' if hit else 'miss'} ({tier})")
+        # Average of ResponseCacheHit is the hit rate
+        put_metric('ResponseCacheHit', 1 if hit else 0, unit='Count')
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache(cache_config: Dict[str, Any]) -> ResponseCache:
+    """Return the per-container cache, created on first use"""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(
+            table_name=RESPONSE_CACHE_TABLE,
+            ttl_seconds=cache_config.get('ttl_seconds', 86400),
+            max_entries=cache_config.get('max_entries', 256)
+        )
+    return _cache
@@ -0,0 +1,108 @@
+import json
+from typing import Any, Dict, Iterator, Optional
+
+REASONING_OPEN = '<reasoning>'
+REASONING_CLOSE = '</reasoning>'
+
+
+def _partial_tag_length(text: str, tag: str) -> int:
+    """Length of the longest suffix of text that is a prefix of tag"""
+    for length in range(min(len(text), len(tag) - 1), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class ReasoningFilter:
+    """Strips <reasoning>...</reasoning> blocks from text that arrives in chunks.
+
+    Tags may be split across chunk boundaries, so a possible partial tag at the
+    end of a chunk is held back until the next chunk resolves it.
+    """
+
+    def __init__(self) -> None:
+        self._pending = ''
+        self._inside = False
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk and return the text that is safe to show"""
+        self._pending += chunk
+        visible = []
+
+        while self._pending:
+            if self._inside:
+                end = self._pending.find(REASONING_CLOSE)
+                if end == -1:
+                    keep = _partial_tag_length(self._pending, REASONING_CLOSE)
+                    self._pending = self._pending[len(self._pending) - keep:] if keep else ''
+                    break
+                self._pending = self._pending[end + len(REASONING_CLOSE):]
+                self._inside = False
+            else:
+                start = self._pending.find(REASONING_OPEN)
+                if start == -1:
+                    keep = _partial_tag_length(self._pending, REASONING_OPEN)
+                    cut = len(self._pending) - keep
+                    visible.append(self._pending[:cut])
+                    self._pending = self._pending[cut:]
+                    break
+                visible.append(self._pending[:start])
+                self._pending = self._pending[start + len(REASONING_OPEN):]
+                self._inside = True
+
+        return ''.join(visible)
+
+    def finish(self) -> str:
+        """Flush held-back text; an unclosed reasoning block is dropped"""
+        remaining = '' if self._inside else self._pending
+        self._pending = ''
+        return remaining
+
+
+def extract_delta_text(chunk: Dict[str, Any]) -> str:
+    """Extract generated text from a decoded response-stream chunk"""
+    # OpenAI-style chunk (choices[0].delta.content)
+    choices = chunk.get('choices')
+    if choices:
+        delta = choices[0].get('delta') or {}
+        return delta.get('content') or ''
+    # Anthropic-style chunk (content_block_delta)
+    if chunk.get('type') == 'content_block_delta':
+        return chunk.get('delta', {}).get('text', '')
+    return ''
+
+
+def extract_token_usage(response_body: Dict[str, Any]) -> Dict[str, int]:
+    """Input/output and prompt-cache token counts from an invoke_model response body"""
+    usage = response_body.get('usage') or {}
+    metrics = response_body.get('amazon-bedrock-invocationMetrics') or {}
+    cached_prompt_tokens = (usage.get('prompt_tokens_details') or {}).get('cached_tokens')
+    return {
+        'input_tokens': usage.get('prompt_tokens', usage.get('input_tokens', metrics.get('inputTokenCount', 0))),
+        'output_tokens': usage.get('completion_tokens', usage.get('output_tokens', metrics.get('outputTokenCount', 0))),
+        'cache_read_tokens': usage.get(
+            'cache_read_input_tokens',
+            cached_prompt_tokens if cached_prompt_tokens is not None else metrics.get('cacheReadInputTokenCount', 0)
+        ),
+        'cache_write_tokens': usage.get('cache_creation_input_tokens', metrics.get('cacheWriteInputTokenCount', 0))
+    }
+
+
+def iter_stream_text(response: Dict[str, Any], usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+    """Yield text deltas from an invoke_model_with_response_stream response.
+
+    If usage is given it is filled from the invocation metrics Bedrock
+    attaches to the final chunk.
+    """
+    for event in response['body']:
+        if 'chunk' in event:
+            chunk = json.loads(event['chunk']['bytes'])
+            if usage is not None and 'amazon-bedrock-invocationMetrics' in chunk:
+                usage.update(extract_token_usage(chunk))
+            text = extract_delta_text(chunk)
+            if text:
+                yield text
+        else:
+            # modelStreamErrorException, throttlingException, ...
+            error_name = next(iter(event), 'unknown')
+            raise RuntimeError(f"Bedrock stream error: {error_name}: {event[error_name]}")
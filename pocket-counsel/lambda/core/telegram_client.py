@@ -0,0 +1,250 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import urllib3
+
+from metrics import put_metric
+
+logger = logging.getLogger()
+
+TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '')
+TELEGRAM_API_BASE = os.environ.get('TELEGRAM_API_BASE', 'https://api.telegram.org')
+
+PARSE_ERROR_MARKER = "can't parse entities"
+NOT_MODIFIED_MARKER = 'message is not modified'
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available"""
+
+    def __init__(self, rate_per_second: float, capacity: float) -> None:
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long the caller must wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class TelegramClient:
+    """Telegram Bot API client shared by every invocation in a warm container.
+
+    Keeps one pooled connection to the API, throttles requests with a global
+    and a per-chat token bucket, honours retry_after on 429 responses and
+    resends with plain text when Telegram rejects the Markdown.
+    """
+
+    MAX_TRACKED_CHATS = 1024
+
+    def __init__(
+        self,
+        token: str,
+        api_base: str = TELEGRAM_API_BASE,
+        global_per_second: float = 30,
+        per_chat_per_second: float = 1,
+        per_chat_burst: float = 3,
+        max_retries: int = 3,
+        max_retry_after: float = 10,
+        connect_timeout: float = 2,
+        read_timeout: float = 10,
+        max_connections: int = 10
+    ) -> None:
+        self.token = token
+        self.api_base = api_base
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self.per_chat_per_second = per_chat_per_second
+        self.per_chat_burst = per_chat_burst
+        self.connect_timeout = connect_timeout
+        self.global_bucket = TokenBucket(global_per_second, global_per_second)
+        self._chat_buckets: 'OrderedDict[Any, TokenBucket]' = OrderedDict()
+        self._chat_lock = threading.Lock()
+        self.http = urllib3.PoolManager(
+            maxsize=max_connections,
+            retries=False,
+            timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout)
+        )
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'retries': 0,
+            'rate_limited': 0,
+            'parse_fallbacks': 0,
+            'failures': 0,
+            'throttle_wait_ms': 0.0
+        }
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        # call() runs on many executor threads at once
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        with self._chat_lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = TokenBucket(self.per_chat_per_second, self.per_chat_burst)
+                self._chat_buckets[chat_id] = bucket
+                if len(self._chat_buckets) > self.MAX_TRACKED_CHATS:
+                    self._chat_buckets.popitem(last=False)
+            else:
+                self._chat_buckets.move_to_end(chat_id)
+            return bucket
+
+    def _throttle(self, chat_id: Any) -> None:
+        waited = self.global_bucket.acquire()
+        if chat_id is not None:
+            waited += self._chat_bucket(chat_id).acquire()
+        self._count('throttle_wait_ms', waited * 1000)
+
+    def _backoff(self, attempt: int) -> None:
+        if attempt < self.max_retries:
+            time.sleep(min(2 ** attempt * 0.25, 2))
+
+    def call(
+        self,
+        method: str,
+        payload: Dict[str, Any],
+        read_timeout: Optional[float] = None
+    ) -> Optional[Any]:
+        """Call a Bot API method and return its result, or None on failure"""
+        if not self.token:
+            logger.warning("TELEGRAM_BOT_TOKEN not configured")
+            return None
+
+        url = f"{self.api_base}/bot{self.token}/{method}"
+        payload = dict(payload)
+        started_at = time.monotonic()
+        retries = 0
+
+        try:
+            for attempt in range(self.max_retries + 1):
+                self._throttle(payload.get('chat_id'))
+                self._count('requests')
+
+                try:
+                    response = self.http.request(
+                        'POST',
+                        url,
+                        body=json.dumps(payload),
+                        headers={'Content-Type': 'application/json'},
+                        **(
+                            {'timeout': urllib3.Timeout(connect=self.connect_timeout, read=read_timeout)}
+                            if read_timeout else {}
+                        )
+                    )
+                    body = json.loads(response.data or b'{}')
+                except Exception as e:
+                    logger.warning(f"Telegram {method} request error: {e}")
+                    retries += 1
+                    self._backoff(attempt)
+                    continue
+
+                if response.status < 400:
+                    return body.get('result', {})
+
+                description = body.get('description', '')
+                if response.status == 429:
+                    self._count('rate_limited')
+                    retry_after = body.get('parameters', {}).get('retry_after', 1)
+                    if attempt == self.max_retries:
+                        raise Exception(f"HTTP 429: still rate limited after {self.max_retries} retries")
+                    if retry_after > self.max_retry_after:
+                        raise Exception(f"HTTP 429: retry_after {retry_after}s exceeds {self.max_retry_after}s")
+                    retries += 1
+                    logger.warning(f"Telegram {method} rate limited, retrying after {retry_after}s")
+                    time.sleep(retry_after)
+                elif response.status == 400 and PARSE_ERROR_MARKER in description and 'parse_mode' in payload:
+                    self._count('parse_fallbacks')
+                    retries += 1
+                    payload.pop('parse_mode')
+                elif response.status == 400 and NOT_MODIFIED_MARKER in description:
+                    return {}
+                elif response.status >= 500:
+                    retries += 1
+                    self._backoff(attempt)
+                else:
+                    raise Exception(f"HTTP {response.status}: {description}")
+
+            raise Exception(f"gave up after {self.max_retries} retries")
+        except Exception as e:
+            self._count('failures')
+            logger.error(f"Telegram {method} failed: {e}")
+            return None
+        finally:
+            self._count('retries', retries)
+            put_metric(
+                'TelegramLatency',
+                (time.monotonic() - started_at) * 1000,
+                dimensions={'Method': method}
+            )
+            if retries:
+                put_metric('TelegramRetries', retries, unit='Count', dimensions={'Method': method})
+
+    def send_message(self, chat_id: int, text: str, parse_mode: Optional[str] = "Markdown") -> Optional[int]:
+        """Send a message and return its message_id, or None on failure"""
+        payload = {"chat_id": chat_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+
+        result = self.call('sendMessage', payload)
+        return None if result is None else result.get('message_id', 0)
+
+    def edit_message(self, chat_id: int, message_id: int, text: str, parse_mode: Optional[str] = None) -> bool:
+        """Replace the text of a previously sent message"""
+        payload = {"chat_id": chat_id, "message_id": message_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+
+        return self.call('editMessageText', payload) is not None
+
+    def get_updates(self, offset: Optional[int], timeout: int, limit: int = 100) -> Optional[List[Dict[str, Any]]]:
+        """Long-poll for updates; passing offset confirms every update before it"""
+        payload = {"timeout": timeout, "limit": limit, "allowed_updates": ["message"]}
+        if offset is not None:
+            payload["offset"] = offset
+
+        # The read timeout has to outlast the long poll itself
+        return self.call('getUpdates', payload, read_timeout=timeout + 10)
+
+    def delete_webhook(self) -> bool:
+        """getUpdates is refused while a webhook is set"""
+        return self.call('deleteWebhook', {"drop_pending_updates": False}) is not None
+
+
+_client: Optional[TelegramClient] = None
+
+
+def get_telegram_client(telegram_config: Dict[str, Any]) -> TelegramClient:
+    """Return the per-container client, created on first use"""
+    global _client
+    if _client is None:
+        _client = TelegramClient(
+            TELEGRAM_BOT_TOKEN,
+            global_per_second=telegram_config.get('global_per_second', 30),
+            per_chat_per_second=telegram_config.get('per_chat_per_second', 1),
+            per_chat_burst=telegram_config.get('per_chat_burst', 3),
+            max_retries=telegram_config.get('max_retries', 3),
+            max_retry_after=telegram_config.get('max_retry_after_seconds', 10),
+            max_connections=telegram_config.get('max_connections', 10)
+        )
+    return _client
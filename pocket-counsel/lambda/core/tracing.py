@@ -0,0 +1,130 @@
+import contextvars
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from metrics import put_metrics
+
+# Chatty library loggers stay quiet even when an invocation is sampled at DEBUG
+QUIET_LOGGERS = ('boto3', 'botocore', 'urllib3')
+
+
+class Invocation:
+    """Span timings and summary fields collected while handling one update"""
+
+    def __init__(self, request_id: str, sampled: bool) -> None:
+        self.request_id = request_id
+        self.sampled = sampled
+        self.started_at = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self.fields: Dict[str, Any] = {}
+
+
+_current: contextvars.ContextVar[Optional[Invocation]] = contextvars.ContextVar('invocation', default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, tagged with the current request_id"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'message': record.getMessage()
+        }
+        invocation = _current.get()
+        if invocation is not None:
+            entry['request_id'] = invocation.request_id
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Pass records at the configured level, or any level for sampled invocations"""
+
+    def __init__(self, level: int) -> None:
+        super().__init__()
+        self.level = level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.level:
+            return True
+        invocation = _current.get()
+        return invocation is not None and invocation.sampled
+
+
+_sample_rate = 0.0
+
+
+def configure_logging(logging_config: Dict[str, Any]) -> None:
+    """Switch the root logger to JSON lines at logging.level, sampling DEBUG at logging.sample_rate"""
+    global _sample_rate
+    level = getattr(logging, str(logging_config.get('level', 'INFO')).upper(), logging.INFO)
+    _sample_rate = logging_config.get('sample_rate', 0.0)
+
+    root = logging.getLogger()
+    if not root.handlers:
+        root.addHandler(logging.StreamHandler())
+    for handler in root.handlers:
+        handler.setFormatter(JsonFormatter())
+        for existing in [f for f in handler.filters if isinstance(f, SamplingFilter)]:
+            handler.removeFilter(existing)
+        handler.addFilter(SamplingFilter(level))
+    root.setLevel(logging.DEBUG if _sample_rate > 0 else level)
+
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(level, logging.WARNING))
+
+
+def start_invocation(request_id: str) -> Invocation:
+    invocation = Invocation(request_id, sampled=random.random() < _sample_rate)
+    _current.set(invocation)
+    return invocation
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block; repeated spans with the same name add up (e.g. several Telegram calls)"""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        invocation = _current.get()
+        if invocation is not None:
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            invocation.spans[name] = invocation.spans.get(name, 0.0) + elapsed_ms
+
+
+def annotate(**fields: Any) -> None:
+    """Attach fields to the current invocation's summary line"""
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.fields.update(fields)
+
+
+def finish_invocation(logger: logging.Logger) -> None:
+    """Emit the span timings as one EMF record and one summary log line"""
+    invocation = _current.get()
+    if invocation is None:
+        return
+    _current.set(None)
+
+    total_ms = (time.perf_counter() - invocation.started_at) * 1000
+    put_metrics({
+        'HandlerTime': total_ms,
+        **{f"{name.capitalize()}Time": elapsed_ms for name, elapsed_ms in invocation.spans.items()}
+    })
+    logger.info(
+        "Update handled",
+        extra={'fields': {
+            'request_id': invocation.request_id,
+            'duration_ms': round(total_ms, 1),
+            'spans_ms': {name: round(elapsed_ms, 1) for name, elapsed_ms in invocation.spans.items()},
+            **invocation.fields
+        }}
+    )
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Accuracy and latency benchmark for the FAQ fast-path index.
+
+Runs the held-out cases in config/faq_eval.yaml through the shipped
+lambda/core/faq_index.json and reports precision/recall at the configured
+threshold plus lookup latency percentiles.
+
+Usage:
+    python scripts/benchmark_faq_index.py [--min-score 0.5] [--iterations 2000]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+CORE_LAMBDA_DIR = PROJECT_ROOT / "lambda" / "core"
+sys.path.insert(0, str(CORE_LAMBDA_DIR))
+
+from faq_index import FaqIndex  # noqa: E402
+
+EVAL_PATH = PROJECT_ROOT / "config" / "faq_eval.yaml"
+PROMPT_CONFIG_PATH = CORE_LAMBDA_DIR / "prompt_config.yaml"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main() -> None:
+    with open(PROMPT_CONFIG_PATH, 'r') as f:
+        default_min_score = yaml.safe_load(f).get("fast_path", {}).get("min_score", 0.5)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--min-score", type=float, default=default_min_score)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(EVAL_PATH, 'r') as f:
+        cases = yaml.safe_load(f)["cases"]
+
+    started = time.perf_counter()
+    index = FaqIndex.load()
+    load_ms = (time.perf_counter() - started) * 1000
+
+    answered = answered_correct = correct = wrong = missed = 0
+    for case in cases:
+        entry, score = index.search(case["question"])
+        predicted = entry["id"] if entry and score >= args.min_score else None
+        if predicted is not None:
+            answered += 1
+        if predicted == case["expected"]:
+            correct += 1
+            answered_correct += predicted is not None
+            status = "ok"
+        elif predicted is None:
+            missed += 1
+            status = "MISS"
+        else:
+            wrong += 1
+            status = "WRONG"
+        best = entry["id"] if entry else "-"
+        print(f"{status:5} {score:.3f} {best:22} {case['question']}")
+
+    positives = sum(1 for case in cases if case["expected"] is not None)
+
+    latencies = []
+    questions = [case["question"] for case in cases]
+    for i in range(args.iterations):
+        question = questions[i % len(questions)]
+        started = time.perf_counter()
+        index.search(question)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    print()
+    print(f"threshold:  {args.min_score}")
+    print(f"accuracy:   {correct}/{len(cases)} ({wrong} wrong answers, {missed} missed)")
+    print(f"precision:  {answered_correct}/{answered} answered correctly")
+    print(f"recall:     {answered_correct}/{positives} FAQ questions answered offline")
+    print(f"index load: {load_ms:.1f} ms")
+    print(
+        f"lookup:     p50 {percentile(latencies, 50):.3f} ms  "
+        f"p99 {percentile(latencies, 99):.3f} ms  "
+        f"mean {statistics.mean(latencies):.3f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Compare Bedrock requests with and without the prompt-cache checkpoint.
+
+Sends --requests sequential questions through handler.invoke_bedrock to the fake
+Bedrock server, for an Anthropic model tier, once with prompt_cache.enabled and
+once without. The fake server charges prefill time for every prompt token not
+read from its simulated cache, so the latency difference reflects the cache hit
+rate. The static system prompt is padded to --system-tokens when it is shorter,
+because Bedrock ignores checkpoints below the model's minimum cacheable length.
+
+Usage:
+    python scripts/benchmark_prompt_cache.py [--requests 50] [--system-tokens 2000]
+        [--model-id anthropic.claude-3-5-haiku-20241022-v1:0] [--prefill-ms-per-1k 150]
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+CORE_LAMBDA_DIR = PROJECT_ROOT / "lambda" / "core"
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_services import FakeBedrockServer  # noqa: E402
+
+QUESTIONS = [
+    "Should I pay off my credit card or save first?",
+    "How much should I keep in an emergency fund?",
+    "I earn 2400 a month and owe 3100 at 38%. What do I pay first?",
+    "¿Conviene invertir en fondos indexados?"
+]
+PADDING_LINE = "- Reference: explain fees, interest and risk in plain words, with one concrete example.\n"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def padded_config(base: Dict[str, Any], system_tokens: int, prompt_config) -> Dict[str, Any]:
+    """Source config with the system prompt padded to about system_tokens, recompiled"""
+    source = {key: value for key, value in base.items() if not key.endswith('request_body_prefix')}
+    system = source['prompts']['system']
+    while FakeBedrockServer.count_tokens(system) < system_tokens:
+        system += PADDING_LINE
+    return prompt_config.compile_prompt_config({**source, 'prompts': {**source['prompts'], 'system': system}})
+
+
+def run_scenario(handler, bedrock: FakeBedrockServer, config: Dict[str, Any], tier: Dict[str, Any], requests: int):
+    before = dict(bedrock.stats)
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for index in range(requests):
+            started_at = time.perf_counter()
+            handler.invoke_bedrock(QUESTIONS[index % len(QUESTIONS)], 'Bench', config, tier=tier)
+            latencies.append(time.perf_counter() - started_at)
+    delta = {key: bedrock.stats.get(key, 0) - before.get(key, 0) for key in bedrock.stats}
+    return latencies, delta
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--system-tokens", type=int, default=2000, help="pad the system prompt to this many tokens")
+    parser.add_argument("--model-id", default="anthropic.claude-3-5-haiku-20241022-v1:0")
+    parser.add_argument("--ttft", default="fixed:200", help="base time to first token")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=150, help="prefill time per 1k uncached tokens")
+    args = parser.parse_args()
+
+    bedrock = FakeBedrockServer(
+        latency=args.ttft,
+        token_interval="fixed:0",
+        prefill_ms_per_1k_tokens=args.prefill_ms_per_1k
+    ).start()
+    os.environ.update({
+        'BEDROCK_ENDPOINT_URL': bedrock.url,
+        'TELEGRAM_BOT_TOKEN': 'benchmark',
+        'AWS_ACCESS_KEY_ID': 'fake',
+        'AWS_SECRET_ACCESS_KEY': 'fake',
+        'AWS_DEFAULT_REGION': 'us-east-1'
+    })
+    sys.path.insert(0, str(CORE_LAMBDA_DIR))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import handler
+        import prompt_config
+    logging.getLogger().setLevel(logging.ERROR)
+
+    config = padded_config(handler.load_config(), args.system_tokens, prompt_config)
+    tier = {'name': 'benchmark', 'model_id': args.model_id}
+    cache_config = config.get('prompt_cache', {})
+    if not handler.uses_prompt_cache(args.model_id, {**config, 'prompt_cache': {**cache_config, 'enabled': True}}):
+        print(f"note: {args.model_id} is not in prompt_cache.model_families, both runs skip the checkpoint")
+    print(
+        f"{args.requests} sequential requests to {args.model_id}, "
+        f"static prompt ~{FakeBedrockServer.count_tokens(config['prompts']['system'])} tokens"
+    )
+
+    for label, enabled in (("cache off", False), ("cache on", True)):
+        scenario_config = {**config, 'prompt_cache': {**cache_config, 'enabled': enabled}}
+        latencies, delta = run_scenario(handler, bedrock, scenario_config, tier, args.requests)
+        calls = max(1, delta.get('calls.invoke', 0))
+        print(
+            f"  {label:<10} p50 {percentile(latencies, 50) * 1000:6.0f} ms  p95 {percentile(latencies, 95) * 1000:6.0f} ms  "
+            f"{delta.get('request_bytes', 0) / calls:7.0f} B/request  "
+            f"cache read {delta.get('cache_read_tokens', 0) / calls:6.0f}  "
+            f"cache write {delta.get('cache_write_tokens', 0) / calls:6.0f} tokens/request"
+        )
+
+    bedrock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Build lambda/core/faq_index.json from config/faq.yaml.
+
+Usage:
+    python scripts/build_faq_index.py
+"""
+import json
+import sys
+from pathlib import Path
+
+import yaml
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+CORE_LAMBDA_DIR = PROJECT_ROOT / "lambda" / "core"
+sys.path.insert(0, str(CORE_LAMBDA_DIR))
+
+from faq_index import INDEX_PATH, build_index  # noqa: E402
+
+FAQ_PATH = PROJECT_ROOT / "config" / "faq.yaml"
+
+
+def main() -> None:
+    with open(FAQ_PATH, 'r') as f:
+        entries = yaml.safe_load(f)["entries"]
+
+    index = build_index(entries)
+    with open(INDEX_PATH, 'w') as f:
+        json.dump(index, f, separators=(',', ':'), ensure_ascii=False)
+
+    print(
+        f"Indexed {len(index['question_entry'])} questions for {len(entries)} entries "
+        f"-> {INDEX_PATH.relative_to(PROJECT_ROOT)} ({INDEX_PATH.stat().st_size} bytes)"
+    )
+
+
+if __name__ == "__main__":
+    main()
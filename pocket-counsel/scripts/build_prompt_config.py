@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Compile lambda/core/prompt_config.yaml into prompt_config.json.
+
+CoreStack runs this while bundling the core Lambda, so PyYAML is not a runtime
+dependency. Run it locally to try the compiled config outside of a deploy.
+
+Usage:
+    python scripts/build_prompt_config.py [SOURCE_YAML] [OUTPUT_JSON]
+"""
+import json
+import sys
+from pathlib import Path
+
+import yaml
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+CORE_LAMBDA_DIR = PROJECT_ROOT / "lambda" / "core"
+
+
+def main() -> None:
+    source_path = Path(sys.argv[1]) if len(sys.argv) > 1 else CORE_LAMBDA_DIR / "prompt_config.yaml"
+    output_path = Path(sys.argv[2]) if len(sys.argv) > 2 else CORE_LAMBDA_DIR / "prompt_config.json"
+
+    # Import from the directory being compiled (/asset-input inside the bundling image)
+    sys.path.insert(0, str(source_path.resolve().parent))
+    from prompt_config import compile_prompt_config
+
+    with open(source_path, 'r') as f:
+        config = compile_prompt_config(yaml.safe_load(f))
+
+    with open(output_path, 'w') as f:
+        json.dump(config, f, separators=(',', ':'), ensure_ascii=False)
+
+    print(f"Compiled {source_path.name} -> {output_path} ({output_path.stat().st_size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
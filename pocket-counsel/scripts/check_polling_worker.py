@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""End-to-end check of the long-polling worker against the fake Telegram and Bedrock servers.
+
+Queues updates for --chats chats, plus a redelivered duplicate and one update
+whose first processing attempt fails, then runs PollingWorker until Telegram
+has been told every update is done. It verifies that:
+- every chat got exactly one reply
+- the failed update was retried rather than skipped
+- no other update was processed twice, even though the updates after the
+  failed one are redelivered with it
+- the confirmed offset covers every update
+It also reports the throughput. Exits non-zero on failure.
+
+Usage:
+    python scripts/check_polling_worker.py [--chats 50] [--bedrock-ttft lognormal:800,0.5]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+CORE_LAMBDA_DIR = PROJECT_ROOT / "lambda" / "core"
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_services import FakeBedrockServer, FakeTelegramServer  # noqa: E402
+
+FIRST_UPDATE_ID = 500000000
+
+
+def make_update(update_id: int, chat_id: int, text: str):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id % 100000,
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Poll'},
+            'chat': {'id': chat_id, 'type': 'private'},
+            'date': int(time.time()),
+            'text': text
+        }
+    }
+
+
+async def run_worker(worker, telegram: FakeTelegramServer, last_update_id: int, timeout: float) -> None:
+    stop = asyncio.Event()
+    task = asyncio.create_task(worker.run(stop))
+    deadline = time.monotonic() + timeout
+    while worker.offset is None or worker.offset <= last_update_id:
+        if time.monotonic() > deadline or task.done():
+            break
+        await asyncio.sleep(0.05)
+    stop.set()
+    await task
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--bedrock-ttft", default="lognormal:800,0.5")
+    parser.add_argument("--telegram-latency", default="lognormal:60,0.4")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    bedrock = FakeBedrockServer(latency=args.bedrock_ttft, token_interval="fixed:5").start()
+    telegram = FakeTelegramServer(latency=args.telegram_latency, webhook_set=True).start()
+    os.environ.update({
+        'BEDROCK_ENDPOINT_URL': bedrock.url,
+        'TELEGRAM_API_BASE': telegram.url,
+        'TELEGRAM_BOT_TOKEN': 'polling-check',
+        'AWS_ACCESS_KEY_ID': 'fake',
+        'AWS_SECRET_ACCESS_KEY': 'fake',
+        'AWS_DEFAULT_REGION': 'us-east-1'
+    })
+    sys.path.insert(0, str(CORE_LAMBDA_DIR))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import handler
+        from polling_worker import PollingWorker
+    logging.getLogger().setLevel(logging.ERROR)
+
+    updates = [
+        make_update(FIRST_UPDATE_ID + i, chat_id=i + 1, text=f"I have {i + 2} credit cards, which one do I pay first?")
+        for i in range(args.chats)
+    ]
+    for update in updates:
+        telegram.enqueue_update(update)
+    # Telegram redelivering an update that is already queued
+    telegram.enqueue_update(updates[0])
+    flaky_update_id = updates[len(updates) // 2]['update_id']
+    failures = []
+    calls: Counter = Counter()
+
+    def flaky_process(update, deadline=None):
+        calls[update['update_id']] += 1
+        if update['update_id'] == flaky_update_id and not failures:
+            failures.append(update['update_id'])
+            raise RuntimeError("injected failure")
+        return handler.process_update(update, deadline)
+
+    config = handler.load_config()
+    polling_config = {**config.get('polling', {}), 'timeout_seconds': 1}
+    client = handler.telegram()
+    assert client.delete_webhook(), "deleteWebhook failed"
+    worker = PollingWorker(client, polling_config, process=flaky_process)
+
+    started_at = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(run_worker(worker, telegram, updates[-1]['update_id'], args.timeout))
+    elapsed = time.monotonic() - started_at
+
+    replies = {chat_id: telegram.take_messages(chat_id) for chat_id in range(1, args.chats + 1)}
+    answered = sum(1 for messages in replies.values() if messages)
+    duplicated = [
+        chat_id for chat_id, messages in replies.items()
+        if len({m['message_id'] for m in messages}) > 1
+    ]
+    checks = {
+        "every chat answered": answered == args.chats,
+        "no chat answered twice": not duplicated,
+        "failed update retried": bool(failures) and worker.stats['failed'] == 1 and worker.stats['abandoned'] == 0,
+        "no other update processed twice": all(
+            count == 1 for update_id, count in calls.items() if update_id != flaky_update_id
+        ),
+        "offset confirmed": telegram.confirmed_offset == updates[-1]['update_id'] + 1
+    }
+
+    bedrock.stop()
+    telegram.stop()
+    print(f"{answered}/{args.chats} chats answered in {elapsed:.1f}s ({answered / elapsed:.1f} updates/s)")
+    print(f"worker: {dict(worker.stats)}  confirmed offset {telegram.confirmed_offset}")
+    for name, passed in checks.items():
+        print(f"  {'PASS' if passed else 'FAIL'}  {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""Local fake Bedrock Runtime and Telegram Bot API servers with programmable latency.
+
+Used by the load-test harness. Point the core Lambda at them with
+BEDROCK_ENDPOINT_URL and TELEGRAM_API_BASE.
+
+Latency specs (milliseconds):
+    fixed:50            always 50
+    uniform:20,80       uniform between 20 and 80
+    lognormal:800,0.5   median 800 with log-space sigma 0.5 (long right tail)
+    exp:40              exponential with mean 40
+
+Usage (standalone, until Ctrl-C):
+    python scripts/fake_services.py [--bedrock-ttft lognormal:800,0.5] [--telegram-latency lognormal:60,0.4]
+"""
+import argparse
+import base64
+import binascii
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+
+class LatencyDistribution:
+    """Samples delays in seconds from a spec like 'lognormal:800,0.5' (milliseconds)"""
+
+    def __init__(self, spec: str) -> None:
+        self.spec = spec
+        kind, _, params = spec.partition(':')
+        values = [float(v) for v in params.split(',')] if params else []
+        if kind == 'fixed' and len(values) == 1:
+            self._sample = lambda: values[0]
+        elif kind == 'uniform' and len(values) == 2:
+            self._sample = lambda: random.uniform(values[0], values[1])
+        elif kind == 'lognormal' and len(values) == 2:
+            self._sample = lambda: random.lognormvariate(math.log(values[0]), values[1])
+        elif kind == 'exp' and len(values) == 1:
+            self._sample = lambda: random.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+        else:
+            raise ValueError(f"Invalid latency spec: {spec}")
+
+    def sample(self) -> float:
+        return max(0.0, self._sample()) / 1000
+
+    def sleep(self) -> None:
+        time.sleep(self.sample())
+
+
+class _FakeServer:
+    """ThreadingHTTPServer on a free local port, served from a daemon thread"""
+
+    def __init__(self, handler_class) -> None:
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        handler = type(handler_class.__name__, (handler_class,), {'server_state': self})
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+    def start(self) -> '_FakeServer':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_state: Any = None
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+# --- Telegram ---------------------------------------------------------------
+
+class _TelegramHandler(_JsonHandler):
+
+    def do_POST(self) -> None:
+        state: FakeTelegramServer = self.server_state
+        method = self.path.rsplit('/', 1)[-1]
+        payload = self.read_json()
+        state.latency.sleep()
+        state.count(f"calls.{method}")
+
+        if state.rate_limit_probability and random.random() < state.rate_limit_probability:
+            state.count('rate_limited')
+            self.send_json(429, {
+                'ok': False,
+                'error_code': 429,
+                'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1}
+            })
+            return
+
+        if method == 'sendMessage':
+            message_id = state.record(payload['chat_id'], payload['text'])
+            self.send_json(200, {'ok': True, 'result': {'message_id': message_id, 'text': payload['text']}})
+        elif method == 'editMessageText':
+            state.record(payload['chat_id'], payload['text'], payload['message_id'])
+            self.send_json(200, {'ok': True, 'result': {'message_id': payload['message_id']}})
+        elif method == 'getUpdates':
+            if state.webhook_set:
+                self.send_json(409, {
+                    'ok': False,
+                    'error_code': 409,
+                    'description': "Conflict: can't use getUpdates method while webhook is active"
+                })
+                return
+            updates = state.poll(payload.get('offset'), payload.get('timeout', 0), payload.get('limit', 100))
+            self.send_json(200, {'ok': True, 'result': updates})
+        elif method == 'deleteWebhook':
+            state.webhook_set = False
+            self.send_json(200, {'ok': True, 'result': True})
+        else:
+            self.send_json(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+
+
+class FakeTelegramServer(_FakeServer):
+    """Bot API stand-in that records every message sent or edited, per chat.
+
+    getUpdates serves updates queued with enqueue_update(); like Telegram, an
+    update is only forgotten once a later call passes an offset past it.
+    """
+
+    def __init__(
+        self,
+        latency: str = 'fixed:0',
+        rate_limit_probability: float = 0.0,
+        webhook_set: bool = False
+    ) -> None:
+        super().__init__(_TelegramHandler)
+        self.latency = LatencyDistribution(latency)
+        self.rate_limit_probability = rate_limit_probability
+        self.webhook_set = webhook_set
+        self.confirmed_offset = 0
+        self._message_ids = 0
+        self._messages: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+        self._updates: List[Dict[str, Any]] = []
+        self._updates_changed = threading.Condition(self._lock)
+
+    def enqueue_update(self, update: Dict[str, Any]) -> None:
+        with self._updates_changed:
+            self._updates.append(update)
+            self._updates_changed.notify_all()
+
+    def poll(self, offset: Optional[int], timeout: float, limit: int) -> List[Dict[str, Any]]:
+        deadline = time.monotonic() + timeout
+        with self._updates_changed:
+            if offset is not None:
+                self.confirmed_offset = max(self.confirmed_offset, offset)
+                self._updates = [u for u in self._updates if u['update_id'] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._updates_changed.wait(deadline - time.monotonic())
+            return self._updates[:limit]
+
+    @property
+    def pending_updates(self) -> int:
+        with self._lock:
+            return len(self._updates)
+
+    def record(self, chat_id: Any, text: str, message_id: Optional[int] = None) -> int:
+        with self._lock:
+            if message_id is None:
+                self._message_ids += 1
+                message_id = self._message_ids
+            self._messages[chat_id].append({'message_id': message_id, 'text': text, 'at': time.monotonic()})
+            return message_id
+
+    def take_messages(self, chat_id: Any) -> List[Dict[str, Any]]:
+        """Return and forget what was sent to chat_id so far"""
+        with self._lock:
+            return self._messages.pop(chat_id, [])
+
+
+# --- Bedrock ----------------------------------------------------------------
+
+def encode_event(headers: Dict[str, str], payload: bytes) -> bytes:
+    """Encode one message in the AWS event stream format (string headers only)"""
+    encoded_headers = b''.join(
+        struct.pack('>B', len(name)) + name.encode('utf-8')
+        + struct.pack('>BH', 7, len(value)) + value.encode('utf-8')
+        for name, value in headers.items()
+    )
+    total_length = 12 + len(encoded_headers) + len(payload) + 4
+    prelude = struct.pack('>II', total_length, len(encoded_headers))
+    prelude += struct.pack('>I', binascii.crc32(prelude))
+    message = prelude + encoded_headers + payload
+    return message + struct.pack('>I', binascii.crc32(message))
+
+
+def encode_chunk(chunk: Dict[str, Any]) -> bytes:
+    payload = json.dumps({'bytes': base64.b64encode(json.dumps(chunk).encode('utf-8')).decode('ascii')})
+    return encode_event(
+        {':event-type': 'chunk', ':content-type': 'application/json', ':message-type': 'event'},
+        payload.encode('utf-8')
+    )
+
+
+_MODEL_PATH = re.compile(r'^/model/(?P<model_id>[^/]+)/(?P<action>invoke|invoke-with-response-stream)$')
+
+
+class _BedrockHandler(_JsonHandler):
+
+    def do_POST(self) -> None:
+        state: FakeBedrockServer = self.server_state
+        match = _MODEL_PATH.match(self.path)
+        body = self.read_json()
+        if not match:
+            self.send_json(404, {'message': f"Unknown path {self.path}"})
+            return
+
+        action = match.group('action')
+        state.count(f"calls.{action}")
+        state.count('request_bytes', int(self.headers.get('Content-Length') or 0))
+
+        if state.error_probability and random.random() < state.error_probability:
+            state.latency.sleep()
+            state.count('errors')
+            self.send_json(
+                429,
+                {'message': 'Too many requests, please wait before trying again.'},
+                {'x-amzn-ErrorType': 'ThrottlingException:http://internal.amazon.com/coral/com.amazon.bedrock/'}
+            )
+            return
+
+        usage = state.account(body)
+        words = state.answer_words()
+        anthropic = 'anthropic_version' in body
+
+        state.latency.sleep()
+        # Prompt processing time scales with the tokens not served from the prompt cache
+        time.sleep(state.prefill_ms_per_1k_tokens * usage['uncached_tokens'] / 1000 / 1000)
+        if action == 'invoke':
+            for _ in words:
+                time.sleep(state.token_interval.sample())
+            if anthropic:
+                self.send_json(200, {
+                    'type': 'message',
+                    'role': 'assistant',
+                    'content': [{'type': 'text', 'text': ' '.join(words)}],
+                    'usage': {
+                        'input_tokens': usage['uncached_tokens'] - usage['cache_write_tokens'],
+                        'output_tokens': usage['completion_tokens'],
+                        'cache_read_input_tokens': usage['cache_read_tokens'],
+                        'cache_creation_input_tokens': usage['cache_write_tokens']
+                    }
+                })
+            else:
+                self.send_json(200, {
+                    'choices': [{'message': {'role': 'assistant', 'content': state.render(words)}}],
+                    'usage': {'prompt_tokens': usage['prompt_tokens'], 'completion_tokens': usage['completion_tokens']}
+                })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.amazon.eventstream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        if anthropic:
+            chunks = [{'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': word + ' '}} for word in words]
+            final_chunk = {'type': 'message_stop'}
+        else:
+            texts = [f"<reasoning>{state.reasoning}</reasoning>"] if state.reasoning else []
+            chunks = [{'choices': [{'delta': {'content': text}}]} for text in texts + [word + ' ' for word in words]]
+            final_chunk = {'choices': [{'delta': {}, 'finish_reason': 'stop'}]}
+        final_chunk['amazon-bedrock-invocationMetrics'] = {
+            'inputTokenCount': usage['uncached_tokens'] - usage['cache_write_tokens'] if anthropic else usage['prompt_tokens'],
+            'outputTokenCount': usage['completion_tokens'],
+            'cacheReadInputTokenCount': usage['cache_read_tokens'],
+            'cacheWriteInputTokenCount': usage['cache_write_tokens']
+        }
+        try:
+            for index, chunk in enumerate(chunks):
+                if index:
+                    time.sleep(state.token_interval.sample())
+                self._write_chunk(encode_chunk(chunk))
+            self._write_chunk(encode_chunk(final_chunk))
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream (hedge loser)
+            state.count('streams_closed')
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+
+class FakeBedrockServer(_FakeServer):
+    """bedrock-runtime stand-in for invoke and invoke-with-response-stream.
+
+    Answers in the OpenAI chat format used by the gpt-oss models, or in the
+    Anthropic messages format when the request has anthropic_version. latency
+    is the base time to the first token, plus prefill_ms_per_1k_tokens for
+    every prompt token not read from the simulated prompt cache; token_interval
+    separates later tokens.
+
+    The prompt cache follows Bedrock: the system blocks up to a cache_control
+    checkpoint are cached for five minutes if they reach min_cache_tokens.
+    """
+
+    CACHE_TTL_SECONDS = 300
+
+    WORDS = (
+        'Pay', 'high-interest', 'debt', 'first,', 'then', 'build', 'a', 'small', 'emergency', 'fund',
+        'and', 'invest', 'the', 'rest', 'in', 'low-cost', 'index', 'funds', 'you', 'understand.'
+    )
+
+    def __init__(
+        self,
+        latency: str = 'fixed:0',
+        token_interval: str = 'fixed:0',
+        answer_words: int = 30,
+        error_probability: float = 0.0,
+        reasoning: str = '',
+        prefill_ms_per_1k_tokens: float = 0.0,
+        min_cache_tokens: int = 1024
+    ) -> None:
+        super().__init__(_BedrockHandler)
+        self.latency = LatencyDistribution(latency)
+        self.token_interval = LatencyDistribution(token_interval)
+        self.answer_word_count = answer_words
+        self.error_probability = error_probability
+        self.reasoning = reasoning
+        self.prefill_ms_per_1k_tokens = prefill_ms_per_1k_tokens
+        self.min_cache_tokens = min_cache_tokens
+        self._prompt_cache: Dict[str, float] = {}
+
+    def answer_words(self) -> List[str]:
+        return [self.WORDS[i % len(self.WORDS)] for i in range(self.answer_word_count)]
+
+    def render(self, words: List[str]) -> str:
+        text = ' '.join(words)
+        return f"<reasoning>{self.reasoning}</reasoning>{text}" if self.reasoning else text
+
+    @staticmethod
+    def count_tokens(value: Any) -> int:
+        return max(1, len(json.dumps(value)) // 4)
+
+    def account(self, body: Dict[str, Any]) -> Dict[str, int]:
+        """Prompt, cached and uncached token counts for a request, updating the prompt cache"""
+        prompt_tokens = self.count_tokens(body)
+        cache_read = cache_write = 0
+
+        system = body.get('system')
+        if isinstance(system, list):
+            checkpoint = max((i for i, block in enumerate(system) if 'cache_control' in block), default=None)
+            if checkpoint is not None:
+                cacheable = system[:checkpoint + 1]
+                cacheable_tokens = self.count_tokens(cacheable)
+                if cacheable_tokens >= self.min_cache_tokens:
+                    key = json.dumps(cacheable, sort_keys=True)
+                    now = time.monotonic()
+                    with self._lock:
+                        hit = self._prompt_cache.get(key, 0) > now
+                        self._prompt_cache[key] = now + self.CACHE_TTL_SECONDS
+                    if hit:
+                        cache_read = cacheable_tokens
+                    else:
+                        cache_write = cacheable_tokens
+
+        self.count('cache_read_tokens', cache_read)
+        self.count('cache_write_tokens', cache_write)
+        return {
+            'prompt_tokens': prompt_tokens,
+            'uncached_tokens': prompt_tokens - cache_read,
+            'cache_read_tokens': cache_read,
+            'cache_write_tokens': cache_write,
+            'completion_tokens': self.answer_word_count
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bedrock-ttft", default="lognormal:800,0.5")
+    parser.add_argument("--bedrock-token-interval", default="fixed:15")
+    parser.add_argument("--telegram-latency", default="lognormal:60,0.4")
+    args = parser.parse_args()
+
+    bedrock = FakeBedrockServer(latency=args.bedrock_ttft, token_interval=args.bedrock_token_interval).start()
+    telegram = FakeTelegramServer(latency=args.telegram_latency).start()
+    print(f"BEDROCK_ENDPOINT_URL={bedrock.url}")
+    print(f"TELEGRAM_API_BASE={telegram.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        bedrock.stop()
+        telegram.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""Offline load test for the core Lambda handler.
+
+Generates Telegram webhook updates (API Gateway proxy events) with Poisson
+arrivals at --rate per second. Each update runs through lambda_handler
+in-process, against local fake Bedrock and Telegram servers
+(scripts/fake_services.py) with the given latency distributions. DynamoDB-backed
+features use their in-memory stand-ins because no table env vars are set.
+
+Reports end-to-end latency (from scheduled arrival, so queueing counts),
+time to first visible text, throughput and the outcome of every update.
+
+Usage:
+    python scripts/load_test.py [--rate 10] [--duration 30] [--concurrency 32]
+        [--bedrock-ttft lognormal:800,0.5] [--bedrock-token-interval fixed:15]
+        [--telegram-latency lognormal:60,0.4] [--mix faq=0.2,repeat=0.2,unique=0.5,command=0.1]
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+CORE_LAMBDA_DIR = PROJECT_ROOT / "lambda" / "core"
+FAQ_PATH = PROJECT_ROOT / "config" / "faq.yaml"
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_services import FakeBedrockServer, FakeTelegramServer  # noqa: E402
+
+REPEATED_QUESTIONS = [
+    "Should I pay off my credit card or save first?",
+    "¿Conviene pagar la tarjeta o ahorrar primero?",
+    "Is it a good idea to invest in index funds?",
+    "How much should I keep in an emergency fund?",
+    "¿Cuánto debería tener en un fondo de emergencia?"
+]
+UNIQUE_TEMPLATES = [
+    "I earn {income} a month and owe {debt} on a card at {rate}% interest. Should I invest {amount} or pay the card first?",
+    "Compare refinancing a mortgage at {rate}% versus keeping {debt} at the current rate for {years} years.",
+    "Gano {income} al mes y tengo {debt} en deudas al {rate}%. ¿Invierto {amount} o pago primero?",
+    "What is a reasonable plan to save {amount} in {years} years with {income} income?"
+]
+COMMANDS = ["/start", "/help"]
+
+
+class FakeLambdaContext:
+    """Just enough of the Lambda context for the handler's deadline logic"""
+
+    def __init__(self, timeout_seconds: float) -> None:
+        self.aws_request_id = str(uuid.uuid4())
+        self._deadline = time.monotonic() + timeout_seconds
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int(max(0.0, self._deadline - time.monotonic()) * 1000)
+
+
+class UpdateGenerator:
+    """Telegram updates wrapped in API Gateway proxy events, with a configurable message mix"""
+
+    def __init__(self, mix: Dict[str, float], seed: int) -> None:
+        self.random = random.Random(seed)
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.update_id = 100000000
+        with open(FAQ_PATH, 'r') as f:
+            self.faq_questions = [q for entry in yaml.safe_load(f)["entries"] for q in entry["questions"]]
+
+    def message(self) -> Dict[str, str]:
+        kind = self.random.choices(self.kinds, self.weights)[0]
+        if kind == 'faq':
+            text = self.random.choice(self.faq_questions)
+        elif kind == 'repeat':
+            text = self.random.choice(REPEATED_QUESTIONS)
+        elif kind == 'command':
+            text = self.random.choice(COMMANDS)
+        else:
+            text = self.random.choice(UNIQUE_TEMPLATES).format(
+                income=self.random.randrange(800, 9000, 50),
+                debt=self.random.randrange(500, 40000, 100),
+                rate=self.random.randrange(3, 45),
+                amount=self.random.randrange(100, 5000, 50),
+                years=self.random.randrange(1, 30)
+            )
+        return {'kind': kind, 'text': text}
+
+    def event(self, chat_id: int, text: str) -> Dict[str, Any]:
+        self.update_id += 1
+        update = {
+            'update_id': self.update_id,
+            'message': {
+                'message_id': self.update_id % 100000,
+                'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Load', 'language_code': 'es'},
+                'chat': {'id': chat_id, 'first_name': 'Load', 'type': 'private'},
+                'date': int(time.time()),
+                'text': text
+            }
+        }
+        return {
+            'resource': '/webhook',
+            'path': '/webhook',
+            'httpMethod': 'POST',
+            'headers': {'Content-Type': 'application/json'},
+            'requestContext': {'stage': 'prod', 'requestId': str(self.update_id)},
+            'body': json.dumps(update, ensure_ascii=False),
+            'isBase64Encoded': False
+        }
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(','):
+        kind, _, weight = part.partition('=')
+        if kind not in ('faq', 'repeat', 'unique', 'command'):
+            raise ValueError(f"Unknown message kind in --mix: {kind}")
+        mix[kind] = float(weight)
+    return mix
+
+
+def classify(handler, messages: List[Dict[str, Any]], config: Dict[str, Any]) -> str:
+    if not messages:
+        return 'no_reply'
+    final_text = messages[-1]['text']
+    if final_text.endswith(handler.FALLBACK_MESSAGES):
+        return 'fallback'
+    if final_text in config.get('prompts', {}).get('admission', {}).values():
+        return 'rejected'
+    return 'ok'
+
+
+def run(args: argparse.Namespace) -> None:
+    bedrock = FakeBedrockServer(
+        latency=args.bedrock_ttft,
+        token_interval=args.bedrock_token_interval,
+        answer_words=args.answer_words,
+        error_probability=args.bedrock_error_rate
+    ).start()
+    telegram = FakeTelegramServer(
+        latency=args.telegram_latency,
+        rate_limit_probability=args.telegram_429_rate
+    ).start()
+
+    os.environ.update({
+        'BEDROCK_ENDPOINT_URL': bedrock.url,
+        'TELEGRAM_API_BASE': telegram.url,
+        'TELEGRAM_BOT_TOKEN': 'load-test',
+        'AWS_ACCESS_KEY_ID': 'fake',
+        'AWS_SECRET_ACCESS_KEY': 'fake',
+        'AWS_DEFAULT_REGION': 'us-east-1'
+    })
+    sys.path.insert(0, str(CORE_LAMBDA_DIR))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import handler
+    logging.getLogger().setLevel(getattr(logging, args.log_level))
+    config = handler.load_config()
+    if args.no_streaming:
+        config.setdefault('streaming', {})['enabled'] = False
+
+    generator = UpdateGenerator(parse_mix(args.mix), args.seed)
+    free_chats = list(range(1, args.chats + 1))
+    chats_lock = threading.Lock()
+    results: List[Dict[str, Any]] = []
+    results_lock = threading.Lock()
+
+    def process(event: Dict[str, Any], chat_id: int, kind: str, scheduled_at: float) -> None:
+        started_at = time.monotonic()
+        outcome = None
+        try:
+            response = handler.lambda_handler(event, FakeLambdaContext(args.lambda_timeout))
+            if response.get('statusCode') != 200:
+                outcome = 'http_error'
+        except Exception:
+            outcome = 'exception'
+        finished_at = time.monotonic()
+
+        messages = telegram.take_messages(chat_id)
+        with chats_lock:
+            free_chats.append(chat_id)
+        with results_lock:
+            results.append({
+                'kind': kind,
+                'outcome': outcome or classify(handler, messages, config),
+                'latency': finished_at - scheduled_at,
+                'service_time': finished_at - started_at,
+                'first_text': (messages[0]['at'] - scheduled_at) if messages else None
+            })
+
+    # Metrics are printed as EMF lines on stdout; keep them out of the report
+    metrics_sink = open(args.metrics_out, 'w') if args.metrics_out else io.StringIO()
+    arrival_random = random.Random(args.seed + 1)
+    started_at = time.monotonic()
+    next_arrival = started_at
+    dropped = 0
+    with contextlib.redirect_stdout(metrics_sink), ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        while next_arrival - started_at < args.duration:
+            delay = next_arrival - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            with chats_lock:
+                chat_id = free_chats.pop(arrival_random.randrange(len(free_chats))) if free_chats else None
+            if chat_id is None:
+                # Every simulated chat already has an update in flight
+                dropped += 1
+            else:
+                message = generator.message()
+                executor.submit(process, generator.event(chat_id, message['text']), chat_id, message['kind'], next_arrival)
+            next_arrival += arrival_random.expovariate(args.rate)
+    elapsed = time.monotonic() - started_at
+    metrics_sink.close()
+
+    bedrock.stop()
+    telegram.stop()
+    report(args, results, elapsed, dropped, bedrock, telegram)
+
+
+def report(
+    args: argparse.Namespace,
+    results: List[Dict[str, Any]],
+    elapsed: float,
+    dropped: int,
+    bedrock: FakeBedrockServer,
+    telegram: FakeTelegramServer
+) -> None:
+    if not results:
+        print("No updates completed")
+        return
+
+    outcomes = Counter(r['outcome'] for r in results)
+    failed = sum(count for outcome, count in outcomes.items() if outcome != 'ok')
+    print(
+        f"{len(results)} updates in {elapsed:.1f}s at target {args.rate:g}/s "
+        f"-> {len(results) / elapsed:.2f}/s completed, {dropped} dropped (no idle chat)"
+    )
+    print(f"outcomes: {dict(outcomes)}  error rate {failed / len(results):.2%}")
+
+    def line(label: str, values: List[float]) -> None:
+        if values:
+            print(
+                f"  {label:<22} p50 {percentile(values, 50) * 1000:7.0f} ms  "
+                f"p95 {percentile(values, 95) * 1000:7.0f} ms  p99 {percentile(values, 99) * 1000:7.0f} ms  "
+                f"(n={len(values)})"
+            )
+
+    print("end-to-end latency:")
+    line("all", [r['latency'] for r in results])
+    for kind in sorted({r['kind'] for r in results}):
+        line(kind, [r['latency'] for r in results if r['kind'] == kind])
+    print("time to first visible text:")
+    line("all", [r['first_text'] for r in results if r['first_text'] is not None])
+    print("service time (excluding queueing):")
+    line("all", [r['service_time'] for r in results])
+    print(f"fake bedrock: {dict(bedrock.stats)}")
+    print(f"fake telegram: {dict(telegram.stats)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=10, help="updates per second (Poisson arrivals)")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of arrivals")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent handler invocations")
+    parser.add_argument("--chats", type=int, default=200, help="simulated chats")
+    parser.add_argument("--mix", default="faq=0.2,repeat=0.2,unique=0.5,command=0.1")
+    parser.add_argument("--bedrock-ttft", default="lognormal:800,0.5", help="time to first token")
+    parser.add_argument("--bedrock-token-interval", default="fixed:15")
+    parser.add_argument("--bedrock-error-rate", type=float, default=0.0)
+    parser.add_argument("--answer-words", type=int, default=30)
+    parser.add_argument("--telegram-latency", default="lognormal:60,0.4")
+    parser.add_argument("--telegram-429-rate", type=float, default=0.0)
+    parser.add_argument("--no-streaming", action="store_true", help="use blocking invoke_model replies")
+    parser.add_argument("--lambda-timeout", type=float, default=60)
+    parser.add_argument("--metrics-out", help="write the emitted EMF lines to this file")
+    parser.add_argument("--log-level", default="ERROR", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--seed", type=int, default=7)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Measure cold-start (init) duration of the core Lambda.
+
+local:       import handler in fresh interpreters and report wall time plus the
+             slowest imports (python -X importtime). Point --code-dir at a
+             bundled asset (cdk.out/asset.*) to measure what actually ships.
+cloudwatch:  Logs Insights percentiles of @initDuration from the REPORT lines of
+             the deployed function.
+
+Usage:
+    python scripts/measure_init_duration.py local [--runs 20] [--code-dir lambda/core]
+    python scripts/measure_init_duration.py cloudwatch [--function-name pocket-counsel-core] [--hours 24]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+CORE_LAMBDA_DIR = PROJECT_ROOT / "lambda" / "core"
+
+IMPORT_PROBE = (
+    "import time; started_at = time.perf_counter(); import handler; "
+    "print(f'INIT_MS={(time.perf_counter() - started_at) * 1000:.2f}')"
+)
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|\s+(.*)$')
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def measure_local(code_dir: Path, runs: int, top: int) -> None:
+    env = {
+        **os.environ,
+        "AWS_DEFAULT_REGION": os.environ.get("AWS_DEFAULT_REGION", "us-east-1"),
+        "PYTHONDONTWRITEBYTECODE": "1"
+    }
+    init_ms: List[float] = []
+    self_us: Dict[str, List[int]] = defaultdict(list)
+
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", IMPORT_PROBE],
+            cwd=code_dir, env=env, capture_output=True, text=True, check=True
+        )
+        init_ms.append(float(re.search(r'INIT_MS=([\d.]+)', result.stdout).group(1)))
+        for line in result.stderr.splitlines():
+            match = _IMPORTTIME_LINE.match(line)
+            if match:
+                self_us[match.group(3).strip()].append(int(match.group(1)))
+
+    print(f"import handler from {code_dir} ({runs} fresh interpreters)")
+    print(
+        f"  p50 {percentile(init_ms, 50):.1f} ms  p95 {percentile(init_ms, 95):.1f} ms  "
+        f"max {max(init_ms):.1f} ms"
+    )
+    print("slowest imports (median self time):")
+    slowest = sorted(self_us.items(), key=lambda item: statistics.median(item[1]), reverse=True)[:top]
+    for module, samples in slowest:
+        print(f"  {statistics.median(samples) / 1000:8.1f} ms  {module}")
+
+
+def measure_cloudwatch(function_name: str, hours: float) -> None:
+    import boto3
+
+    logs = boto3.client("logs")
+    end = int(time.time())
+    query_id = logs.start_query(
+        logGroupName=f"/aws/lambda/{function_name}",
+        startTime=end - int(hours * 3600),
+        endTime=end,
+        queryString=(
+            'filter @type = "REPORT" '
+            '| stats count(*) as invocations, count(@initDuration) as cold_starts, '
+            'pct(@initDuration, 50) as p50, pct(@initDuration, 95) as p95, '
+            'pct(@initDuration, 99) as p99, max(@initDuration) as max'
+        )
+    )["queryId"]
+
+    while True:
+        response = logs.get_query_results(queryId=query_id)
+        if response["status"] in ("Complete", "Failed", "Cancelled", "Timeout"):
+            break
+        time.sleep(1)
+
+    if response["status"] != "Complete" or not response["results"]:
+        print(f"No results ({response['status']}) for {function_name} in the last {hours:g} h")
+        return
+
+    row = {field["field"]: field["value"] for field in response["results"][0]}
+    print(f"{function_name}, last {hours:g} h: {row.get('cold_starts', 0)} cold starts / {row['invocations']} invocations")
+    for name in ("p50", "p95", "p99", "max"):
+        if name in row:
+            print(f"  init {name}: {float(row[name]):.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    local = subparsers.add_parser("local")
+    local.add_argument("--runs", type=int, default=20)
+    local.add_argument("--code-dir", type=Path, default=CORE_LAMBDA_DIR)
+    local.add_argument("--top", type=int, default=15)
+
+    cloudwatch = subparsers.add_parser("cloudwatch")
+    cloudwatch.add_argument("--function-name", default="pocket-counsel-core")
+    cloudwatch.add_argument("--hours", type=float, default=24)
+
+    args = parser.parse_args()
+    if args.mode == "local":
+        measure_local(args.code_dir.resolve(), args.runs, args.top)
+    else:
+        measure_cloudwatch(args.function_name, args.hours)
+
+
+if __name__ == "__main__":
+    main()
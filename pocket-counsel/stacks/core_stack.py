@@ -1,16 +1,23 @@
+import json
 import yaml
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List
 from aws_cdk import (
     Stack,
+    BundlingOptions,
+    DockerVolume,
     Duration,
     CfnOutput,
+    RemovalPolicy,
+    aws_dynamodb as dynamodb,
     aws_lambda as _lambda,
     aws_iam as iam,
     aws_logs as logs,
 )
 from constructs import Construct
 
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+
 
 class CoreStack(Stack):
 
@@ -27,6 +34,8 @@ class CoreStack(Stack):
         
         lambda_role = self._create_lambda_role()
         
+        self.tables = self._create_tables(lambda_role)
+        
         environment = self._build_environment_variables(telegram_bot_token)
         
         self.core_lambda = self._create_lambda_function(lambda_role, environment, construct_id)
@@ -60,20 +69,64 @@ class CoreStack(Stack):
                 effect=iam.Effect.ALLOW,
                 actions=bedrock_actions,
                 resources=[
-                    f"arn:aws:bedrock:{region}::foundation-model/{bedrock_config['model_id']}"
+                    f"arn:aws:bedrock:{model_region}::foundation-model/{model_id}"
+                    for model_region in self._bedrock_regions(region)
+                    for model_id in self._bedrock_model_ids()
                 ]
             )
         )
 
         return role
 
+    def _bedrock_model_ids(self) -> List[str]:
+        bedrock_config = self.config["bedrock"]
+        model_ids = [bedrock_config["model_id"]]
+        for tier in bedrock_config.get("routing", {}).get("tiers", []):
+            if tier["model_id"] not in model_ids:
+                model_ids.append(tier["model_id"])
+        secondary_model_id = bedrock_config.get("hedging", {}).get("secondary_model_id")
+        if secondary_model_id and secondary_model_id not in model_ids:
+            model_ids.append(secondary_model_id)
+        return model_ids
+
+    def _bedrock_regions(self, region: str) -> List[str]:
+        hedging_config = self.config["bedrock"].get("hedging", {})
+        secondary_region = hedging_config.get("secondary_region")
+        if hedging_config.get("enabled") and secondary_region and secondary_region != region:
+            return [region, secondary_region]
+        return [region]
+
+    def _create_tables(self, role: iam.Role) -> Dict[str, dynamodb.Table]:
+        tables = {}
+        
+        for table_config in self.config.get("dynamodb", {}).get("tables", []):
+            table = dynamodb.Table(
+                self,
+                table_config["id"],
+                table_name=table_config["table_name"],
+                partition_key=dynamodb.Attribute(
+                    name=table_config["partition_key"],
+                    type=dynamodb.AttributeType.STRING
+                ),
+                billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                time_to_live_attribute=table_config.get("ttl_attribute"),
+                removal_policy=RemovalPolicy.DESTROY
+            )
+            table.grant_read_write_data(role)
+            tables[table_config["env_var"]] = table
+        
+        return tables
+
     def _build_environment_variables(self, telegram_bot_token: str) -> Dict[str, str]:
         bedrock_config = self.config["bedrock"]
         
         return {
             "BEDROCK_MODEL_ID": bedrock_config["model_id"],
             "BEDROCK_REGION": bedrock_config["region"],
-            "TELEGRAM_BOT_TOKEN": telegram_bot_token
+            "BEDROCK_ROUTING_TABLE": json.dumps(bedrock_config.get("routing", {})),
+            "BEDROCK_HEDGING": json.dumps(bedrock_config.get("hedging", {})),
+            "TELEGRAM_BOT_TOKEN": telegram_bot_token,
+            **{env_var: table.table_name for env_var, table in self.tables.items()}
         }
 
     def _create_lambda_function(
@@ -81,7 +134,7 @@ class CoreStack(Stack):
         role: iam.Role,
         environment: Dict[str, str],
         construct_id: str
-    ) -> _lambda.Function:
+    ) -> _lambda.IFunction:
         lambda_config = self.config["lambda"]
         runtime = getattr(_lambda.Runtime, lambda_config["runtime"])
 
@@ -93,13 +146,25 @@ class CoreStack(Stack):
             handler=lambda_config["handler"],
             code=_lambda.Code.from_asset(
                 lambda_config["code_path"],
-                bundling={
-                    "image": runtime.bundling_image,
-                    "command": [
+                exclude=["__pycache__", "*.pyc", "prompt_config.json"],
+                bundling=BundlingOptions(
+                    image=runtime.bundling_image,
+                    volumes=[DockerVolume(host_path=str(SCRIPTS_DIR), container_path="/scripts")],
+                    command=[
                         "bash", "-c",
-                        "pip install -r requirements.txt -t /asset-output && cp -au . /asset-output"
+                        " && ".join([
+                            "pip install -r requirements.txt -t /asset-output",
+                            "cp -au . /asset-output",
+                            # PyYAML is only needed to compile the prompt config, not at runtime
+                            "pip install -q PyYAML -t /tmp/build-deps",
+                            "PYTHONPATH=/tmp/build-deps python /scripts/build_prompt_config.py"
+                            " prompt_config.yaml /asset-output/prompt_config.json",
+                            "rm /asset-output/prompt_config.yaml",
+                            # The Lambda filesystem is read-only, so ship bytecode for our modules
+                            "python -m compileall -q -l /asset-output"
+                        ])
                     ]
-                }
+                )
             ),
             timeout=Duration.seconds(lambda_config["timeout_seconds"]),
             memory_size=lambda_config["memory_size_mb"],
@@ -108,6 +173,8 @@ class CoreStack(Stack):
             log_retention=getattr(logs.RetentionDays, lambda_config["log_retention_days"])
         )
 
+        invoke_target = self._configure_warm_start(lambda_function)
+
         CfnOutput(
             self,
             "CoreLambdaArn",
@@ -123,4 +190,26 @@ class CoreStack(Stack):
             description="Name of the Core Lambda function"
         )
 
-        return lambda_function
+        return invoke_target
+
+    def _configure_warm_start(self, lambda_function: _lambda.Function) -> _lambda.IFunction:
+        """Return the function, or a "live" alias with provisioned concurrency or SnapStart"""
+        warm_start_config = self.config["lambda"].get("warm_start", {})
+        mode = warm_start_config.get("mode", "none")
+
+        if mode == "none":
+            return lambda_function
+
+        if mode == "snapstart":
+            # CDK only allows snap_start for Java runtimes, so set it on the L1 resource
+            cfn_function: _lambda.CfnFunction = lambda_function.node.default_child
+            cfn_function.snap_start = _lambda.CfnFunction.SnapStartProperty(apply_on="PublishedVersions")
+            return lambda_function.current_version.add_alias("live")
+
+        if mode == "provisioned_concurrency":
+            return lambda_function.current_version.add_alias(
+                "live",
+                provisioned_concurrent_executions=warm_start_config["provisioned_concurrency"]
+            )
+
+        raise ValueError(f"Unknown lambda.warm_start.mode: {mode}")